@@ -0,0 +1,136 @@
+"""
+共享组件
+进程内复用的音频分析器、表情代理与Live2D映射器；服务启动时预热，所有路由共用同一批实例
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from backend.core.ai_config import AIConfig
+from backend.core.audio_analyzer import AudioAnalyzerAgent
+from backend.core.expression_cache import get_expression_cache
+from backend.core.expression_generator import ExpressionGenerator
+from backend.core.expression_index import get_expression_index
+from backend.core.feature_cache import get_feature_cache
+from backend.core.langchain_agent import ExpressionAgentV2
+from backend.core.live2d_expression_mapper import Live2DExpressionMapper
+from backend.utils.pcm_cache import get_pcm_cache
+from backend.utils.upload_catalog import get_upload_catalog
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_analyzers: Dict[Tuple[int, int], AudioAnalyzerAgent] = {}
+_expression_agent: Optional[ExpressionAgentV2] = None
+_live2d_mapper: Optional[Live2DExpressionMapper] = None
+
+
+def get_audio_analyzer(sample_rate: int = 44100, hop_length: int = 512) -> AudioAnalyzerAgent:
+    """
+    获取共享的音频分析器（按采样率与跳跃长度区分实例，音高提取方式在调用时指定）
+
+    Args:
+        sample_rate: 采样率
+        hop_length: 跳跃长度
+
+    Returns:
+        AudioAnalyzerAgent: 音频分析器
+    """
+    key = (sample_rate, hop_length)
+    with _lock:
+        analyzer = _analyzers.get(key)
+        if analyzer is None:
+            analyzer = AudioAnalyzerAgent(
+                sample_rate=sample_rate,
+                hop_length=hop_length,
+                feature_cache=get_feature_cache(),
+                pcm_cache=get_pcm_cache(),
+                **AIConfig.get_analyzer_config()
+            )
+            _analyzers[key] = analyzer
+        return analyzer
+
+
+def get_expression_agent() -> ExpressionAgentV2:
+    """
+    获取共享的表情代理
+
+    Returns:
+        ExpressionAgentV2: 表情代理
+
+    Raises:
+        ValueError: 未配置API密钥
+    """
+    global _expression_agent
+    with _lock:
+        if _expression_agent is None:
+            expression_cache = get_expression_cache()
+            _expression_agent = ExpressionAgentV2(
+                expression_cache=expression_cache,
+                expression_index=get_expression_index(expression_cache),
+                **AIConfig.get_expression_config()
+            )
+        return _expression_agent
+
+
+def get_live2d_mapper() -> Live2DExpressionMapper:
+    """获取共享的Live2D表情映射器（表情配置只加载一次）"""
+    global _live2d_mapper
+    with _lock:
+        if _live2d_mapper is None:
+            _live2d_mapper = Live2DExpressionMapper()
+        return _live2d_mapper
+
+
+def build_expression_generator(expression_backend: Optional[str] = None) -> ExpressionGenerator:
+    """
+    用共享的分析器与表情代理组装表情生成器（生成器本身无状态，每个请求创建一个）
+
+    Args:
+        expression_backend: 表情生成后端 (llm / local / auto)，默认读取 EXPRESSION_BACKEND
+
+    Returns:
+        ExpressionGenerator: 表情生成器
+    """
+    backend = expression_backend or AIConfig.get_expression_backend()
+    expression_agent = None
+    if backend != "local":
+        try:
+            expression_agent = get_expression_agent()
+        except ValueError as e:
+            if backend != "auto":
+                raise
+            logger.warning(f"表情代理初始化失败，只使用规则引擎: {e}")
+
+    return ExpressionGenerator(
+        audio_analyzer=get_audio_analyzer(),
+        expression_agent=expression_agent,
+        expression_backend=backend
+    )
+
+
+def warm_up():
+    """服务启动时创建共享组件；缺少配置时只记录警告，由首个请求再报告错误"""
+    for name, factory in (
+        ("音频分析器", get_audio_analyzer),
+        ("表情代理", get_expression_agent),
+        ("Live2D映射器", get_live2d_mapper),
+    ):
+        try:
+            factory()
+            logger.info(f"共享组件已就绪: {name}")
+        except Exception as e:
+            logger.warning(f"共享组件预热失败: {name}: {e}")
+
+    # 升级前上传的文件不在上传文件目录中，路由查不到，提示从磁盘重建
+    upload_dir = Path("data/uploads")
+    stored = (
+        path for directory in (upload_dir, upload_dir / "blobs") if directory.is_dir()
+        for path in directory.iterdir() if path.is_file()
+    )
+    if get_upload_catalog().count() == 0 and any(stored):
+        logger.warning(
+            "上传文件目录为空但上传目录中已有文件，请运行 "
+            "python -m backend.utils.upload_catalog rebuild 重建目录"
+        )
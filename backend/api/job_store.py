@@ -0,0 +1,223 @@
+"""
+后台任务存储模块
+持久化任务状态、阶段进度、结果、事件日志与幂等键（SQLite WAL），
+多个uvicorn worker进程共享同一份数据：任务在提交它的worker中执行，任意worker都能查询状态、订阅事件与命中幂等键
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 任务行中随状态变化更新的字段
+JOB_FIELDS = (
+    "kind", "status", "stage", "progress", "created_at", "started_at", "finished_at",
+    "result", "error", "error_type", "dedupe_key",
+)
+
+
+class JobStore:
+    """后台任务存储（已结束的任务超过保留时间后删除）"""
+
+    def __init__(self, db_path: str = "data/cache/jobs.sqlite3"):
+        """
+        初始化任务存储
+
+        Args:
+            db_path: SQLite数据库路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    progress REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT,
+                    error_type TEXT,
+                    dedupe_key TEXT
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS job_events (
+                    job_id TEXT NOT NULL,
+                    event_id INTEGER NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (job_id, event_id)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    idempotency_key TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    dedupe_key TEXT
+                )"""
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接；WAL模式允许多进程并发读、串行写"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(
+        self,
+        job_id: str,
+        state: Dict[str, Any],
+        event: Optional[Tuple[int, str, Dict[str, Any]]] = None
+    ):
+        """
+        写入任务状态，可同时追加一条事件（同一事务）
+
+        Args:
+            job_id: 任务ID
+            state: 任务字段（JOB_FIELDS）
+            event: (事件ID, 事件类型, 数据)
+        """
+        values = [state.get(name) for name in JOB_FIELDS]
+        values[JOB_FIELDS.index("result")] = (
+            json.dumps(state["result"], ensure_ascii=False) if state.get("result") is not None else None
+        )
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs (job_id, {', '.join(JOB_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in JOB_FIELDS)})",
+                [job_id] + values
+            )
+            if event is not None:
+                event_id, name, data = event
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_events (job_id, event_id, event, data) VALUES (?, ?, ?, ?)",
+                    (job_id, event_id, name, json.dumps(data, ensure_ascii=False))
+                )
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务状态
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict]: job_id 与 JOB_FIELDS 各字段，任务不存在时返回None
+        """
+        row = self._connect().execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        state = dict(zip(JOB_FIELDS, row))
+        state["job_id"] = job_id
+        if state["result"] is not None:
+            state["result"] = json.loads(state["result"])
+        return state
+
+    def events(self, job_id: str, after: int = 0) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        读取事件ID大于 after 的事件（按事件ID排序）
+
+        Args:
+            job_id: 任务ID
+            after: 已读取的最后一个事件ID
+
+        Returns:
+            List[Tuple[str, Dict]]: (事件类型, 数据) 列表
+        """
+        rows = self._connect().execute(
+            "SELECT event, data FROM job_events WHERE job_id = ? AND event_id > ? ORDER BY event_id",
+            (job_id, after)
+        ).fetchall()
+        return [(event, json.loads(data)) for event, data in rows]
+
+    def bind_idempotency_key(self, idempotency_key: str, job_id: str, dedupe_key: Optional[str]):
+        """
+        记录幂等键对应的任务
+
+        Args:
+            idempotency_key: 客户端提供的幂等键
+            job_id: 任务ID
+            dedupe_key: 合并键
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (idempotency_key, job_id, dedupe_key) VALUES (?, ?, ?)",
+                (idempotency_key, job_id, dedupe_key)
+            )
+
+    def lookup_idempotency_key(self, idempotency_key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        查询幂等键对应的任务
+
+        Args:
+            idempotency_key: 客户端提供的幂等键
+
+        Returns:
+            Optional[Tuple[str, Optional[str]]]: (任务ID, 合并键)，未使用过时返回None
+        """
+        row = self._connect().execute(
+            "SELECT job_id, dedupe_key FROM idempotency_keys WHERE idempotency_key = ?",
+            (idempotency_key,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def release_idempotency_key(self, idempotency_key: str):
+        """删除幂等键（对应的任务失败后允许重新执行）"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE idempotency_key = ?", (idempotency_key,))
+
+    def prune(self, expire_before: float) -> int:
+        """
+        删除结束时间早于 expire_before 的任务及其事件与幂等键
+
+        Args:
+            expire_before: 时间戳
+
+        Returns:
+            int: 删除的任务数
+        """
+        conn = self._connect()
+        with conn:
+            expired = [
+                row[0] for row in conn.execute(
+                    "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                    (expire_before,)
+                )
+            ]
+            for table in ("job_events", "idempotency_keys", "jobs"):
+                conn.executemany(f"DELETE FROM {table} WHERE job_id = ?", [(job_id,) for job_id in expired])
+        return len(expired)
+
+
+_default_store: Optional[JobStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """获取进程内共享的任务存储（路径可通过环境变量配置）"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = JobStore(db_path=os.getenv("JOB_STORE_PATH", "data/cache/jobs.sqlite3"))
+        return _default_store
@@ -0,0 +1,432 @@
+"""
+后台任务模块
+有界队列 + 固定数量的后台worker执行耗时的生成流水线，接口立即返回任务ID，
+客户端轮询状态、阶段进度与结果，或订阅任务事件流（阶段事件与部分结果）。
+任务状态与事件日志写入共享的任务存储，多worker部署时任意worker都能查询任务与命中幂等键
+"""
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.api.job_store import JOB_FIELDS, JobStore, get_job_store
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+# 订阅其他worker执行的任务时轮询任务存储的间隔（秒）
+EVENT_POLL_SECONDS = 0.5
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"任务队列已满，请 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+class IdempotencyConflictError(Exception):
+    """幂等键已用于参数不同的请求"""
+
+
+@dataclass
+class Job:
+    """后台任务状态"""
+    job_id: str
+    kind: str
+    status: str = "queued"
+    stage: str = "queued"
+    progress: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    dedupe_key: Optional[str] = field(default=None, repr=False)
+    # 事件日志：(事件类型, 数据)，事件ID为下标+1，供断线重连时续传
+    events: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+    _waiter: Optional[asyncio.Future] = field(default=None, repr=False)
+    _store: Optional[JobStore] = field(default=None, repr=False)
+
+    @classmethod
+    def from_store(cls, store: JobStore, job_id: str) -> Optional["Job"]:
+        """
+        从任务存储读取任务快照（在其他worker中执行的任务，事件通过轮询存储获取）
+
+        Args:
+            store: 任务存储
+            job_id: 任务ID
+
+        Returns:
+            Optional[Job]: 任务快照，不存在时返回None
+        """
+        state = store.load(job_id)
+        if state is None:
+            return None
+        return cls(**state, events=store.events(job_id), _store=store)
+
+    @property
+    def finished(self) -> bool:
+        """任务是否已结束"""
+        return self.status in ("succeeded", "failed")
+
+    def persist(self, event: Optional[Tuple[int, str, Dict[str, Any]]] = None):
+        """
+        将任务状态（与新事件）写入任务存储；写入失败只记录日志，不影响任务执行
+
+        Args:
+            event: (事件ID, 事件类型, 数据)
+        """
+        if self._store is None:
+            return
+        try:
+            self._store.save(self.job_id, {name: getattr(self, name) for name in JOB_FIELDS}, event)
+        except sqlite3.Error as e:
+            logger.warning(f"任务状态写入存储失败: {self.job_id}: {e}")
+
+    def update(self, stage: str, progress: float):
+        """
+        更新阶段与整体进度并发布 stage 事件（在事件循环线程或分析线程中调用均可）
+
+        Args:
+            stage: 当前阶段名称
+            progress: 整体进度 (0-1)
+        """
+        self.stage = stage
+        self.progress = round(min(max(progress, self.progress), 1.0), 4)
+        self.publish("stage", {"stage": stage, "progress": self.progress})
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """
+        追加事件并唤醒订阅者（线程安全）
+
+        Args:
+            event: 事件类型
+            data: 事件数据（可JSON序列化）
+        """
+        with self._lock:
+            self.events.append((event, data))
+            self.persist((len(self.events), event, data))
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        """在事件循环中唤醒当前所有等待者，并为下一批事件准备新的等待对象"""
+        waiter, self._waiter = self._waiter, self._loop.create_future()
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def wait_events(
+        self,
+        after: int = 0,
+        timeout: float = 15.0
+    ) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """
+        获取事件ID大于 after 的事件，没有新事件时最多等待 timeout 秒
+
+        Args:
+            after: 已收到的最后一个事件ID
+            timeout: 等待超时（秒），超时返回空列表
+
+        Returns:
+            List[Tuple[int, str, Dict]]: (事件ID, 事件类型, 数据) 列表
+        """
+        if self._loop is None and self._store is not None:
+            return await self._poll_events(after, timeout)
+
+        # 先取等待对象再读日志：读取之后追加的事件一定会唤醒这个等待对象
+        waiter = self._waiter
+        with self._lock:
+            events = self.events[after:]
+        if not events and not self.finished and waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            except asyncio.TimeoutError:
+                return []
+            with self._lock:
+                events = self.events[after:]
+        return [(after + i + 1, event, data) for i, (event, data) in enumerate(events)]
+
+    async def _poll_events(
+        self,
+        after: int,
+        timeout: float
+    ) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """轮询任务存储获取其他worker执行的任务的新事件，同时刷新任务状态"""
+        deadline = time.monotonic() + timeout
+        while True:
+            state, events = await asyncio.to_thread(
+                lambda: (self._store.load(self.job_id), self._store.events(self.job_id, len(self.events)))
+            )
+            if state is not None:
+                for name in JOB_FIELDS:
+                    setattr(self, name, state[name])
+            self.events.extend(events)
+            remaining = deadline - time.monotonic()
+            if len(self.events) > after or self.finished or remaining <= 0:
+                break
+            await asyncio.sleep(min(EVENT_POLL_SECONDS, remaining))
+        return [
+            (after + i + 1, event, data) for i, (event, data) in enumerate(self.events[after:])
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为接口响应"""
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "error_type": self.error_type,
+        }
+
+
+JobFunc = Callable[[Job], Awaitable[Dict[str, Any]]]
+
+
+class JobManager:
+    """
+    后台任务管理器（worker在服务事件循环中运行，阻塞计算由任务自身放入线程池）；
+    任务在提交它的进程中排队执行，状态与事件写入任务存储供其他worker进程读取
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_depth: int = 16,
+        result_ttl_seconds: float = 3600,
+        store: Optional[JobStore] = None
+    ):
+        """
+        初始化任务管理器
+
+        Args:
+            workers: 同时执行的任务数
+            queue_depth: 排队任务数上限，超出后拒绝提交
+            result_ttl_seconds: 已结束任务的保留时间（秒）
+            store: 多worker共享的任务存储，为空时任务只保存在本进程内存中
+        """
+        self.workers = max(1, workers)
+        self.queue_depth = max(1, queue_depth)
+        self.result_ttl_seconds = result_ttl_seconds
+        self._store = store
+        self._jobs: Dict[str, Job] = {}
+        self._funcs: Dict[str, JobFunc] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # 排队/执行中任务的合并键 -> 任务ID
+        self._active: Dict[str, str] = {}
+        # 幂等键 -> (任务ID, 合并键)，随任务一起过期
+        self._idempotency: Dict[str, Tuple[str, Optional[str]]] = {}
+        # 最近完成任务的耗时，用于估算 Retry-After
+        self._durations: List[float] = []
+
+    async def start(self):
+        """在当前事件循环中启动worker"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"后台任务worker已启动: {self.workers} 个, 队列深度 {self.queue_depth}")
+
+    async def stop(self):
+        """停止worker（正在执行的任务被取消）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(
+        self,
+        kind: str,
+        func: JobFunc,
+        dedupe_key: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Job, bool]:
+        """
+        提交任务；与本进程中排队/执行中的任务合并键相同时直接返回该任务，
+        幂等键已使用过（包括在其他worker中）时返回当时的任务（包括已成功的任务；失败的任务重新执行）
+
+        Args:
+            kind: 任务类型
+            func: 任务函数，接收 Job 用于上报进度，返回结果字典
+            dedupe_key: 合并键（输入内容与参数的指纹）
+            idempotency_key: 客户端提供的幂等键
+
+        Returns:
+            Tuple[Job, bool]: (任务, 是否复用了已有任务)
+
+        Raises:
+            QueueFullError: 队列已满
+            IdempotencyConflictError: 幂等键已用于参数不同的请求
+            RuntimeError: worker未启动
+        """
+        if self._queue is None:
+            raise RuntimeError("任务管理器未启动")
+        self._prune()
+
+        previous = None
+        if idempotency_key is not None:
+            previous = self._idempotency.get(idempotency_key)
+            if previous is None and self._store is not None:
+                previous = self._store.lookup_idempotency_key(idempotency_key)
+        if previous is not None:
+            job_id, previous_key = previous
+            if previous_key != dedupe_key:
+                raise IdempotencyConflictError(f"幂等键已用于参数不同的请求: {idempotency_key}")
+            job = self.get(job_id)
+            if job is None or job.status == "failed":
+                # 失败（或被取消）的任务不复用，客户端重试时重新执行
+                logger.info(f"幂等键对应的任务已失败或过期，重新提交: {job_id}")
+                self._idempotency.pop(idempotency_key, None)
+                if self._store is not None:
+                    self._store.release_idempotency_key(idempotency_key)
+            else:
+                logger.info(f"幂等键命中已有任务: {job_id}")
+                return job, True
+
+        if dedupe_key is not None and dedupe_key in self._active:
+            job = self._jobs[self._active[dedupe_key]]
+            logger.info(f"合并到进行中的相同任务: {job.job_id}")
+            if idempotency_key is not None:
+                self._bind_idempotency_key(idempotency_key, job.job_id, dedupe_key)
+            return job, True
+
+        job = Job(job_id=str(uuid.uuid4()), kind=kind, _store=self._store)
+        job._loop = asyncio.get_running_loop()
+        job._waiter = job._loop.create_future()
+        try:
+            self._queue.put_nowait(job.job_id)
+        except asyncio.QueueFull:
+            raise QueueFullError(self.retry_after())
+        self._jobs[job.job_id] = job
+        self._funcs[job.job_id] = func
+        if dedupe_key is not None:
+            self._active[dedupe_key] = job.job_id
+            job.dedupe_key = dedupe_key
+        job.persist()
+        if idempotency_key is not None:
+            self._bind_idempotency_key(idempotency_key, job.job_id, dedupe_key)
+        logger.info(f"任务已提交: {job.job_id} ({kind}), 排队 {self._queue.qsize()}")
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """按ID查询任务（本进程之外的任务从任务存储读取快照）"""
+        job = self._jobs.get(job_id)
+        if job is None and self._store is not None:
+            job = Job.from_store(self._store, job_id)
+        return job
+
+    def _bind_idempotency_key(self, idempotency_key: str, job_id: str, dedupe_key: Optional[str]):
+        """记录幂等键对应的任务（本进程与任务存储）"""
+        self._idempotency[idempotency_key] = (job_id, dedupe_key)
+        if self._store is not None:
+            self._store.bind_idempotency_key(idempotency_key, job_id, dedupe_key)
+
+    def retry_after(self) -> int:
+        """估算队列腾出一个空位所需的秒数（近期平均任务耗时 / worker数）"""
+        average = sum(self._durations) / len(self._durations) if self._durations else 30.0
+        return max(1, math.ceil(average / self.workers))
+
+    def stats(self) -> Dict[str, Any]:
+        """本进程的队列与任务状态统计"""
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts,
+        }
+
+    async def _worker(self, index: int):
+        """从队列取任务并执行"""
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            func = self._funcs.pop(job_id, None)
+            if job is None or func is None:
+                self._queue.task_done()
+                continue
+
+            job.status = "running"
+            job.started_at = time.time()
+            job.persist()
+            try:
+                result = await func(job)
+                job.update("done", 1.0)
+                job.result = result
+                job.status = "succeeded"
+                job.finished_at = time.time()
+                job.publish("done", result)
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "任务被取消"
+                job.error_type = "CancelledError"
+                job.finished_at = time.time()
+                job.publish("error", {"error": job.error, "error_type": job.error_type})
+                raise
+            except Exception as e:
+                logger.error(f"任务执行失败: {job_id}: {e}", exc_info=True)
+                job.status = "failed"
+                job.error = str(e)
+                job.error_type = type(e).__name__
+                job.finished_at = time.time()
+                job.publish("error", {"error": job.error, "error_type": job.error_type})
+            finally:
+                if job.dedupe_key is not None:
+                    self._active.pop(job.dedupe_key, None)
+                self._durations = (self._durations + [job.finished_at - job.started_at])[-20:]
+                self._queue.task_done()
+
+    def _prune(self):
+        """清理超过保留时间的已结束任务"""
+        expire_before = time.time() - self.result_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < expire_before
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            self._idempotency = {
+                key: value for key, value in self._idempotency.items() if value[0] in self._jobs
+            }
+        if self._store is not None:
+            self._store.prune(expire_before)
+
+
+_default_manager: Optional[JobManager] = None
+_default_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """获取进程内共享的任务管理器（worker数、队列深度与结果保留时间可通过环境变量配置，任务存储为多worker共享）"""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = JobManager(
+                workers=int(os.getenv("JOB_WORKERS", "2")),
+                queue_depth=int(os.getenv("JOB_QUEUE_DEPTH", "16")),
+                result_ttl_seconds=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")),
+                store=get_job_store()
+            )
+        return _default_manager
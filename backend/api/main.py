@@ -4,7 +4,7 @@ FastAPI主应用
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
 from pathlib import Path
 import sys
@@ -13,6 +13,10 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from backend.api.routes import upload, analyze, expression
+from backend.api.dependencies import warm_up
+from backend.api.jobs import get_job_manager
+from backend.api.prefetch import get_analysis_prefetcher
+from backend.utils.metrics import get_metrics
 
 # 配置日志
 logging.basicConfig(
@@ -38,11 +42,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传请求体大小限制（在请求体读取过程中生效）
+app.add_middleware(upload.UploadSizeLimitMiddleware)
+
 # 注册路由
 app.include_router(upload.router, prefix="/api/v1", tags=["upload"])
 app.include_router(analyze.router, prefix="/api/v1", tags=["analyze"])
 app.include_router(expression.router, prefix="/api/v1", tags=["expression"])
 
+@app.on_event("startup")
+async def startup():
+    """预热共享的LLM客户端、已编译的链与分析器，避免首个请求承担初始化开销；启动后台任务worker"""
+    warm_up()
+    await get_job_manager().start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """停止后台任务worker与预分析"""
+    await get_job_manager().stop()
+    get_analysis_prefetcher().shutdown()
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -60,6 +79,16 @@ async def health_check():
         "service": "geyan-suidong-api"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus指标：阶段耗时、LLM调用与token用量、缓存命中、任务队列（本worker进程内累计）"""
+    registry = get_metrics()
+    stats = get_job_manager().stats()
+    for status, count in stats["jobs"].items():
+        registry.set("geyan_jobs", count, status=status)
+    registry.set("geyan_job_queue_length", stats["queued"])
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """全局异常处理"""
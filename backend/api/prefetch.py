@@ -0,0 +1,147 @@
+"""
+上传后预分析模块
+上传完成后立即在后台线程中执行默认参数的音频分析（解码、频谱特征、情感），
+结果写入特征缓存；/analyze 与 /generate 通过分析器的并发合并等待进行中的预分析，或直接命中缓存
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from backend.api.dependencies import get_audio_analyzer
+from backend.utils.single_flight import CallCancelledError
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCancelledError(CallCancelledError):
+    """
+    预分析已被取消（文件被删除）
+
+    内容去重后其他文件ID可能共享同一份内容，并合并到这次预分析中；
+    取消只属于预分析自身，合并进来的分析会重新执行而不会收到此异常
+    """
+
+
+class AnalysisPrefetcher:
+    """按文件ID管理预分析任务（有界线程池，删除文件时取消）"""
+
+    def __init__(self, workers: int = 1):
+        """
+        初始化预分析管理器
+
+        Args:
+            workers: 同时执行的预分析数
+        """
+        self.workers = max(1, workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 文件ID -> (任务, 取消标记)
+        self._tasks: Dict[str, Tuple[Future, threading.Event]] = {}
+
+    def submit(self, file_id: str, audio_path: str):
+        """
+        提交预分析
+
+        Args:
+            file_id: 文件ID
+            audio_path: 音频文件路径
+        """
+        cancelled = threading.Event()
+
+        def check_cancelled(stage: str, progress: float):
+            # 分析器在每个阶段边界回调，借此在阶段之间中止
+            if cancelled.is_set():
+                raise AnalysisCancelledError(f"预分析已取消: {file_id}")
+
+        def run():
+            check_cancelled("queued", 0.0)
+            get_audio_analyzer().analyze(audio_path, progress_callback=check_cancelled)
+
+        logger.info(f"提交预分析: {file_id}")
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="prefetch"
+                )
+            future = self._executor.submit(run)
+            self._tasks[file_id] = (future, cancelled)
+        future.add_done_callback(lambda f: self._finish(file_id, f))
+
+    def cancel(self, file_id: str) -> bool:
+        """
+        取消预分析：排队中的直接移除，执行中的在下一个阶段边界中止
+
+        Args:
+            file_id: 文件ID
+
+        Returns:
+            bool: 是否有进行中的预分析被取消
+        """
+        with self._lock:
+            task = self._tasks.pop(file_id, None)
+        if task is None:
+            return False
+        future, cancelled = task
+        cancelled.set()
+        future.cancel()
+        logger.info(f"已取消预分析: {file_id}")
+        return True
+
+    def status(self, file_id: str) -> Optional[str]:
+        """
+        预分析状态
+
+        Args:
+            file_id: 文件ID
+
+        Returns:
+            Optional[str]: queued / running，没有进行中的预分析时返回None
+        """
+        with self._lock:
+            task = self._tasks.get(file_id)
+        if task is None:
+            return None
+        return "running" if task[0].running() else "queued"
+
+    def shutdown(self):
+        """取消所有预分析并停止线程池（之后提交时重新创建）"""
+        with self._lock:
+            for _, cancelled in self._tasks.values():
+                cancelled.set()
+            self._tasks.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, file_id: str, future: Future):
+        """任务结束后移除记录并记录失败原因"""
+        with self._lock:
+            task = self._tasks.get(file_id)
+            if task is not None and task[0] is future:
+                del self._tasks[file_id]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if isinstance(error, AnalysisCancelledError):
+            logger.info(str(error))
+        elif error is not None:
+            logger.warning(f"预分析失败: {file_id}: {error}")
+        else:
+            logger.info(f"预分析完成: {file_id}")
+
+
+_default_prefetcher: Optional[AnalysisPrefetcher] = None
+_default_prefetcher_lock = threading.Lock()
+
+
+def get_analysis_prefetcher() -> AnalysisPrefetcher:
+    """获取进程内共享的预分析管理器（并发数可通过环境变量 UPLOAD_PREFETCH_WORKERS 配置）"""
+    global _default_prefetcher
+    with _default_prefetcher_lock:
+        if _default_prefetcher is None:
+            _default_prefetcher = AnalysisPrefetcher(
+                workers=int(os.getenv("UPLOAD_PREFETCH_WORKERS", "1"))
+            )
+        return _default_prefetcher
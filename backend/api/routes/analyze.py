@@ -3,28 +3,31 @@
 处理音频分析请求
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from pathlib import Path
+from typing import Literal
 import logging
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent.parent.parent))
 
-from backend.core.audio_analyzer import AudioAnalyzerAgent
-from backend.core.ai_config import AIConfig
+from backend.api.dependencies import get_audio_analyzer
+from backend.utils.metrics import start_request_metrics
+from backend.utils.upload_catalog import get_upload_catalog
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 上传目录
-UPLOAD_DIR = Path("data/uploads")
-
 class AnalyzeRequest(BaseModel):
     file_id: str
     sample_rate: int = 44100
     hop_length: int = 512
+    pitch_method: Literal["piptrack", "yin"] = "piptrack"
+    streaming: bool = False
+    parallel: bool = False
 
 @router.post("/analyze")
 async def analyze_audio(request: AnalyzeRequest):
@@ -38,24 +41,23 @@ async def analyze_audio(request: AnalyzeRequest):
         dict: 音频分析结果
     """
     try:
-        # 查找文件
-        file_path = None
-        for f in UPLOAD_DIR.glob(f"{request.file_id}.*"):
-            file_path = f
-            break
-
-        if not file_path or not file_path.exists():
+        # 按文件ID查找上传记录（同步SQLite查询放到线程池，不阻塞事件循环）
+        file_path = await run_in_threadpool(get_upload_catalog().resolve, request.file_id)
+        if file_path is None:
             raise HTTPException(status_code=404, detail="文件不存在")
 
-        # 执行分析
-        ai_config = AIConfig.get_analyzer_config()
-        analyzer = AudioAnalyzerAgent(
-            sample_rate=request.sample_rate,
-            hop_length=request.hop_length,
-            **ai_config
-        )
+        # 执行分析（复用进程内共享的分析器），同时收集各阶段耗时
+        request_metrics = start_request_metrics()
+        analyzer = get_audio_analyzer(request.sample_rate, request.hop_length)
 
-        features = analyzer.analyze(str(file_path))
+        # 分析在线程池中执行，不阻塞事件循环；相同音频与参数的并发分析由分析器合并为一次
+        features = await run_in_threadpool(
+            analyzer.analyze,
+            str(file_path),
+            pitch_method=request.pitch_method,
+            streaming=request.streaming,
+            parallel=request.parallel
+        )
 
         # 构建响应
         import numpy as np
@@ -74,6 +76,7 @@ async def analyze_audio(request: AnalyzeRequest):
                     "beat_count": len(features.beats),
                     "beats": features.beats[:100],  # 限制返回数量
                     "emotion_scores": features.emotion_scores,
+                    "emotion_timeline": features.emotion_timeline,
                     "energy_stats": {
                         "mean": float(energy_array.mean()),
                         "max": float(energy_array.max()),
@@ -83,7 +86,8 @@ async def analyze_audio(request: AnalyzeRequest):
                         "mean": float(spectral_array.mean()),
                         "max": float(spectral_array.max()),
                         "min": float(spectral_array.min())
-                    }
+                    },
+                    "timings": request_metrics.to_dict()
                 }
             }
         )
@@ -2,134 +2,335 @@
 表情生成路由
 处理表情生成请求
 """
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Set
+import asyncio
+import hashlib
+import json
 import logging
 import uuid
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent.parent.parent))
 
-from backend.core.expression_generator import ExpressionGenerator
-from backend.core.live2d_expression_mapper import Live2DExpressionMapper
+from backend.api.dependencies import build_expression_generator, get_live2d_mapper
+from backend.api.jobs import IdempotencyConflictError, Job, QueueFullError, get_job_manager
+from backend.core.expression_cache import get_expression_cache
+from backend.core.live2d_sequence_store import get_sequence_store
+from backend.utils.metrics import start_request_metrics
+from backend.utils.upload_catalog import get_upload_catalog
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # 目录配置
-UPLOAD_DIR = Path("data/uploads")
 EXPRESSION_DIR = Path("data/expressions")
 EXPRESSION_DIR.mkdir(parents=True, exist_ok=True)
 
-# 缓存最后生成的表情序列
-_last_live2d_sequence = None
-
 class GenerateRequest(BaseModel):
     file_id: str
     model_name: str = "default"
     time_resolution: float = 0.1
     enable_smoothing: bool = True
-
-@router.post("/generate")
+    pitch_method: Literal["piptrack", "yin"] = "piptrack"
+    streaming: bool = False
+    parallel: bool = False
+    n_clusters: Optional[int] = None
+    cluster_blend: bool = False
+    keyframe_mode: Literal["grid", "adaptive"] = "grid"
+    snap_to_beats: bool = False
+    max_keyframe_spacing: Optional[float] = None
+    expression_backend: Optional[Literal["llm", "local", "auto"]] = None
+    session_id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+# 生成流水线各阶段在整体进度中的 (起点, 占比)
+GENERATION_STAGES = {
+    "decode": (0.0, 0.1),
+    "features": (0.1, 0.25),
+    "emotion": (0.35, 0.1),
+    "timeline": (0.45, 0.02),
+    "keyframes": (0.47, 0.38),
+    "smoothing": (0.85, 0.02),
+    "export": (0.87, 0.03),
+    "mapping": (0.9, 0.1),
+}
+# 事件流心跳间隔（秒），防止代理断开空闲连接
+EVENT_STREAM_HEARTBEAT_SECONDS = 15.0
+# 不影响生成结果、不参与请求合并的参数
+FINGERPRINT_EXCLUDE = {"session_id", "streaming", "parallel", "idempotency_key"}
+# 等待合并任务结束后关联会话的后台协程（保留引用，避免被回收）
+_session_tasks: Set[asyncio.Task] = set()
+
+
+@router.post("/generate", status_code=202)
 async def generate_expression(request: GenerateRequest):
     """
-    生成表情动画
+    提交表情生成任务（立即返回任务ID，通过 /jobs/{job_id} 查询进度与结果）
 
     Args:
         request: 生成请求参数
 
     Returns:
-        dict: 生成结果
+        dict: 任务信息；队列已满时返回429并附带 Retry-After
     """
+    # 按文件ID查找上传记录（同步SQLite查询放到线程池，不阻塞事件循环）
+    record = await run_in_threadpool(get_upload_catalog().get, request.file_id)
+    audio_path = Path(record["path"]) if record else None
+    if audio_path is None or not audio_path.exists():
+        raise HTTPException(status_code=404, detail="音频文件不存在")
+
+    # 相同文件、相同内容与参数的并发请求合并到同一个任务
+    fingerprint = _request_fingerprint(request, record["content_hash"])
     try:
-        # 查找音频文件
-        audio_path = None
-        for f in UPLOAD_DIR.glob(f"{request.file_id}.*"):
-            audio_path = f
-            break
-
-        if not audio_path or not audio_path.exists():
-            raise HTTPException(status_code=404, detail="音频文件不存在")
-
-        # 生成表情
-        generator = ExpressionGenerator()
-
-        expression_data = generator.generate_from_audio(
-            audio_path=str(audio_path),
-            time_resolution=request.time_resolution,
-            enable_smoothing=request.enable_smoothing
+        job, reused = get_job_manager().submit(
+            "generate",
+            lambda job: _run_generation(request, audio_path, job),
+            dedupe_key=fingerprint,
+            idempotency_key=request.idempotency_key
         )
-
-        # 保存表情文件
-        expression_id = str(uuid.uuid4())
-        output_path = EXPRESSION_DIR / f"{expression_id}.json"
-
-        generator.export_to_file(
-            expression_data=expression_data,
-            output_path=str(output_path)
-        )
-
-        logger.info(f"表情生成完成: {expression_id}")
-
-        # 使用Live2D表情映射器生成表情序列
-        try:
-            mapper = Live2DExpressionMapper()
-            live2d_sequence = mapper.map_emotions_to_expressions(
-                emotion_scores=expression_data["emotion_scores"],
-                duration=expression_data["duration"]
-            )
-            logger.info(f"Live2D表情序列生成完成: {live2d_sequence}")
-            
-            # 缓存表情序列
-            global _last_live2d_sequence
-            _last_live2d_sequence = live2d_sequence
-        except Exception as e:
-            logger.error(f"Live2D表情映射失败: {e}")
-            live2d_sequence = ["0"]
-            _last_live2d_sequence = live2d_sequence
-
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        logger.warning(f"表情生成任务被拒绝: {e}")
         return JSONResponse(
-            status_code=200,
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
             content={
-                "success": True,
-                "message": "表情生成完成",
-                "data": {
-                    "expression_id": expression_id,
-                    "file_id": request.file_id,
-                    "model_name": request.model_name,
-                    "expression_path": str(output_path),
-                    "duration": expression_data["duration"],
-                    "tempo": expression_data["tempo"],
-                    "keyframe_count": len(expression_data["expressions"]),
-                    "emotion_scores": expression_data["emotion_scores"],
-                    "live2d_sequence": live2d_sequence
-                }
+                "success": False,
+                "message": "任务队列已满，请稍后重试",
+                "error": str(e),
+                "retry_after": e.retry_after
             }
         )
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"表情生成失败: {error_msg}", exc_info=True)
-        
-        # 返回详细的错误信息给前端
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "表情生成失败",
-                "error": error_msg,
-                "error_type": type(e).__name__,
-                "details": {
-                    "file_id": request.file_id,
-                    "error_location": "expression_generator"
-                }
+    if reused and request.session_id:
+        # 合并到的任务可能由其他会话发起，结束后把生成的序列也记为本会话的最新序列
+        task = asyncio.create_task(_attach_session(job, request.session_id))
+        _session_tasks.add(task)
+        task.add_done_callback(_session_tasks.discard)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "message": "已复用相同请求的任务" if reused else "表情生成任务已提交",
+            "data": {
+                "job_id": job.job_id,
+                "status": job.status,
+                "reused": reused
             }
+        }
+    )
+
+
+def _request_fingerprint(request: GenerateRequest, content_hash: str) -> str:
+    """请求指纹：音频内容哈希 + 影响生成结果的请求参数（会话、分析方式与幂等键除外）"""
+    params = request.model_dump(exclude=FINGERPRINT_EXCLUDE)
+    params["content_hash"] = content_hash
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def _attach_session(job: Job, session_id: str):
+    """
+    等待任务结束，成功时将生成的Live2D序列设为会话的最新序列
+
+    Args:
+        job: 合并到的任务
+        session_id: 会话ID
+    """
+    cursor = 0
+    while not job.finished:
+        events = await job.wait_events(cursor, EVENT_STREAM_HEARTBEAT_SECONDS)
+        if events:
+            cursor = events[-1][0]
+    if job.status == "succeeded":
+        await run_in_threadpool(get_sequence_store().attach, job.result["expression_id"], session_id)
+
+
+async def _run_generation(request: GenerateRequest, audio_path: Path, job: Job) -> Dict[str, Any]:
+    """
+    执行表情生成流水线（在后台worker中运行）
+
+    Args:
+        request: 生成请求参数
+        audio_path: 音频文件路径
+        job: 当前任务，用于上报阶段进度
+
+    Returns:
+        Dict: 生成结果（与原同步接口的 data 字段相同，另附各阶段耗时明细 timings）
+    """
+    request_metrics = start_request_metrics()
+    def report(stage: str, progress: float):
+        start, span = GENERATION_STAGES[stage]
+        job.update(stage, start + span * progress)
+
+    def publish_keyframes(start: int, expressions: List[Dict[str, Any]], total: int):
+        job.publish("keyframes", {
+            "start": start,
+            "count": len(expressions),
+            "total": total,
+            "expressions": expressions
+        })
+
+    # 生成表情（分析器与表情代理为进程内共享实例）
+    generator = build_expression_generator(request.expression_backend)
+
+    expression_data = await generator.agenerate_from_audio(
+        audio_path=str(audio_path),
+        time_resolution=request.time_resolution,
+        enable_smoothing=request.enable_smoothing,
+        pitch_method=request.pitch_method,
+        streaming=request.streaming,
+        parallel=request.parallel,
+        n_clusters=request.n_clusters,
+        cluster_blend=request.cluster_blend,
+        keyframe_mode=request.keyframe_mode,
+        snap_to_beats=request.snap_to_beats,
+        max_keyframe_spacing=request.max_keyframe_spacing,
+        progress_callback=report,
+        keyframe_callback=publish_keyframes
+    )
+
+    # 保存表情文件
+    report("export", 0.0)
+    expression_id = str(uuid.uuid4())
+    output_path = EXPRESSION_DIR / f"{expression_id}.json"
+
+    await run_in_threadpool(
+        generator.export_to_file,
+        expression_data=expression_data,
+        output_path=str(output_path)
+    )
+
+    logger.info(f"表情生成完成: {expression_id}")
+
+    # 使用Live2D表情映射器生成表情序列
+    report("mapping", 0.0)
+    try:
+        mapper = get_live2d_mapper()
+        live2d_sequence = await run_in_threadpool(
+            mapper.map_emotions_to_expressions,
+            emotion_scores=expression_data["emotion_scores"],
+            duration=expression_data["duration"],
+            emotion_timeline=expression_data.get("emotion_timeline")
         )
+        logger.info(f"Live2D表情序列生成完成: {live2d_sequence}")
+    except Exception as e:
+        logger.error(f"Live2D表情映射失败: {e}")
+        live2d_sequence = ["0"]
+
+    # 保存表情序列（多个worker进程共享，/getNeutralExpression 从任意worker都能读到）
+    await run_in_threadpool(
+        get_sequence_store().put,
+        expression_id, live2d_sequence,
+        session_id=request.session_id, file_id=request.file_id
+    )
+
+    return {
+        "expression_id": expression_id,
+        "file_id": request.file_id,
+        "model_name": request.model_name,
+        "expression_path": str(output_path),
+        "duration": expression_data["duration"],
+        "tempo": expression_data["tempo"],
+        "keyframe_count": len(expression_data["expressions"]),
+        "emotion_scores": expression_data["emotion_scores"],
+        "expression_backend": expression_data["metadata"]["expression_backend"],
+        "live2d_sequence": live2d_sequence,
+        "timings": request_metrics.to_dict()
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    查询后台任务状态
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        dict: 任务状态、当前阶段、整体进度，完成后包含结果或错误信息
+    """
+    job = await run_in_threadpool(get_job_manager().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": job.status != "failed",
+            "message": "任务状态获取成功",
+            "data": job.to_dict()
+        }
+    )
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, after: int = 0):
+    """
+    以 Server-Sent Events 推送任务事件：stage（阶段与整体进度）、keyframes（按时间顺序的部分关键帧）、
+    done（最终结果）或 error；断线重连时通过 Last-Event-ID 或 after 参数从指定事件之后续传
+
+    Args:
+        job_id: 任务ID
+        request: HTTP请求
+        after: 已收到的最后一个事件ID
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+    job = await run_in_threadpool(get_job_manager().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+
+    last_event_id = request.headers.get("last-event-id")
+    cursor = int(last_event_id) if last_event_id and last_event_id.isdigit() else after
+
+    async def event_stream():
+        nonlocal cursor
+        while True:
+            if await request.is_disconnected():
+                return
+            events = await job.wait_events(cursor, EVENT_STREAM_HEARTBEAT_SECONDS)
+            if not events:
+                if job.finished and cursor >= len(job.events):
+                    return
+                yield ": ping\n\n"
+                continue
+            for event_id, event, data in events:
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                cursor = event_id
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs")
+async def get_job_stats():
+    """
+    获取任务队列统计
+
+    Returns:
+        dict: worker数、队列深度、排队数与各状态任务数
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "任务队列统计获取成功",
+            "data": get_job_manager().stats()
+        }
+    )
 
 @router.get("/expression/{expression_id}")
 async def get_expression(expression_id: str):
@@ -148,7 +349,6 @@ async def get_expression(expression_id: str):
         if not expression_path.exists():
             raise HTTPException(status_code=404, detail="表情文件不存在")
 
-        import json
         with open(expression_path, 'r', encoding='utf-8') as f:
             expression_data = json.load(f)
 
@@ -168,6 +368,29 @@ async def get_expression(expression_id: str):
         raise HTTPException(status_code=500, detail=f"获取表情数据失败: {str(e)}")
 
 
+@router.get("/cache/expressions/stats")
+async def get_expression_cache_stats():
+    """
+    获取表情参数缓存统计（所有worker累计的命中/未命中次数与条目数）
+
+    Returns:
+        dict: 缓存统计
+    """
+    try:
+        stats = await run_in_threadpool(get_expression_cache().stats)
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "message": "缓存统计获取成功",
+                "data": stats
+            }
+        )
+    except Exception as e:
+        logger.error(f"获取缓存统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取缓存统计失败: {str(e)}")
+
+
 @router.get("/live2d/expressions")
 async def get_live2d_expressions():
     """
@@ -177,7 +400,7 @@ async def get_live2d_expressions():
         dict: Live2D表情配置
     """
     try:
-        mapper = Live2DExpressionMapper()
+        mapper = get_live2d_mapper()
         config = mapper.get_expression_info()
         
         return JSONResponse(
@@ -194,16 +417,27 @@ async def get_live2d_expressions():
 
 
 @router.get("/getNeutralExpression")
-async def get_neutral_expression():
+async def get_neutral_expression(
+    session_id: Optional[str] = None,
+    expression_id: Optional[str] = None
+):
     """
-    获取上次生成的Live2D表情序列
+    获取Live2D表情序列（默认为最近一次生成的序列）
+
+    Args:
+        session_id: 会话ID，指定时返回该会话最近一次生成的序列
+        expression_id: 表情ID，指定时返回该次生成的序列
 
     Returns:
         dict: 包含live2d_sequence的响应
     """
-    global _last_live2d_sequence
-    
-    if _last_live2d_sequence is None:
+    store = get_sequence_store()
+    if expression_id:
+        record = await run_in_threadpool(store.get, expression_id)
+    else:
+        record = await run_in_threadpool(store.latest, session_id)
+
+    if record is None:
         return JSONResponse(
             status_code=200,
             content={
@@ -220,8 +454,6 @@ async def get_neutral_expression():
         content={
             "success": True,
             "message": "获取表情序列成功",
-            "data": {
-                "live2d_sequence": _last_live2d_sequence
-            }
+            "data": record
         }
     )
@@ -3,31 +3,171 @@
 处理音频文件上传
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+import hashlib
+import os
+import threading
 import uuid
-import shutil
 from pathlib import Path
 import logging
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from backend.api.prefetch import get_analysis_prefetcher
+from backend.utils.upload_catalog import get_upload_catalog
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 配置上传目录
+# 配置上传目录；音频按内容哈希存放在 blobs 子目录，相同内容只存一份
 UPLOAD_DIR = Path("data/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_DIR = UPLOAD_DIR / "blobs"
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
 
 # 允许的文件类型
 ALLOWED_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.ogg'}
 
+# 上传大小上限与分块写入大小
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "200")) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+# multipart 边界与表单头部的额外字节（请求体上限 = 文件上限 + 该值）
+UPLOAD_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# 保护"复用已有内容 + 登记"与"检查引用 + 删除内容"两组操作，避免删除正被新上传复用的内容
+_blob_lock = threading.Lock()
+
+# 上传后是否默认在后台预先分析（请求参数 prefetch 可覆盖）
+UPLOAD_PREFETCH_ANALYSIS = os.getenv("UPLOAD_PREFETCH_ANALYSIS", "false").lower() in ("1", "true", "yes")
+
+
+class UploadTooLargeError(Exception):
+    """上传内容超过大小上限"""
+
+
+def _too_large_detail() -> str:
+    return f"文件超过大小限制 ({UPLOAD_MAX_BYTES / (1024 * 1024):g} MB)"
+
+
+class UploadSizeLimitMiddleware:
+    """
+    上传请求体大小限制：声明的 Content-Length 超限时直接返回413，不读取请求体；
+    分块传输或未声明长度的请求在读取过程中累计字节数，超限时立即中止并返回413
+    （FastAPI 在路由执行前就会把整个 multipart 请求体读入 UploadFile，路由内的检查来不及）
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].endswith("/upload"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = UPLOAD_MAX_BYTES + UPLOAD_MULTIPART_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": _too_large_detail()})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # 在请求体解析中抛出的 HTTPException 会被 FastAPI 原样传递给异常处理
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _store_upload(
+    source: BinaryIO,
+    file_ext: str,
+    file_id: str,
+    filename: Optional[str]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    分块写入临时文件并同时计算SHA-256，超过上限立即中止；
+    完成后按内容哈希放入 blobs 目录（已有相同内容时丢弃新写入的副本），并登记到上传文件目录
+
+    Args:
+        source: 上传内容
+        file_ext: 文件扩展名
+        file_id: 文件ID
+        filename: 原始文件名
+
+    Returns:
+        Tuple[Dict, bool]: (上传文件目录中的记录, 是否复用了已有内容)
+
+    Raises:
+        UploadTooLargeError: 超过 UPLOAD_MAX_BYTES
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    tmp_path = BLOB_DIR / f".{uuid.uuid4().hex}.part"
+    try:
+        with tmp_path.open("wb") as buffer:
+            for chunk in iter(lambda: source.read(UPLOAD_CHUNK_BYTES), b""):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadTooLargeError(_too_large_detail())
+                sha256.update(chunk)
+                buffer.write(chunk)
+
+        content_hash = sha256.hexdigest()
+        blob_path = BLOB_DIR / f"{content_hash}{file_ext}"
+        # 复用判断与登记在同一把锁内完成：登记之前内容不会被并发的删除移除
+        with _blob_lock:
+            deduplicated = blob_path.exists()
+            if not deduplicated:
+                os.replace(tmp_path, blob_path)
+            record = get_upload_catalog().add(
+                file_id, str(blob_path), filename=filename, content_hash=content_hash
+            )
+        return record, deduplicated
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _delete_upload(file_id: str) -> Optional[Dict[str, Any]]:
+    """
+    移除上传记录；内容存储由多个文件ID共享，最后一个引用删除时才删除文件
+
+    Args:
+        file_id: 文件ID
+
+    Returns:
+        Optional[Dict]: 被删除的记录，不存在时返回None
+    """
+    catalog = get_upload_catalog()
+    with _blob_lock:
+        record = catalog.remove(file_id)
+        if record is not None and catalog.references(record["path"]) == 0:
+            Path(record["path"]).unlink(missing_ok=True)
+    return record
+
+
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...),
+    prefetch: Optional[bool] = None
+):
     """
-    上传音频文件
+    上传音频文件（分块写入并计算内容哈希，相同内容的文件共享存储）
 
     Args:
         file: 上传的音频文件
+        prefetch: 是否立即在后台预分析，默认读取 UPLOAD_PREFETCH_ANALYSIS
 
     Returns:
         dict: 包含文件ID和基本信息
@@ -43,13 +183,25 @@ async def upload_file(file: UploadFile = File(...)):
 
         # 生成唯一文件ID
         file_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
 
-        # 保存文件
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 分块保存文件并登记到上传文件目录（在线程池中执行，不阻塞事件循环）
+        try:
+            record, deduplicated = await run_in_threadpool(
+                _store_upload, file.file, file_ext, file_id, file.filename
+            )
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        file_path = Path(record["path"])
+        content_hash = record["content_hash"]
 
-        logger.info(f"文件上传成功: {file.filename} -> {file_id}")
+        logger.info(
+            f"文件上传成功: {file.filename} -> {file_id}"
+            + (f" (复用已有内容 {content_hash[:12]})" if deduplicated else "")
+        )
+
+        # 用户上传后几乎总会请求分析，提前在后台按默认参数分析，结果进入特征缓存
+        if prefetch if prefetch is not None else UPLOAD_PREFETCH_ANALYSIS:
+            get_analysis_prefetcher().submit(file_id, str(file_path))
 
         return JSONResponse(
             status_code=200,
@@ -60,7 +212,12 @@ async def upload_file(file: UploadFile = File(...)):
                     "file_id": file_id,
                     "filename": file.filename,
                     "file_path": str(file_path),
-                    "file_size": file_path.stat().st_size
+                    "file_size": record["size"],
+                    "content_hash": record["content_hash"],
+                    "duration": record["duration"],
+                    "sample_rate": record["sample_rate"],
+                    "deduplicated": deduplicated,
+                    "analysis": get_analysis_prefetcher().status(file_id)
                 }
             }
         )
@@ -83,15 +240,12 @@ async def delete_file(file_id: str):
         dict: 删除结果
     """
     try:
-        # 查找并删除文件
-        deleted = False
-        for file_path in UPLOAD_DIR.glob(f"{file_id}.*"):
-            file_path.unlink()
-            deleted = True
-            logger.info(f"文件已删除: {file_id}")
-
-        if not deleted:
+        # 取消进行中的预分析，再从上传文件目录移除记录并删除文件
+        get_analysis_prefetcher().cancel(file_id)
+        record = await run_in_threadpool(_delete_upload, file_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="文件不存在")
+        logger.info(f"文件已删除: {file_id}")
 
         return JSONResponse(
             status_code=200,
@@ -122,13 +276,10 @@ async def get_file_info(file_id: str):
         dict: 文件信息
     """
     try:
-        # 查找文件
-        file_path = None
-        for path in UPLOAD_DIR.glob(f"{file_id}.*"):
-            file_path = path
-            break
-
-        if not file_path or not file_path.exists():
+        # 查找上传记录（同步SQLite查询放到线程池，不阻塞事件循环）
+        record = await run_in_threadpool(get_upload_catalog().get, file_id)
+        file_path = Path(record["path"]) if record else None
+        if file_path is None or not file_path.exists():
             raise HTTPException(status_code=404, detail="文件不存在")
 
         return JSONResponse(
@@ -140,8 +291,14 @@ async def get_file_info(file_id: str):
                     "file_id": file_id,
                     "filename": file_path.name,
                     "file_path": str(file_path),
-                    "file_size": file_path.stat().st_size,
-                    "file_type": file_path.suffix.lower()
+                    "file_size": record["size"],
+                    "file_type": file_path.suffix.lower(),
+                    "original_filename": record["filename"],
+                    "content_hash": record["content_hash"],
+                    "duration": record["duration"],
+                    "sample_rate": record["sample_rate"],
+                    "created_at": record["created_at"],
+                    "analysis": get_analysis_prefetcher().status(file_id)
                 }
             }
         )
@@ -4,6 +4,11 @@ Backend Core Module
 from .audio_analyzer import AudioAnalyzerAgent, AudioFeatures, EmotionScores
 from .langchain_agent import ExpressionAgentV2, Live2DExpression
 from .expression_generator import ExpressionGenerator
+from .feature_cache import FeatureCache, get_feature_cache
+from .expression_cache import ExpressionCache, get_expression_cache
+from .expression_index import ExpressionIndex, get_expression_index
+from .emotion_scorer import LocalEmotionScorer
+from .expression_engine import RuleExpressionEngine
 
 # 向后兼容：提供旧的类名
 AudioAnalyzer = AudioAnalyzerAgent
@@ -16,4 +21,12 @@ __all__ = [
     'ExpressionAgentV2',
     'Live2DExpression',
     'ExpressionGenerator',
+    'FeatureCache',
+    'get_feature_cache',
+    'ExpressionCache',
+    'get_expression_cache',
+    'ExpressionIndex',
+    'get_expression_index',
+    'LocalEmotionScorer',
+    'RuleExpressionEngine',
 ]
@@ -3,8 +3,11 @@ AI模型配置模块
 统一管理AI API配置，支持Google Gemini和OpenAI兼容API
 """
 import os
+import threading
 from typing import Dict, Any, Optional
 
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
 
 class AIConfig:
     """AI配置管理类"""
@@ -16,6 +19,8 @@ class AIConfig:
     DEFAULT_TEMP_EMOTION = 0.3
     DEFAULT_TEMP_EXPRESSION = 0.7
     DEFAULT_MAX_TOKENS = 1000
+    DEFAULT_EMOTION_BACKEND = "llm"
+    DEFAULT_EXPRESSION_BACKEND = "llm"
     
     @staticmethod
     def get_use_gemini() -> bool:
@@ -48,6 +53,16 @@ class AIConfig:
             return os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
         return None
     
+    @staticmethod
+    def get_emotion_backend() -> str:
+        """获取情感分析后端 (llm / local / auto)"""
+        return os.getenv("EMOTION_BACKEND", AIConfig.DEFAULT_EMOTION_BACKEND).lower()
+    
+    @staticmethod
+    def get_expression_backend() -> str:
+        """获取表情生成后端 (llm / local / auto)"""
+        return os.getenv("EXPRESSION_BACKEND", AIConfig.DEFAULT_EXPRESSION_BACKEND).lower()
+    
     @staticmethod
     def get_analyzer_config() -> Dict[str, Any]:
         """
@@ -65,6 +80,7 @@ class AIConfig:
             "base_url": AIConfig.get_base_url(),
             "temperature": float(os.getenv("AI_TEMP_EMOTION", str(AIConfig.DEFAULT_TEMP_EMOTION))),
             "max_tokens": int(os.getenv("AI_MAX_TOKENS", str(AIConfig.DEFAULT_MAX_TOKENS))),
+            "emotion_backend": AIConfig.get_emotion_backend(),
         }
     
     @staticmethod
@@ -105,3 +121,32 @@ class AIConfig:
         
         return True, ""
 
+
+_rate_limiters: Dict[str, Optional[InMemoryRateLimiter]] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(use_gemini: bool) -> Optional[InMemoryRateLimiter]:
+    """
+    获取进程内按服务商共享的LLM请求限速器
+
+    同一服务商的所有模型实例共用一个令牌桶，限速通过 GOOGLE_RATE_LIMIT_RPS /
+    OPENAI_RATE_LIMIT_RPS（每秒请求数，0或未设置表示不限速）配置
+
+    Args:
+        use_gemini: 是否为Gemini
+
+    Returns:
+        InMemoryRateLimiter: 限速器，未配置限速时返回None
+    """
+    provider = "gemini" if use_gemini else "openai"
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            env_name = "GOOGLE_RATE_LIMIT_RPS" if use_gemini else "OPENAI_RATE_LIMIT_RPS"
+            requests_per_second = float(os.getenv(env_name, "0"))
+            _rate_limiters[provider] = InMemoryRateLimiter(
+                requests_per_second=requests_per_second,
+                check_every_n_seconds=0.05,
+                max_bucket_size=max(1.0, requests_per_second)
+            ) if requests_per_second > 0 else None
+        return _rate_limiters[provider]
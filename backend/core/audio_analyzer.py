@@ -4,10 +4,15 @@
 """
 import librosa
 import numpy as np
-from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+import soundfile as sf
+import soxr
+from typing import Callable, Dict, List, Tuple, Optional, Any, Iterator, TYPE_CHECKING
+from dataclasses import dataclass, field
+import json
 import logging
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
 from langchain_core.prompts import (
@@ -17,12 +22,30 @@ from langchain_core.prompts import (
 )
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+
+from backend.utils.file_utils import compute_file_hash
+from backend.utils.pcm_cache import PCMCache
+from backend.utils.metrics import record_cache, stage_timer, timed
+from backend.utils.single_flight import SingleFlight
+from .ai_config import AIConfig
+from .llm_registry import get_chat_model
+from .emotion_scorer import LocalEmotionScorer
+
+if TYPE_CHECKING:
+    from .feature_cache import FeatureCache
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+
+# 进程内所有分析器共享：合并相同内容与参数的并发分析
+_analysis_flight = SingleFlight()
+
+
+def _ignore_progress(stage: str, progress: float):
+    """未指定进度回调时的默认实现"""
+
+
 class EmotionScores(BaseModel):
     """情感分数模型"""
     happy: float = Field(description="快乐程度 (0-1)", ge=0.0, le=1.0)
@@ -44,11 +67,52 @@ class AudioFeatures:
     mfcc: np.ndarray
     emotion_scores: Dict[str, float]
     timestamps: List[float]
+    # 分段情感时间线：[{'start', 'end', 'emotion_scores'}]，按时间排序
+    emotion_timeline: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class SpectralFrontEnd:
+    """共享频谱前端：每个音频只计算一次STFT/mel/onset，供所有特征提取器复用"""
+    y: np.ndarray
+    sr: int
+    hop_length: int
+    n_fft: int
+    magnitude: np.ndarray          # STFT幅度谱 (1 + n_fft // 2, n_frames)
+    mel_db: np.ndarray             # 对数mel谱 (n_mels, n_frames)
+    onset_env: np.ndarray          # onset强度包络 (n_frames,)
+    rms: np.ndarray                # 原始RMS能量 (n_frames,)
+    spectral_centroid: np.ndarray  # 原始频谱质心，单位Hz (n_frames,)
+    center: bool = True            # 帧是否以hop位置为中心（流式分块时为False）
+
+    @property
+    def n_frames(self) -> int:
+        return self.magnitude.shape[1]
 
 
 class AudioAnalyzerAgent:
     """基于LangChain的音频分析代理 - 完全AI驱动"""
 
+    # 支持的音高提取方式：piptrack(完整精度) / yin(降采样，低开销)
+    PITCH_METHODS = ("piptrack", "yin")
+    # 情感分析后端：llm(远程模型) / local(本地参数模型) / auto(优先LLM，失败时回退本地)
+    EMOTION_BACKENDS = ("llm", "local", "auto")
+    YIN_SAMPLE_RATE = 11025
+    # 流式分析每个块包含的帧数（hop=512时约12秒）
+    STREAM_BLOCK_FRAMES = 1024
+    # mel谱转dB的固定下限（-100dB，参考值固定为1.0）：不依赖块内最大值，
+    # 流式/并行分块的MFCC与onset和整段分析一致
+    MEL_DB_AMIN = 1e-10
+    # 与 librosa.feature.tempo 默认 ac_size 一致的自相关窗口（秒）
+    TEMPOGRAM_SECONDS = 8.0
+    # 并行分析：每块最短时长（秒）与块间重叠帧数（覆盖STFT/onset/YIN重采样的边界效应）
+    PARALLEL_MIN_CHUNK_SECONDS = 30.0
+    PARALLEL_OVERLAP_FRAMES = 64
+    # 分段情感分析的默认段长（秒），与表情映射的分段粒度一致；<=0 时只做整体情感分析
+    EMOTION_SEGMENT_SECONDS = 6.0
+    # 批量情感分析时每段预留的输出token数
+    EMOTION_SEGMENT_TOKENS = 60
+
     def __init__(
         self,
         sample_rate: int = 44100,
@@ -58,7 +122,13 @@ class AudioAnalyzerAgent:
         model_name: str = "gpt-4.1",
         temperature: float = 0.3,
         max_tokens: int = 500,
-        use_gemini: bool = False
+        use_gemini: bool = False,
+        pitch_method: str = "piptrack",
+        feature_cache: Optional["FeatureCache"] = None,
+        pcm_cache: Optional[PCMCache] = None,
+        max_workers: Optional[int] = None,
+        emotion_backend: Optional[str] = None,
+        emotion_segment_seconds: Optional[float] = None
     ):
         """
         初始化音频分析代理
@@ -72,10 +142,37 @@ class AudioAnalyzerAgent:
             temperature: 温度参数
             max_tokens: 最大token数
             use_gemini: 是否使用Gemini（默认True）
+            pitch_method: 音高提取方式 (piptrack / yin)
+            feature_cache: 特征缓存，命中时跳过解码与分析
+            pcm_cache: 解码PCM缓存，命中时跳过解码与重采样
+            max_workers: 并行分析的进程数，默认读取 ANALYSIS_WORKERS 或CPU核数
+            emotion_backend: 情感分析后端 (llm / local / auto)，默认读取 EMOTION_BACKEND
+            emotion_segment_seconds: 分段情感时间线的段长（秒），默认读取 EMOTION_SEGMENT_SECONDS
         """
         self.sample_rate = sample_rate
         self.hop_length = hop_length
         self.frame_length = 2048
+        self.pitch_method = self._check_pitch_method(pitch_method)
+        self.feature_cache = feature_cache
+        self.pcm_cache = pcm_cache
+        self.max_workers = max_workers or int(os.getenv("ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+
+        # 情感分析后端
+        self.emotion_backend = emotion_backend or AIConfig.get_emotion_backend()
+        if self.emotion_backend not in self.EMOTION_BACKENDS:
+            raise ValueError(
+                f"不支持的情感分析后端: {self.emotion_backend}，可选: {', '.join(self.EMOTION_BACKENDS)}"
+            )
+        if emotion_segment_seconds is None:
+            emotion_segment_seconds = float(
+                os.getenv("EMOTION_SEGMENT_SECONDS", str(self.EMOTION_SEGMENT_SECONDS))
+            )
+        self.emotion_segment_seconds = emotion_segment_seconds
+        self.emotion_model_path = os.getenv("EMOTION_MODEL_PATH")
+        self.emotion_scorer = (
+            LocalEmotionScorer.from_file(self.emotion_model_path) if self.emotion_model_path
+            else LocalEmotionScorer()
+        )
         
         # AI配置
         self.use_gemini = use_gemini
@@ -91,7 +188,15 @@ class AudioAnalyzerAgent:
         self.temperature = temperature
         self.max_tokens = max_tokens
         
+        self.llm = None
+        if self.emotion_backend == "local":
+            logger.info("使用本地情感评分器，跳过LLM初始化")
+            return
+
         if not self.api_key:
+            if self.emotion_backend == "auto":
+                logger.warning("未找到 API 密钥，情感分析将只使用本地评分器")
+                return
             raise ValueError("未找到 API 密钥，请设置 GOOGLE_API_KEY 或 OPENAI_API_KEY 环境变量")
         
         # 初始化LLM
@@ -101,27 +206,15 @@ class AudioAnalyzerAgent:
     def _setup_llm(self):
         """初始化LLM"""
         try:
-            if self.use_gemini:
-                llm_kwargs = {
-                    "model": self.model_name,
-                    "temperature": self.temperature,
-                    "max_output_tokens": self.max_tokens,
-                    "google_api_key": self.api_key,
-                }
-                self.llm = ChatGoogleGenerativeAI(**llm_kwargs)
-                logger.info(f"Google Gemini LLM 初始化成功: {self.model_name}")
-            else:
-                llm_kwargs = {
-                    "model": self.model_name,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens,
-                    "api_key": self.api_key,
-                }
-                if self.base_url:
-                    llm_kwargs["base_url"] = self.base_url
-                    logger.info(f"使用自定义 base_url: {self.base_url}")
-                self.llm = ChatOpenAI(**llm_kwargs)
-                logger.info(f"OpenAI LLM 初始化成功: {self.model_name}")
+            # 相同配置的分析器共享同一个模型实例与HTTP连接池
+            self.llm = get_chat_model(
+                use_gemini=self.use_gemini,
+                model_name=self.model_name,
+                temperature=self.temperature,
+                api_key=self.api_key,
+                max_tokens=self.max_tokens,
+                base_url=None if self.use_gemini else self.base_url
+            )
         except Exception as e:
             logger.error(f"LLM 初始化失败: {e}")
             raise
@@ -166,48 +259,161 @@ class AudioAnalyzerAgent:
         
         self.emotion_parser = JsonOutputParser(pydantic_object=EmotionScores)
 
-    def analyze(self, audio_path: str) -> AudioFeatures:
+        # 分段情感时间线：所有分段在一次调用中批量分析
+        timeline_template = """请分别分析以下 {segment_count} 个音频分段的情感分布。
+每个分段包含起止时间(秒)和该段的特征：tempo(BPM)、energy(能量强度)、spectral_centroid(频谱质心)、zero_crossing_rate(零交叉率)。
+
+分段特征：
+{segments}
+
+请按输入顺序为每个分段返回一组情感分数，格式：
+{{"segments": [{{"happy": 0.0, "sad": 0.0, "energetic": 0.0, "calm": 0.0, "angry": 0.0}}, ...]}}
+segments 数组长度必须为 {segment_count}："""
+
+        self.emotion_timeline_prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(system_template),
+            HumanMessagePromptTemplate.from_template(timeline_template)
+        ])
+
+        self.emotion_timeline_parser = JsonOutputParser()
+
+        # 链只编译一次；分段链按输出token上限缓存
+        self.emotion_chain = self.emotion_prompt | self.llm | self.emotion_parser
+        self._timeline_chains: Dict[int, Any] = {}
+
+    def _emotion_timeline_chain(self, max_tokens: int):
+        """获取绑定了输出token上限的分段情感链（按上限缓存）"""
+        chain = self._timeline_chains.get(max_tokens)
+        if chain is None:
+            token_kwarg = "max_output_tokens" if self.use_gemini else "max_tokens"
+            llm = self.llm.bind(**{token_kwarg: max_tokens})
+            chain = self.emotion_timeline_prompt | llm | self.emotion_timeline_parser
+            self._timeline_chains[max_tokens] = chain
+        return chain
+
+    def analyze(
+        self,
+        audio_path: str,
+        pitch_method: Optional[str] = None,
+        streaming: bool = False,
+        parallel: bool = False,
+        progress_callback: Optional[Callable[[str, float], None]] = None
+    ) -> AudioFeatures:
         """
         分析音频文件，提取所有特征
 
         Args:
             audio_path: 音频文件路径
+            pitch_method: 本次分析使用的音高提取方式，默认沿用实例配置
+            streaming: 是否使用分块流式分析（内存占用与时长无关）
+            parallel: 是否将长音频切块后多进程并行分析（降低单次延迟）
+            progress_callback: 阶段进度回调，参数为 (阶段名, 阶段内进度0-1)，
+                阶段依次为 decode / features / emotion（在分析线程中调用）
 
         Returns:
             AudioFeatures: 提取的音频特征
         """
         logger.info(f"开始分析音频文件: {audio_path}")
+        pitch_method = self._check_pitch_method(pitch_method or self.pitch_method)
+        report = progress_callback or _ignore_progress
+
+        key_params = {
+            "sample_rate": self.sample_rate,
+            "hop_length": self.hop_length,
+            "pitch_method": pitch_method,
+            "emotion_backend": self.emotion_backend,
+            "emotion_segment_seconds": self.emotion_segment_seconds,
+            # 本地评分器用于 local 后端与 auto 回退；不同的情感模型/服务商给出不同的情感分数，不能共享结果
+            "emotion_model_path": self.emotion_model_path
+        }
+        if self.emotion_backend != "local":
+            key_params.update(
+                emotion_provider="gemini" if self.use_gemini else "openai",
+                emotion_base_url=self.base_url,
+                emotion_model=self.model_name,
+                emotion_temperature=self.temperature
+            )
+        cache_key = None
+        if self.feature_cache is not None:
+            cache_key = self.feature_cache.make_key(audio_path, **key_params)
+            cached = self.feature_cache.get(cache_key)
+            record_cache("feature", int(cached is not None), int(cached is None))
+            if cached is not None:
+                report("emotion", 1.0)
+                return cached
+
+        # 相同内容与参数的并发分析（重复提交、多个标签页、分析与生成同时进行）只执行一次
+        flight_key = cache_key or (compute_file_hash(audio_path), tuple(sorted(key_params.items())))
+        features, shared = _analysis_flight.do(
+            flight_key, self._analyze_uncached,
+            audio_path, pitch_method, streaming, parallel, report, cache_key
+        )
+        if shared:
+            logger.info(f"复用进行中的分析结果: {audio_path}")
+        report("emotion", 1.0)
+        return features
+
+    def _analyze_uncached(
+        self,
+        audio_path: str,
+        pitch_method: str,
+        streaming: bool,
+        parallel: bool,
+        report: Callable[[str, float], None],
+        cache_key: Optional[str]
+    ) -> AudioFeatures:
+        """执行分析并写入特征缓存（由 analyze 在合并并发调用后调用）"""
+        if cache_key is not None:
+            # 等待合并期间其他调用可能刚写入缓存
+            cached = self.feature_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if streaming and self._supports_streaming(audio_path):
+            features = self._analyze_streaming(audio_path, pitch_method, report)
+        elif parallel and self.max_workers > 1:
+            features = self._analyze_parallel(audio_path, pitch_method, report)
+        else:
+            if streaming:
+                logger.warning(f"该格式不支持分块读取，回退到整段分析: {audio_path}")
+            features = self._analyze_in_memory(audio_path, pitch_method, report)
+
+        if cache_key is not None:
+            self.feature_cache.put(cache_key, features)
+        return features
 
+    def _analyze_in_memory(
+        self,
+        audio_path: str,
+        pitch_method: str,
+        report: Callable[[str, float], None] = _ignore_progress
+    ) -> AudioFeatures:
+        """整段加载音频后分析"""
         try:
             # 加载音频
-            y, sr = librosa.load(audio_path, sr=self.sample_rate)
+            report("decode", 0.0)
+            y, sr = self._load_audio(audio_path)
             duration = librosa.get_duration(y=y, sr=sr)
+            report("features", 0.0)
+
+            # 共享频谱前端（STFT/mel/onset只计算一次）
+            frontend = self._compute_frontend(y, sr)
 
             # 提取各种特征
-            tempo, beats = self._extract_tempo_and_beats(y, sr)
-            pitch = self._extract_pitch(y, sr)
-            energy = self._extract_energy(y, sr)
-            spectral_centroid = self._extract_spectral_centroid(y, sr)
-            mfcc = self._extract_mfcc(y, sr)
-            emotion_scores = self._analyze_emotion(y, sr)
-
-            # 生成时间戳
-            timestamps = librosa.frames_to_time(
-                np.arange(len(energy)),
-                sr=sr,
-                hop_length=self.hop_length
-            ).tolist()
-
-            features = AudioFeatures(
-                duration=duration,
-                tempo=tempo,
-                beats=beats.tolist(),
-                pitch=pitch.tolist(),
-                energy=energy.tolist(),
-                spectral_centroid=spectral_centroid.tolist(),
-                mfcc=mfcc,
-                emotion_scores=emotion_scores,
-                timestamps=timestamps
+            tempo, beats = self._extract_tempo_and_beats(frontend.onset_env, sr)
+            pitch = self._extract_pitch(frontend, pitch_method)
+            energy = self._extract_energy(frontend.rms)
+            spectral_centroid = self._extract_spectral_centroid(frontend.spectral_centroid)
+            mfcc = self._extract_mfcc(frontend)
+            report("emotion", 0.0)
+            emotion_scores, emotion_timeline = self._analyze_emotions(
+                duration, sr, tempo, beats, frontend.rms, frontend.spectral_centroid,
+                self._zero_crossing_rate(y), mfcc
+            )
+
+            features = self._build_features(
+                duration, sr, tempo, beats, pitch, energy, spectral_centroid, mfcc,
+                emotion_scores, emotion_timeline
             )
 
             logger.info(f"音频分析完成，时长: {duration:.2f}秒, BPM: {tempo:.1f}")
@@ -217,69 +423,568 @@ class AudioAnalyzerAgent:
             logger.error(f"音频分析失败: {str(e)}")
             raise
 
-    def _extract_tempo_and_beats(self, y: np.ndarray, sr: int) -> Tuple[float, np.ndarray]:
-        """提取节拍和BPM"""
-        tempo, beats = librosa.beat.beat_track(y=y, sr=sr, hop_length=self.hop_length)
+    def stream_frames(
+        self,
+        audio_path: str,
+        pitch_method: Optional[str] = None,
+        block_frames: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        分块读取音频并逐块产出帧级特征，内存占用只与块大小有关
+
+        帧与整段分析(center=True)对齐。能量/质心为未归一化的原始值，
+        yin音高未做静音门限（两者都依赖全局最大值，由调用方在结束后处理）。
+        mel谱使用固定的dB参考与下限，MFCC/onset与整段分析一致。
+
+        Args:
+            audio_path: 音频文件路径
+            pitch_method: 音高提取方式
+            block_frames: 每块帧数
+
+        Yields:
+            Dict: 单块的帧级特征，包含 start_frame / timestamps / energy /
+                spectral_centroid / pitch / onset / mfcc / zero_crossing_rate /
+                beat_candidates / samples_read
+        """
+        pitch_method = self._check_pitch_method(pitch_method or self.pitch_method)
+        block_frames = block_frames or self.STREAM_BLOCK_FRAMES
+        sr = self.sample_rate
+        prev_mel = None
+
+        for block, start_frame, samples_read in self._iter_frame_blocks(audio_path, block_frames):
+            frontend = self._compute_frontend(block, sr, center=False)
+
+            # 频谱通量跨块衔接：用上一块最后一帧作为参考
+            reference = frontend.mel_db[:, :1] if prev_mel is None else prev_mel
+            onset = np.maximum(
+                0.0, np.diff(np.hstack([reference, frontend.mel_db]), axis=1)
+            ).mean(axis=0)
+            prev_mel = frontend.mel_db[:, -1:]
+
+            if pitch_method == "yin":
+                pitch = self._extract_pitch_yin(frontend)
+            else:
+                pitch = self._extract_pitch(frontend, pitch_method)
+
+            frames = start_frame + np.arange(frontend.n_frames)
+            beat_candidates = start_frame + librosa.onset.onset_detect(
+                onset_envelope=onset, sr=sr, hop_length=self.hop_length
+            )
+
+            yield {
+                'start_frame': start_frame,
+                'timestamps': librosa.frames_to_time(frames, sr=sr, hop_length=self.hop_length),
+                'energy': frontend.rms,
+                'spectral_centroid': frontend.spectral_centroid,
+                'pitch': pitch,
+                'onset': onset,
+                'mfcc': self._extract_mfcc(frontend),
+                'zero_crossing_rate': self._zero_crossing_rate(block, center=False),
+                'beat_candidates': librosa.frames_to_time(
+                    beat_candidates, sr=sr, hop_length=self.hop_length
+                ),
+                'samples_read': samples_read
+            }
+
+    def _analyze_streaming(
+        self,
+        audio_path: str,
+        pitch_method: str,
+        report: Callable[[str, float], None] = _ignore_progress
+    ) -> AudioFeatures:
+        """流式分析：逐块累积帧级特征，结束后统一做节拍跟踪与归一化"""
+        try:
+            sr = self.sample_rate
+            rms, centroid, pitch, onset, mfcc, zcr = [], [], [], [], [], []
+            samples_read = 0
+            # 解码与特征提取逐块交替进行，按已读取的样本数上报特征阶段进度
+            report("decode", 0.0)
+            expected_samples = max(1.0, self._stream_length(audio_path))
+
+            # 整段tempogram的内存随时长线性增长，这里逐块累加其列均值来估计BPM
+            win_length = int(round(self.TEMPOGRAM_SECONDS * sr / self.hop_length))
+            tempogram_sum, tempogram_count = 0.0, 0
+            onset_tail = np.zeros(0)
+
+            for block in self.stream_frames(audio_path, pitch_method):
+                onset_ext = np.concatenate([onset_tail, block['onset']])
+                if len(onset_ext) >= win_length:
+                    tempogram = librosa.feature.tempogram(
+                        onset_envelope=onset_ext,
+                        sr=sr,
+                        hop_length=self.hop_length,
+                        win_length=win_length,
+                        center=False
+                    )
+                    tempogram_sum = tempogram_sum + tempogram.sum(axis=1)
+                    tempogram_count += tempogram.shape[1]
+                    onset_tail = onset_ext[len(onset_ext) - win_length + 1:]
+                else:
+                    onset_tail = onset_ext
+
+                rms.append(block['energy'])
+                centroid.append(block['spectral_centroid'])
+                pitch.append(block['pitch'])
+                onset.append(block['onset'])
+                mfcc.append(block['mfcc'])
+                zcr.append(block['zero_crossing_rate'])
+                samples_read = block['samples_read']
+                report("features", min(1.0, samples_read / expected_samples))
+
+            if not rms:
+                raise ValueError(f"音频内容为空: {audio_path}")
+
+            rms = np.concatenate(rms)
+            centroid = np.concatenate(centroid)
+            pitch = np.concatenate(pitch)
+            mfcc = np.hstack(mfcc)
+            duration = samples_read / sr
+
+            # 与 onset_strength(center=True) 相同的帧偏移补偿
+            lag = 1 + self.frame_length // (2 * self.hop_length)
+            onset_env = np.concatenate([np.zeros(lag), np.concatenate(onset)[1:]])[:len(rms)]
+
+            bpm = None
+            if tempogram_count:
+                bpm = float(librosa.feature.tempo(
+                    tg=(tempogram_sum / tempogram_count)[:, np.newaxis],
+                    sr=sr,
+                    hop_length=self.hop_length
+                )[0])
+            tempo, beats = self._extract_tempo_and_beats(onset_env, sr, bpm=bpm)
+            if pitch_method == "yin":
+                pitch = self._gate_silent_pitch(pitch, rms)
+            report("emotion", 0.0)
+            emotion_scores, emotion_timeline = self._analyze_emotions(
+                duration, sr, tempo, beats, rms, centroid, np.concatenate(zcr), mfcc
+            )
+
+            features = self._build_features(
+                duration,
+                sr,
+                tempo,
+                beats,
+                pitch,
+                self._extract_energy(rms),
+                self._extract_spectral_centroid(centroid),
+                mfcc,
+                emotion_scores,
+                emotion_timeline
+            )
+
+            logger.info(f"流式音频分析完成，时长: {duration:.2f}秒, BPM: {tempo:.1f}")
+            return features
+
+        except Exception as e:
+            logger.error(f"流式音频分析失败: {str(e)}")
+            raise
+
+    def _analyze_parallel(
+        self,
+        audio_path: str,
+        pitch_method: str,
+        report: Callable[[str, float], None] = _ignore_progress
+    ) -> AudioFeatures:
+        """
+        并行分析：按帧切成带重叠的块，多进程提取帧级特征后拼接，
+        再在全局做节拍跟踪、静音门限与归一化
+        """
+        try:
+            report("decode", 0.0)
+            y, sr = self._load_audio(audio_path)
+            duration = librosa.get_duration(y=y, sr=sr)
+            hop = self.hop_length
+            n_frames = 1 + len(y) // hop
+
+            min_chunk_frames = int(self.PARALLEL_MIN_CHUNK_SECONDS * sr / hop)
+            n_chunks = min(self.max_workers, n_frames // max(1, min_chunk_frames))
+            if n_chunks < 2:
+                return self._analyze_in_memory(audio_path, pitch_method, report)
+            report("features", 0.0)
+
+            # 配置了PCM缓存时，子进程直接内存映射同一份PCM，避免序列化音频数据
+            shared_pcm = self.pcm_cache is not None and isinstance(y, np.memmap)
+            bounds = np.linspace(0, n_frames, n_chunks + 1).astype(int)
+            overlap = self.PARALLEL_OVERLAP_FRAMES
+            futures = []
+            executor = _get_process_pool(self.max_workers)
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                start_sample = max(0, first - overlap) * hop
+                end_sample = min(len(y), (last + overlap) * hop)
+                keep = (first - start_sample // hop, last - start_sample // hop)
+                source = audio_path if shared_pcm else np.array(y[start_sample:end_sample])
+                futures.append(executor.submit(
+                    self._analyze_chunk, source, start_sample, end_sample, keep, pitch_method
+                ))
+            chunks = []
+            with stage_timer("analyzer", "parallel_chunks"):
+                for future in futures:
+                    chunks.append(future.result())
+                    report("features", len(chunks) / len(futures))
+            logger.info(f"并行分析完成: {n_chunks} 个分块")
+
+            rms = np.concatenate([c['rms'] for c in chunks])
+            centroid = np.concatenate([c['spectral_centroid'] for c in chunks])
+            pitch = np.concatenate([c['pitch'] for c in chunks])
+            onset_env = np.concatenate([c['onset'] for c in chunks])
+            mfcc = np.hstack([c['mfcc'] for c in chunks])
+            zcr = np.concatenate([c['zero_crossing_rate'] for c in chunks])
+
+            tempo, beats = self._extract_tempo_and_beats(onset_env, sr)
+            if pitch_method == "yin":
+                pitch = self._gate_silent_pitch(pitch, rms)
+            report("emotion", 0.0)
+            emotion_scores, emotion_timeline = self._analyze_emotions(
+                duration, sr, tempo, beats, rms, centroid, zcr, mfcc
+            )
+
+            features = self._build_features(
+                duration,
+                sr,
+                tempo,
+                beats,
+                pitch,
+                self._extract_energy(rms),
+                self._extract_spectral_centroid(centroid),
+                mfcc,
+                emotion_scores,
+                emotion_timeline
+            )
+
+            logger.info(f"并行音频分析完成，时长: {duration:.2f}秒, BPM: {tempo:.1f}")
+            return features
+
+        except Exception as e:
+            logger.error(f"并行音频分析失败: {str(e)}")
+            raise
+
+    def _analyze_chunk(
+        self,
+        source: Any,
+        start_sample: int,
+        end_sample: int,
+        keep: Tuple[int, int],
+        pitch_method: str
+    ) -> Dict[str, np.ndarray]:
+        """
+        子进程中分析单个分块，返回去掉重叠部分后的原始帧级特征
+
+        Args:
+            source: 分块信号，或已缓存PCM的音频路径
+            start_sample: 分块在全曲中的起始样本
+            end_sample: 分块在全曲中的结束样本
+            keep: 需要保留的块内帧范围 [start, stop)
+            pitch_method: 音高提取方式
+        """
+        if isinstance(source, str):
+            y, _ = self._load_audio(source)
+            source = y[start_sample:end_sample]
+
+        frontend = self._compute_frontend(np.asarray(source), self.sample_rate)
+        if pitch_method == "yin":
+            pitch = self._extract_pitch_yin(frontend)
+        else:
+            pitch = self._extract_pitch(frontend, pitch_method)
+
+        frames = slice(*keep)
+        return {
+            'rms': frontend.rms[frames],
+            'spectral_centroid': frontend.spectral_centroid[frames],
+            'pitch': pitch[frames],
+            'onset': frontend.onset_env[frames],
+            'mfcc': self._extract_mfcc(frontend)[:, frames],
+            'zero_crossing_rate': self._zero_crossing_rate(frontend.y)[frames]
+        }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """传入子进程时只保留特征提取所需的配置，不序列化LLM客户端与特征缓存"""
+        state = self.__dict__.copy()
+        for key in ('llm', 'emotion_prompt', 'emotion_parser', 'emotion_chain',
+                    'emotion_timeline_prompt', 'emotion_timeline_parser', '_timeline_chains',
+                    'feature_cache'):
+            state.pop(key, None)
+        return state
+
+    @timed("analyzer", "decode")
+    def _load_audio(self, audio_path: str) -> Tuple[np.ndarray, int]:
+        """整段加载音频（配置了PCM缓存时只解码一次）"""
+        if self.pcm_cache is not None:
+            return self.pcm_cache.load(audio_path, self.sample_rate)
+        return librosa.load(audio_path, sr=self.sample_rate)
+
+    def _supports_streaming(self, audio_path: str) -> bool:
+        """能否分块读取该文件：已有PCM缓存，或soundfile可直接读取（wav/flac/ogg/mp3等）"""
+        if self.pcm_cache is not None and self.pcm_cache.lookup(audio_path, self.sample_rate) is not None:
+            return True
+        try:
+            sf.info(audio_path)
+            return True
+        except RuntimeError:
+            return False
+
+    def _stream_length(self, audio_path: str) -> float:
+        """分块读取时预计的样本数（目标采样率），只读文件头，用于上报进度"""
+        try:
+            info = sf.info(audio_path)
+            return info.frames * self.sample_rate / info.samplerate
+        except RuntimeError:
+            # soundfile无法读取时只能来自PCM缓存
+            return len(self.pcm_cache.lookup(audio_path, self.sample_rate))
+
+    def _iter_audio_blocks(self, audio_path: str, block_size: int) -> Iterator[np.ndarray]:
+        """按固定块读取音频，转为单声道并流式重采样到目标采样率"""
+        if self.pcm_cache is not None:
+            y = self.pcm_cache.lookup(audio_path, self.sample_rate)
+            if y is not None:
+                # 已解码的PCM：直接切片内存映射，按需换页
+                for start in range(0, len(y), block_size):
+                    yield np.asarray(y[start:start + block_size], dtype=np.float32)
+                return
+
+        with sf.SoundFile(audio_path) as f:
+            resampler = None
+            if f.samplerate != self.sample_rate:
+                resampler = soxr.ResampleStream(f.samplerate, self.sample_rate, 1, dtype='float32')
+
+            while True:
+                data = f.read(block_size, dtype='float32', always_2d=True)
+                last = len(data) < block_size
+                y = data.mean(axis=1)
+                if resampler is not None:
+                    y = resampler.resample_chunk(y, last=last)
+                if len(y):
+                    yield y
+                if last:
+                    break
+
+    def _iter_frame_blocks(
+        self,
+        audio_path: str,
+        block_frames: int
+    ) -> Iterator[Tuple[np.ndarray, int, int]]:
+        """
+        将音频切成首尾重叠的帧块
+
+        首尾各补 n_fft // 2 个零，使块内 center=False 的分帧与整段 center=True 的分帧一致。
+
+        Yields:
+            (块信号, 块起始帧号, 已读取的样本数)
+        """
+        hop = self.hop_length
+        pad = self.frame_length // 2
+        block_samples = (block_frames - 1) * hop + self.frame_length
+        buffer = np.zeros(pad, dtype=np.float32)
+        start_frame = 0
+        samples_read = 0
+
+        for chunk in self._iter_audio_blocks(audio_path, block_frames * hop):
+            samples_read += len(chunk)
+            buffer = np.concatenate([buffer, chunk])
+            while len(buffer) >= block_samples:
+                yield buffer[:block_samples], start_frame, samples_read
+                buffer = buffer[block_frames * hop:]
+                start_frame += block_frames
+
+        # 剩余帧：与 center=True 相同，总帧数为 1 + n_samples // hop
+        remaining = 1 + samples_read // hop - start_frame
+        if remaining > 0:
+            needed = (remaining - 1) * hop + self.frame_length
+            buffer = np.concatenate([buffer, np.zeros(max(0, needed - len(buffer)), dtype=np.float32)])
+            yield buffer[:needed], start_frame, samples_read
+
+    def _build_features(
+        self,
+        duration: float,
+        sr: int,
+        tempo: float,
+        beats: np.ndarray,
+        pitch: np.ndarray,
+        energy: np.ndarray,
+        spectral_centroid: np.ndarray,
+        mfcc: np.ndarray,
+        emotion_scores: Dict[str, float],
+        emotion_timeline: Optional[List[Dict[str, Any]]] = None
+    ) -> AudioFeatures:
+        """组装AudioFeatures"""
+        # 生成时间戳
+        timestamps = librosa.frames_to_time(
+            np.arange(len(energy)),
+            sr=sr,
+            hop_length=self.hop_length
+        ).tolist()
+
+        return AudioFeatures(
+            duration=duration,
+            tempo=tempo,
+            beats=beats.tolist(),
+            pitch=pitch.tolist(),
+            energy=energy.tolist(),
+            spectral_centroid=spectral_centroid.tolist(),
+            mfcc=mfcc,
+            emotion_scores=emotion_scores,
+            timestamps=timestamps,
+            emotion_timeline=emotion_timeline or []
+        )
+
+    @timed("analyzer", "frontend")
+    def _compute_frontend(self, y: np.ndarray, sr: int, center: bool = True) -> SpectralFrontEnd:
+        """计算共享频谱前端"""
+        magnitude = np.abs(librosa.stft(
+            y, n_fft=self.frame_length, hop_length=self.hop_length, center=center
+        ))
+        mel = librosa.feature.melspectrogram(S=magnitude ** 2, sr=sr)
+        mel_db = librosa.power_to_db(mel, ref=1.0, amin=self.MEL_DB_AMIN, top_db=None)
+        onset_env = librosa.onset.onset_strength(
+            S=mel_db, sr=sr, hop_length=self.hop_length, center=center
+        )
+        # RMS保持时域计算（无需FFT），与原始能量曲线一致
+        rms = librosa.feature.rms(
+            y=y, frame_length=self.frame_length, hop_length=self.hop_length, center=center
+        )[0]
+        spectral_centroid = librosa.feature.spectral_centroid(
+            S=magnitude, sr=sr, n_fft=self.frame_length
+        )[0]
+
+        return SpectralFrontEnd(
+            y=y,
+            sr=sr,
+            hop_length=self.hop_length,
+            n_fft=self.frame_length,
+            magnitude=magnitude,
+            mel_db=mel_db,
+            onset_env=onset_env,
+            rms=rms,
+            spectral_centroid=spectral_centroid,
+            center=center
+        )
+
+    @timed("analyzer", "tempo")
+    def _extract_tempo_and_beats(
+        self,
+        onset_env: np.ndarray,
+        sr: int,
+        bpm: Optional[float] = None
+    ) -> Tuple[float, np.ndarray]:
+        """提取节拍和BPM（已知bpm时跳过整段tempo估计）"""
+        tempo, beats = librosa.beat.beat_track(
+            onset_envelope=onset_env,
+            sr=sr,
+            hop_length=self.hop_length,
+            bpm=bpm
+        )
         beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=self.hop_length)
-        return float(tempo), beat_times
+        return float(np.atleast_1d(tempo)[0]), beat_times
+
+    def _check_pitch_method(self, pitch_method: str) -> str:
+        """校验音高提取方式"""
+        if pitch_method not in self.PITCH_METHODS:
+            raise ValueError(
+                f"不支持的音高提取方式: {pitch_method}，可选: {', '.join(self.PITCH_METHODS)}"
+            )
+        return pitch_method
 
-    def _extract_pitch(self, y: np.ndarray, sr: int) -> np.ndarray:
+    @timed("analyzer", "pitch")
+    def _extract_pitch(
+        self,
+        frontend: SpectralFrontEnd,
+        pitch_method: Optional[str] = None
+    ) -> np.ndarray:
         """提取音高"""
+        method = self._check_pitch_method(pitch_method or self.pitch_method)
+        if method == "yin":
+            return self._gate_silent_pitch(self._extract_pitch_yin(frontend), frontend.rms)
+
         pitches, magnitudes = librosa.piptrack(
-            y=y, sr=sr, hop_length=self.hop_length
+            S=frontend.magnitude, sr=frontend.sr, hop_length=self.hop_length
         )
+        return self._dominant_pitch(pitches, magnitudes)
 
-        # 提取主要音高
-        pitch_values = []
-        for t in range(pitches.shape[1]):
-            index = magnitudes[:, t].argmax()
-            pitch = pitches[index, t] if magnitudes[index, t] > 0 else 0
-            pitch_values.append(pitch)
+    @staticmethod
+    def _dominant_pitch(pitches: np.ndarray, magnitudes: np.ndarray) -> np.ndarray:
+        """逐帧取幅度最大的音高（整矩阵一次完成），无能量的帧记为0"""
+        index = magnitudes.argmax(axis=0)
+        frames = np.arange(magnitudes.shape[1])
+        return np.where(magnitudes[index, frames] > 0, pitches[index, frames], 0.0)
 
-        return np.array(pitch_values)
+    def _extract_pitch_yin(self, frontend: SpectralFrontEnd) -> np.ndarray:
+        """在降采样信号上使用YIN提取音高（低开销档位）"""
+        # 选取能整除hop_length的降采样倍数，保证帧与前端时间轴对齐
+        factor = max(1, frontend.sr // self.YIN_SAMPLE_RATE)
+        while factor > 1 and self.hop_length % factor:
+            factor -= 1
+        target_sr = frontend.sr // factor
 
-    def _extract_energy(self, y: np.ndarray, sr: int) -> np.ndarray:
-        """提取能量"""
-        # RMS能量
-        rms = librosa.feature.rms(
-            y=y, hop_length=self.hop_length, frame_length=self.frame_length
-        )[0]
+        y = frontend.y
+        if factor > 1:
+            y = librosa.resample(y, orig_sr=frontend.sr, target_sr=target_sr, res_type="soxr_qq")
+
+        f0 = librosa.yin(
+            y,
+            fmin=librosa.note_to_hz("C2"),
+            fmax=min(librosa.note_to_hz("C7"), target_sr / 4),
+            sr=target_sr,
+            frame_length=self.frame_length // factor,
+            hop_length=self.hop_length // factor,
+            center=frontend.center
+        )
+        return librosa.util.fix_length(f0, size=frontend.n_frames, mode="edge")
+
+    @staticmethod
+    def _gate_silent_pitch(pitch: np.ndarray, rms: np.ndarray) -> np.ndarray:
+        """YIN对静音帧也会给出估计值，按能量门限置0以与piptrack保持一致"""
+        silent = rms <= 0.01 * np.max(rms)
+        return np.where(silent, 0.0, pitch)
 
+    def _extract_energy(self, rms: np.ndarray) -> np.ndarray:
+        """提取能量"""
         # 归一化到0-1
         rms = rms / np.max(rms) if np.max(rms) > 0 else rms
         return rms
 
-    def _extract_spectral_centroid(self, y: np.ndarray, sr: int) -> np.ndarray:
+    def _extract_spectral_centroid(self, spectral_centroid: np.ndarray) -> np.ndarray:
         """提取频谱质心"""
-        spectral_centroid = librosa.feature.spectral_centroid(
-            y=y, sr=sr, hop_length=self.hop_length
-        )[0]
-
         # 归一化
-        spectral_centroid = spectral_centroid / np.max(spectral_centroid)
+        max_centroid = np.max(spectral_centroid)
+        if max_centroid > 0:
+            spectral_centroid = spectral_centroid / max_centroid
         return spectral_centroid
 
-    def _extract_mfcc(self, y: np.ndarray, sr: int, n_mfcc: int = 13) -> np.ndarray:
+    @timed("analyzer", "mfcc")
+    def _extract_mfcc(self, frontend: SpectralFrontEnd, n_mfcc: int = 13) -> np.ndarray:
         """提取MFCC特征"""
-        mfcc = librosa.feature.mfcc(
-            y=y, sr=sr, n_mfcc=n_mfcc, hop_length=self.hop_length
-        )
+        mfcc = librosa.feature.mfcc(S=frontend.mel_db, n_mfcc=n_mfcc)
         return mfcc
 
-    def _analyze_emotion(self, y: np.ndarray, sr: int) -> Dict[str, float]:
-        """
-        AI驱动的情感分析
-        使用 LangChain + Gemini/OpenAI 进行情感判断
+    def _zero_crossing_rate(self, y: np.ndarray, center: bool = True) -> np.ndarray:
+        """逐帧零交叉率"""
+        return librosa.feature.zero_crossing_rate(
+            y, frame_length=self.frame_length, hop_length=self.hop_length, center=center
+        )[0]
+
+    def _analyze_emotion(
+        self,
+        tempo: float,
+        energy: float,
+        spectral_centroid: float,
+        zero_crossing_rate: float,
+        mfcc: Optional[np.ndarray] = None
+    ) -> Dict[str, float]:
         """
-        # 提取特征用于情感分析
-        tempo_raw, _ = librosa.beat.beat_track(y=y, sr=sr)
-        tempo = float(tempo_raw) if isinstance(tempo_raw, (int, float)) else float(tempo_raw.item())
-        energy = float(np.mean(librosa.feature.rms(y=y, hop_length=self.hop_length)))
-        spectral_centroid = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
-        zero_crossing_rate = float(np.mean(librosa.feature.zero_crossing_rate(y)))
+        情感分析
+        按 emotion_backend 使用 LangChain + Gemini/OpenAI 或本地评分器进行判断
 
+        Args:
+            tempo: 节拍（BPM）
+            energy: 平均RMS能量（未归一化）
+            spectral_centroid: 平均频谱质心（Hz）
+            zero_crossing_rate: 平均零交叉率
+            mfcc: MFCC矩阵（仅本地评分器使用）
+        """
         logger.info(f"情感分析输入 - BPM:{tempo:.1f}, 能量:{energy:.3f}, 质心:{spectral_centroid:.1f}, ZCR:{zero_crossing_rate:.3f}")
 
+        if self.llm is None:
+            return self._score_emotion_locally(tempo, energy, spectral_centroid, zero_crossing_rate, mfcc)
+
         try:
             # 准备输入数据
             input_data = {
@@ -289,9 +994,7 @@ class AudioAnalyzerAgent:
                 "zero_crossing_rate": f"{zero_crossing_rate:.4f}"
             }
 
-            # 构建链并执行
-            chain = self.emotion_prompt | self.llm | self.emotion_parser
-            result = chain.invoke(input_data)
+            result = self.emotion_chain.invoke(input_data)
             
             # 验证和归一化
             emotion_scores = self._validate_emotion_scores(result)
@@ -300,9 +1003,216 @@ class AudioAnalyzerAgent:
             return emotion_scores
 
         except Exception as e:
+            if self.emotion_backend == "auto":
+                logger.warning(f"AI情感分析失败，回退到本地评分器: {e}")
+                return self._score_emotion_locally(tempo, energy, spectral_centroid, zero_crossing_rate, mfcc)
             logger.error(f"AI情感分析失败: {e}")
             raise RuntimeError(f"情感分析失败: {e}")
 
+    @timed("analyzer", "emotion")
+    def _analyze_emotions(
+        self,
+        duration: float,
+        sr: int,
+        tempo: float,
+        beats: np.ndarray,
+        rms: np.ndarray,
+        spectral_centroid: np.ndarray,
+        zero_crossing_rate: np.ndarray,
+        mfcc: np.ndarray
+    ) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+        """
+        整体情感与分段情感时间线
+
+        Args:
+            duration: 音频时长（秒）
+            sr: 采样率
+            tempo: 全曲节拍（BPM）
+            beats: 节拍时间点（秒）
+            rms: 原始RMS能量 (n_frames,)
+            spectral_centroid: 原始频谱质心，单位Hz (n_frames,)
+            zero_crossing_rate: 逐帧零交叉率 (n_frames,)
+            mfcc: MFCC矩阵 (n_mfcc, n_frames)
+
+        Returns:
+            Tuple[Dict[str, float], List[Dict[str, Any]]]: (整体情感分数, 分段情感时间线)
+        """
+        segment_seconds = self.emotion_segment_seconds
+        if segment_seconds <= 0 or duration <= segment_seconds:
+            emotion_scores = self._analyze_emotion(
+                tempo=tempo,
+                energy=float(np.mean(rms)),
+                spectral_centroid=float(np.mean(spectral_centroid)),
+                zero_crossing_rate=float(np.mean(zero_crossing_rate)),
+                mfcc=mfcc
+            )
+            return emotion_scores, [
+                {'start': 0.0, 'end': float(duration), 'emotion_scores': emotion_scores}
+            ]
+
+        bounds, segment_features = self._segment_emotion_features(
+            duration, sr, tempo, beats, rms, spectral_centroid, zero_crossing_rate, mfcc
+        )
+        segment_scores = self._analyze_emotion_segments(bounds, segment_features)
+
+        # 整体情感取各段按时长加权的平均
+        weights = np.diff(bounds)
+        emotion_scores = self._validate_emotion_scores({
+            key: float(np.average([scores[key] for scores in segment_scores], weights=weights))
+            for key in LocalEmotionScorer.EMOTION_KEYS
+        })
+        timeline = [
+            {'start': float(start), 'end': float(end), 'emotion_scores': scores}
+            for start, end, scores in zip(bounds[:-1], bounds[1:], segment_scores)
+        ]
+        logger.info(f"分段情感分析完成: {len(timeline)} 段, 整体: {emotion_scores}")
+        return emotion_scores, timeline
+
+    def _segment_emotion_features(
+        self,
+        duration: float,
+        sr: int,
+        tempo: float,
+        beats: np.ndarray,
+        rms: np.ndarray,
+        spectral_centroid: np.ndarray,
+        zero_crossing_rate: np.ndarray,
+        mfcc: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按固定段长聚合帧级特征（一次bincount完成所有分段）
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (分段边界 (n_segments + 1,),
+                分段特征矩阵 (n_segments, len(LocalEmotionScorer.FEATURE_KEYS)))
+        """
+        segment_seconds = self.emotion_segment_seconds
+        n_segments = int(np.ceil(duration / segment_seconds))
+        bounds = np.minimum(np.arange(n_segments + 1) * segment_seconds, duration)
+
+        frame_times = librosa.frames_to_time(np.arange(len(rms)), sr=sr, hop_length=self.hop_length)
+        segment_index = np.minimum((frame_times // segment_seconds).astype(int), n_segments - 1)
+        counts = np.maximum(np.bincount(segment_index, minlength=n_segments), 1)
+
+        def segment_mean(values: np.ndarray) -> np.ndarray:
+            return np.bincount(segment_index, weights=values, minlength=n_segments) / counts
+
+        # 与 LocalEmotionScorer.mfcc_statistics 相同的统计量：第1系数均值、第0系数标准差
+        c0_mean = segment_mean(mfcc[0])
+        mfcc_dynamics = np.sqrt(np.maximum(segment_mean(mfcc[0] ** 2) - c0_mean ** 2, 0.0))
+
+        # 分段节拍速度：段内节拍间隔的中位数，节拍不足时沿用全曲BPM
+        segment_tempo = np.full(n_segments, tempo, dtype=np.float64)
+        beats = np.asarray(beats, dtype=np.float64)
+        beat_segment = np.minimum((beats // segment_seconds).astype(int), n_segments - 1)
+        for i in range(n_segments):
+            intervals = np.diff(beats[beat_segment == i])
+            if len(intervals) >= 2:
+                segment_tempo[i] = 60.0 / np.median(intervals)
+
+        features = np.column_stack([
+            segment_tempo,
+            segment_mean(rms),
+            segment_mean(spectral_centroid),
+            segment_mean(zero_crossing_rate),
+            segment_mean(mfcc[1]),
+            mfcc_dynamics
+        ])
+        return bounds, features
+
+    def _analyze_emotion_segments(
+        self,
+        bounds: np.ndarray,
+        features: np.ndarray
+    ) -> List[Dict[str, float]]:
+        """
+        批量分析所有分段的情感：本地评分器一次矩阵运算，LLM一次调用
+
+        Args:
+            bounds: 分段边界 (n_segments + 1,)
+            features: 分段特征矩阵，列顺序同 LocalEmotionScorer.FEATURE_KEYS
+
+        Returns:
+            List[Dict[str, float]]: 每段的情感分数
+        """
+        if self.llm is None:
+            return self._score_segments_locally(features)
+
+        n_segments = len(features)
+        try:
+            segments = [
+                {
+                    "start": round(float(bounds[i]), 2),
+                    "end": round(float(bounds[i + 1]), 2),
+                    "tempo": round(float(row[0]), 2),
+                    "energy": round(float(row[1]), 4),
+                    "spectral_centroid": round(float(row[2]), 2),
+                    "zero_crossing_rate": round(float(row[3]), 4)
+                }
+                for i, row in enumerate(features)
+            ]
+            input_data = {
+                "segments": json.dumps(segments, ensure_ascii=False),
+                "segment_count": n_segments
+            }
+
+            # 输出长度随分段数增长，单次调用放宽token上限
+            max_tokens = max(self.max_tokens, self.EMOTION_SEGMENT_TOKENS * n_segments + 100)
+            result = self._emotion_timeline_chain(max_tokens).invoke(input_data)
+            items = result.get('segments', []) if isinstance(result, dict) else result
+            if not isinstance(items, list):
+                raise ValueError(f"分段情感结果格式错误: {type(items).__name__}")
+
+            if len(items) != n_segments:
+                logger.warning(f"AI返回 {len(items)} 段情感，期望 {n_segments} 段，缺失的分段使用本地评分")
+            local_scores = None
+            segment_scores = []
+            for i in range(n_segments):
+                if i < len(items) and isinstance(items[i], dict):
+                    segment_scores.append(self._validate_emotion_scores(items[i]))
+                else:
+                    if local_scores is None:
+                        local_scores = self._score_segments_locally(features)
+                    segment_scores.append(local_scores[i])
+
+            logger.info(f"AI分段情感分析成功: {n_segments} 段")
+            return segment_scores
+
+        except Exception as e:
+            if self.emotion_backend == "auto":
+                logger.warning(f"AI分段情感分析失败，回退到本地评分器: {e}")
+                return self._score_segments_locally(features)
+            logger.error(f"AI分段情感分析失败: {e}")
+            raise RuntimeError(f"情感分析失败: {e}")
+
+    def _score_segments_locally(self, features: np.ndarray) -> List[Dict[str, float]]:
+        """本地评分器批量计算分段情感"""
+        scores = self.emotion_scorer.score_batch(features)
+        return [
+            self._validate_emotion_scores(dict(zip(LocalEmotionScorer.EMOTION_KEYS, row.tolist())))
+            for row in scores
+        ]
+
+    def _score_emotion_locally(
+        self,
+        tempo: float,
+        energy: float,
+        spectral_centroid: float,
+        zero_crossing_rate: float,
+        mfcc: Optional[np.ndarray] = None
+    ) -> Dict[str, float]:
+        """本地确定性情感评分"""
+        result = self.emotion_scorer.score(
+            tempo=tempo,
+            energy=energy,
+            spectral_centroid=spectral_centroid,
+            zero_crossing_rate=zero_crossing_rate,
+            mfcc=mfcc
+        )
+        emotion_scores = self._validate_emotion_scores(result)
+        logger.info(f"本地情感评分完成: {emotion_scores}")
+        return emotion_scores
+
     def _validate_emotion_scores(self, scores: Dict[str, Any]) -> Dict[str, float]:
         """验证并归一化情感分数"""
         emotion_keys = ['happy', 'sad', 'energetic', 'calm', 'angry']
@@ -322,3 +1232,17 @@ class AudioAnalyzerAgent:
             validated = {k: 0.2 for k in emotion_keys}
         
         return validated
+
+
+# 进程数 -> 分析进程池；已创建的进程池一直复用，其他请求可能仍在向其提交分块，不能替换或关闭
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """获取进程内共享的分析进程池（每种进程数一个，按需创建，避免每次请求重复启动子进程）"""
+    with _process_pool_lock:
+        pool = _process_pools.get(max_workers)
+        if pool is None:
+            pool = _process_pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+        return pool
@@ -0,0 +1,148 @@
+"""
+本地情感评分模块
+基于音频统计特征的确定性参数模型，可替代LLM情感分析（无网络调用、微秒级）
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmotionScorer:
+    """本地情感评分器：标准化特征 -> 线性打分 -> softmax"""
+
+    EMOTION_KEYS = ['happy', 'sad', 'energetic', 'calm', 'angry']
+    FEATURE_KEYS = [
+        'tempo',              # BPM
+        'energy',             # 平均RMS能量（未归一化，取log10）
+        'spectral_centroid',  # 平均频谱质心（Hz）
+        'zero_crossing_rate', # 平均零交叉率
+        'mfcc_tilt',          # MFCC第1系数均值，越大音色越暗
+        'mfcc_dynamics',      # MFCC第0系数标准差，反映响度起伏
+    ]
+
+    # 特征标准化参数：(中心, 尺度)，按流行音乐素材的典型取值标定
+    DEFAULT_NORMALIZATION = {
+        'tempo': (120.0, 30.0),
+        'energy': (-1.0, 0.4),
+        'spectral_centroid': (2200.0, 900.0),
+        'zero_crossing_rate': (0.08, 0.05),
+        'mfcc_tilt': (90.0, 40.0),
+        'mfcc_dynamics': (40.0, 15.0),
+    }
+
+    # 每种情感对各特征的权重与偏置，方向与情感分析提示词中的规则一致：
+    # 快节奏/高能量/明亮 -> happy/energetic，慢节奏/低能量/暗沉 -> sad/calm，噪声感强 -> angry
+    DEFAULT_WEIGHTS = {
+        'happy':     {'weights': [0.8, 0.4, 0.6, 0.0, -0.3, 0.1], 'bias': 0.2},
+        'sad':       {'weights': [-0.9, -0.7, -0.6, -0.2, 0.4, -0.2], 'bias': 0.0},
+        'energetic': {'weights': [0.7, 1.0, 0.3, 0.4, -0.2, 0.4], 'bias': 0.0},
+        'calm':      {'weights': [-0.7, -1.0, -0.3, -0.5, 0.2, -0.4], 'bias': 0.0},
+        'angry':     {'weights': [0.3, 0.8, 0.1, 0.8, -0.1, 0.3], 'bias': -0.6},
+    }
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, Dict[str, List[float]]]] = None,
+        normalization: Optional[Dict[str, List[float]]] = None,
+        temperature: float = 1.0
+    ):
+        """
+        初始化本地情感评分器
+
+        Args:
+            weights: 各情感的权重与偏置，默认使用内置标定参数
+            normalization: 各特征的 (中心, 尺度)
+            temperature: softmax温度，越小分布越尖锐
+        """
+        weights = weights or self.DEFAULT_WEIGHTS
+        normalization = normalization or self.DEFAULT_NORMALIZATION
+
+        self.weights = np.array([weights[k]['weights'] for k in self.EMOTION_KEYS], dtype=np.float64)
+        self.bias = np.array([weights[k]['bias'] for k in self.EMOTION_KEYS], dtype=np.float64)
+        self.center = np.array([normalization[k][0] for k in self.FEATURE_KEYS], dtype=np.float64)
+        self.scale = np.array([normalization[k][1] for k in self.FEATURE_KEYS], dtype=np.float64)
+        self.temperature = temperature
+
+    @classmethod
+    def from_file(cls, path: str) -> "LocalEmotionScorer":
+        """
+        从标定文件加载参数
+
+        Args:
+            path: JSON文件路径，包含 weights / normalization / temperature
+
+        Returns:
+            LocalEmotionScorer: 评分器实例
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        logger.info(f"加载本地情感模型参数: {path}")
+        return cls(
+            weights=config.get('weights'),
+            normalization=config.get('normalization'),
+            temperature=config.get('temperature', 1.0)
+        )
+
+    def score(
+        self,
+        tempo: float,
+        energy: float,
+        spectral_centroid: float,
+        zero_crossing_rate: float,
+        mfcc: Optional[np.ndarray] = None
+    ) -> Dict[str, float]:
+        """
+        计算单段音频的情感分数
+
+        Args:
+            tempo: 节拍（BPM）
+            energy: 平均RMS能量（未归一化）
+            spectral_centroid: 平均频谱质心（Hz）
+            zero_crossing_rate: 平均零交叉率
+            mfcc: MFCC矩阵 (n_mfcc, n_frames)，可选
+
+        Returns:
+            Dict[str, float]: 情感分数，总和为1
+        """
+        tilt, dynamics = self.mfcc_statistics(mfcc)
+        features = np.array([[tempo, energy, spectral_centroid, zero_crossing_rate, tilt, dynamics]])
+        scores = self.score_batch(features)[0]
+        return {k: float(v) for k, v in zip(self.EMOTION_KEYS, scores)}
+
+    def score_batch(self, features: np.ndarray) -> np.ndarray:
+        """
+        批量计算情感分数（一次矩阵运算）
+
+        Args:
+            features: 特征矩阵 (n, len(FEATURE_KEYS))，列顺序同 FEATURE_KEYS，
+                MFCC统计缺失时可填 NaN
+
+        Returns:
+            np.ndarray: 情感分数矩阵 (n, len(EMOTION_KEYS))，每行总和为1
+        """
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64)).copy()
+        features[:, 1] = np.log10(np.maximum(features[:, 1], 1e-6))
+
+        z = (features - self.center) / self.scale
+        z = np.clip(np.nan_to_num(z, nan=0.0), -3.0, 3.0)
+
+        logits = (z @ self.weights.T + self.bias) / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def mfcc_statistics(mfcc: Optional[np.ndarray]) -> Tuple[float, float]:
+        """
+        MFCC统计量：(第1系数均值, 第0系数标准差)，缺失时返回 NaN
+
+        Args:
+            mfcc: MFCC矩阵 (n_mfcc, n_frames)
+        """
+        if mfcc is None or mfcc.shape[0] < 2 or mfcc.shape[1] == 0:
+            return float('nan'), float('nan')
+        return float(np.mean(mfcc[1])), float(np.std(mfcc[0]))
@@ -0,0 +1,262 @@
+"""
+表情参数缓存模块
+按量化特征键持久化LLM生成的表情参数，跨请求、跨uvicorn worker共享（SQLite WAL）
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExpressionCache:
+    """持久化表情参数缓存（LRU + TTL淘汰，按版本键隔离不同提示词/模型的结果）"""
+
+    def __init__(
+        self,
+        db_path: str = "data/cache/expressions.sqlite3",
+        max_entries: int = 100000,
+        ttl_seconds: float = 30 * 24 * 3600
+    ):
+        """
+        初始化表情参数缓存
+
+        Args:
+            db_path: SQLite数据库路径
+            max_entries: 最大条目数，超出后按最近最少使用淘汰
+            ttl_seconds: 条目有效期（秒），<=0 表示永不过期
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS expressions (
+                    version TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    vector TEXT,
+                    PRIMARY KEY (version, key)
+                )"""
+            )
+            # 旧版本数据库没有特征向量列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(expressions)")}
+            if "vector" not in columns:
+                conn.execute("ALTER TABLE expressions ADD COLUMN vector TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_expressions_accessed ON expressions (accessed_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_expressions_created ON expressions (created_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0)"
+            )
+            # 条目数由触发器随插入/删除维护，淘汰时不必每次 COUNT(*) 全表计数；
+            # 先建触发器再补齐旧数据库的计数，两者之间其他worker插入的条目也已计入
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS expressions_count_insert AFTER INSERT ON expressions "
+                "BEGIN UPDATE counters SET value = value + 1 WHERE name = 'entries'; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS expressions_count_delete AFTER DELETE ON expressions "
+                "BEGIN UPDATE counters SET value = value - 1 WHERE name = 'entries'; END"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) SELECT 'entries', COUNT(*) FROM expressions"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接；WAL模式允许多进程并发读、串行写"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, version: str, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量读取表情参数
+
+        Args:
+            version: 版本键（提示词与模型配置的哈希）
+            keys: 量化特征键
+
+        Returns:
+            Dict[str, Dict]: 命中的 {键: 表情参数}
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        now = time.time()
+        min_created = now - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            conn = self._connect()
+            # SQLite单条语句的参数个数有上限，分批查询
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, params FROM expressions "
+                    f"WHERE version = ? AND created_at >= ? AND key IN ({placeholders})",
+                    [version, min_created, *chunk]
+                ).fetchall()
+                found.update((key, json.loads(params)) for key, params in rows)
+
+            with conn:
+                if found:
+                    hit_keys = list(found)
+                    for start in range(0, len(hit_keys), 500):
+                        chunk = hit_keys[start:start + 500]
+                        placeholders = ",".join("?" * len(chunk))
+                        conn.execute(
+                            f"UPDATE expressions SET accessed_at = ? "
+                            f"WHERE version = ? AND key IN ({placeholders})",
+                            [now, version, *chunk]
+                        )
+                conn.execute(
+                    "UPDATE counters SET value = value + CASE name WHEN 'hits' THEN ? ELSE ? END "
+                    "WHERE name IN ('hits', 'misses')",
+                    (len(found), len(keys) - len(found))
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"表情缓存读取失败，忽略缓存: {e}")
+            return found
+
+        logger.info(f"表情缓存: 命中 {len(found)}/{len(keys)}")
+        return found
+
+    def put_many(
+        self,
+        version: str,
+        items: Dict[str, Dict[str, Any]],
+        vectors: Optional[Dict[str, List[float]]] = None
+    ):
+        """
+        批量写入表情参数
+
+        Args:
+            version: 版本键
+            items: {量化特征键: 表情参数}
+            vectors: {量化特征键: 归一化特征向量}，供近邻复用索引加载
+        """
+        vectors = vectors or {}
+        if not items:
+            return
+
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                # 已存在的键原地更新（REPLACE 先删后插不会触发删除触发器，条目计数会偏高）
+                conn.executemany(
+                    "INSERT INTO expressions "
+                    "(version, key, params, created_at, accessed_at, vector) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (version, key) DO UPDATE SET params = excluded.params, "
+                    "created_at = excluded.created_at, accessed_at = excluded.accessed_at, "
+                    "vector = excluded.vector",
+                    [
+                        (
+                            version, key, json.dumps(params), now, now,
+                            json.dumps(vectors[key]) if key in vectors else None
+                        )
+                        for key, params in items.items()
+                    ]
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"表情缓存写入失败: {e}")
+
+    def load_vectors(self, version: str) -> List[Tuple[List[float], Dict[str, Any]]]:
+        """
+        读取某版本下所有带特征向量的未过期条目
+
+        Args:
+            version: 版本键
+
+        Returns:
+            List[Tuple[List[float], Dict]]: (特征向量, 表情参数) 列表
+        """
+        min_created = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        try:
+            rows = self._connect().execute(
+                "SELECT vector, params FROM expressions "
+                "WHERE version = ? AND created_at >= ? AND vector IS NOT NULL",
+                (version, min_created)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"表情缓存特征向量读取失败: {e}")
+            return []
+        return [(json.loads(vector), json.loads(params)) for vector, params in rows]
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，再按最近访问时间淘汰到条目上限以内"""
+        if self.ttl_seconds > 0:
+            conn.execute("DELETE FROM expressions WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT value FROM counters WHERE name = 'entries'").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM expressions WHERE rowid IN "
+                "(SELECT rowid FROM expressions ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        缓存统计（所有worker累计）
+
+        Returns:
+            Dict: hits / misses / hit_rate / entries
+        """
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        entries = counters.get("entries", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """清空缓存与统计"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM expressions")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+_default_cache: Optional[ExpressionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_expression_cache() -> ExpressionCache:
+    """获取进程内共享的表情参数缓存（路径、条目上限与有效期可通过环境变量配置）"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExpressionCache(
+                db_path=os.getenv("EXPRESSION_CACHE_PATH", "data/cache/expressions.sqlite3"),
+                max_entries=int(os.getenv("EXPRESSION_CACHE_MAX_ENTRIES", "100000")),
+                ttl_seconds=float(os.getenv("EXPRESSION_CACHE_TTL_HOURS", "720")) * 3600
+            )
+        return _default_cache
@@ -0,0 +1,125 @@
+"""
+规则表情引擎模块
+按表情生成提示词中的规则，用一次NumPy数组运算把整条特征时间线映射为Live2D表情参数（无网络调用）
+"""
+from typing import Any, Dict, List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class RuleExpressionEngine:
+    """确定性规则表情引擎，可替代或兜底 ExpressionAgentV2"""
+
+    # 输出参数顺序与 Live2DExpression 一致
+    PARAM_KEYS = [
+        'eye_open', 'eye_open_r', 'eyebrow_height', 'eyebrow_height_r', 'mouth_open',
+        'mouth_form', 'cheek', 'body_angle_x', 'body_angle_y', 'breath'
+    ]
+    EMOTION_KEYS = ['happy', 'sad', 'energetic', 'calm', 'angry']
+
+    # 每隔多少拍眨一次眼、眨眼持续时间（秒）
+    BLINK_BEATS = 8
+    BLINK_SECONDS = 0.15
+    # 身体左右摆动一个周期占用的拍数
+    SWAY_BEATS = 2
+
+    def generate(self, feature_timeline: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        计算整条时间线的表情参数
+
+        Args:
+            feature_timeline: 特征时间线（energy / spectral_centroid 已归一化到0-1，pitch单位Hz，tempo单位BPM）
+
+        Returns:
+            np.ndarray: 表情参数矩阵 (n_frames, len(PARAM_KEYS))
+        """
+        n = len(feature_timeline)
+        if n == 0:
+            return np.zeros((0, len(self.PARAM_KEYS)))
+
+        t = np.array([f.get('timestamp', 0) for f in feature_timeline], dtype=np.float64)
+        tempo = np.array([f.get('tempo', 100) for f in feature_timeline], dtype=np.float64)
+        energy = np.clip([f.get('energy', 0.5) for f in feature_timeline], 0.0, 1.0)
+        pitch = np.array([f.get('pitch', 0) or 0 for f in feature_timeline], dtype=np.float64)
+        emotions = np.array(
+            [[f.get('emotion_scores', {}).get(k, 0.0) for k in self.EMOTION_KEYS] for f in feature_timeline],
+            dtype=np.float64
+        )
+        happy, sad, energetic, calm, angry = emotions.T
+        # 音高按对数刻度映射：55Hz(A1) -> 0，3520Hz(A7) -> 1，无音高时取中性值
+        pitch_norm = np.where(
+            pitch > 0, np.clip(np.log2(np.maximum(pitch, 1e-6) / 55.0) / 6.0, 0.0, 1.0), 0.5
+        )
+        beat_phase = t * np.maximum(tempo, 1.0) / 60.0
+
+        # 高能量 -> 眼睛睁大；悲伤 -> 半闭；快节奏 -> 按拍眨眼
+        eye_open = 0.7 + 0.25 * energy + 0.1 * energetic - 0.3 * sad - 0.1 * calm
+        blink_beat_seconds = self.BLINK_BEATS * 60.0 / np.maximum(tempo, 1.0)
+        blinking = np.mod(t, blink_beat_seconds) < self.BLINK_SECONDS
+        eye_open = np.where(blinking, 0.05, eye_open)
+
+        # 欢快 -> 眉毛上扬；悲伤/愤怒 -> 下垂；高音略微上扬
+        eyebrow_height = 0.5 + 0.35 * happy + 0.15 * energetic - 0.35 * sad - 0.25 * angry \
+            + 0.1 * (pitch_norm - 0.5)
+
+        # 高能量 -> 嘴巴张开；平静 -> 接近闭合
+        mouth_open = 0.05 + 0.75 * energy * (0.6 + 0.4 * (energetic + happy + angry)) - 0.1 * calm
+
+        # 欢快 -> 微笑；悲伤 -> 嘴角下垂
+        mouth_form = 0.5 + 0.5 * (happy - sad) + 0.1 * energetic - 0.2 * angry
+
+        # 欢快 -> 脸红；激动的愤怒也带红
+        cheek = 0.6 * happy + 0.2 * energy * happy + 0.3 * angry * energy
+
+        # 快节奏/高能量 -> 身体随拍摆动；平静 -> 幅度减小
+        sway = np.clip(0.15 + 0.6 * energy * (energetic + happy), 0.0, 0.8) * (1.0 - 0.5 * calm)
+        body_angle_x = sway * np.sin(2 * np.pi * beat_phase / self.SWAY_BEATS)
+        body_angle_y = 0.3 * (energy - 0.5) + 0.2 * energetic - 0.2 * sad \
+            + 0.1 * energy * np.sin(2 * np.pi * beat_phase)
+
+        # 高能量/快节奏 -> 呼吸急促
+        breath = 0.2 + 0.45 * energy + 0.25 * (tempo - 60.0) / 120.0 + 0.15 * energetic - 0.2 * calm
+
+        params = np.column_stack([
+            eye_open, eye_open, eyebrow_height, eyebrow_height, mouth_open,
+            mouth_form, cheek, body_angle_x, body_angle_y, breath
+        ])
+        lower = np.array([0, 0, 0, 0, 0, 0, 0, -1, -1, 0], dtype=np.float64)
+        return np.clip(params, lower, 1.0)
+
+    def batch_generate_expressions(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        """
+        批量生成表情参数，输出格式与 ExpressionAgentV2.batch_generate_expressions 相同
+
+        Args:
+            feature_timeline: 特征时间线列表
+            **kwargs: 兼容LLM代理的参数（use_cache / batch_size 等），此处忽略
+
+        Returns:
+            List[Dict]: 表情参数列表
+        """
+        params = self.generate(feature_timeline)
+        expressions = [
+            {
+                'timestamp': features.get('timestamp', 0),
+                'parameters': dict(zip(self.PARAM_KEYS, row.tolist()))
+            }
+            for features, row in zip(feature_timeline, params)
+        ]
+        logger.info(f"规则引擎生成完成: {len(expressions)} 个关键帧")
+        return expressions
+
+    async def abatch_generate_expressions(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        """batch_generate_expressions 的异步接口（计算本身是同步的，耗时为毫秒级）"""
+        return self.batch_generate_expressions(feature_timeline)
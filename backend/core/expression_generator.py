@@ -2,12 +2,32 @@
 表情生成器模块
 整合音频分析和AI生成，创建完整的表情动画 - 完全AI驱动
 """
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from bisect import bisect_right
+import asyncio
+import contextvars
 import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
+
+import numpy as np
+from scipy.cluster.vq import kmeans2
+from scipy.ndimage import uniform_filter1d
+from scipy.signal import find_peaks
+from scipy.spatial.distance import cdist
+
 from .audio_analyzer import AudioAnalyzerAgent, AudioFeatures
 from .langchain_agent import ExpressionAgentV2
+from .expression_engine import RuleExpressionEngine
+from .ai_config import AIConfig
+from .feature_cache import FeatureCache
+from .expression_cache import ExpressionCache
+from .expression_index import ExpressionIndex
+from backend.utils.metrics import stage_timer, timed
+from backend.utils.pcm_cache import PCMCache
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +35,30 @@ logger = logging.getLogger(__name__)
 class ExpressionGenerator:
     """表情生成器 - 完全AI驱动"""
 
+    # 表情生成后端：llm(远程模型) / local(规则引擎) / auto(优先LLM，失败或超时时回退规则引擎)
+    EXPRESSION_BACKENDS = ("llm", "local", "auto")
+    # 聚类混合时参与插值的最近代表帧数
+    CLUSTER_BLEND_NEIGHBORS = 3
+    # 关键帧放置方式：grid(按time_resolution均匀采样) / adaptive(在特征变化处放置)
+    KEYFRAME_MODES = ("grid", "adaptive")
+    # 自适应关键帧：触发新关键帧的特征变化量（能量/质心/音高归一化空间的距离）与默认最大间隔（秒）
+    KEYFRAME_CHANGE_THRESHOLD = 0.1
+    KEYFRAME_MAX_SPACING = 2.0
+
     def __init__(
         self,
         audio_analyzer: Optional[AudioAnalyzerAgent] = None,
         expression_agent: Optional[ExpressionAgentV2] = None,
         api_key: Optional[str] = None,
         model_name: str = "gpt-4.1",
-        use_gemini: bool = False
+        use_gemini: bool = False,
+        feature_cache: Optional[FeatureCache] = None,
+        pcm_cache: Optional[PCMCache] = None,
+        expression_cache: Optional[ExpressionCache] = None,
+        expression_index: Optional[ExpressionIndex] = None,
+        n_clusters: Optional[int] = None,
+        expression_backend: Optional[str] = None,
+        expression_timeout: Optional[float] = None
     ):
         """
         初始化表情生成器
@@ -32,23 +69,61 @@ class ExpressionGenerator:
             api_key: API密钥
             model_name: 模型名称
             use_gemini: 是否使用Gemini
+            feature_cache: 音频特征缓存（仅在未传入audio_analyzer时使用）
+            pcm_cache: 解码PCM缓存（仅在未传入audio_analyzer时使用）
+            expression_cache: 表情参数缓存（仅在未传入expression_agent时使用）
+            expression_index: 表情近邻索引（仅在未传入expression_agent时使用）
+            n_clusters: 默认聚类数，只为每个簇的代表帧调用LLM；默认读取 EXPRESSION_CLUSTERS，0表示不聚类
+            expression_backend: 表情生成后端 (llm / local / auto)，默认读取 EXPRESSION_BACKEND
+            expression_timeout: auto 后端生成的超时（秒），超时后回退规则引擎，<=0 表示不限时，默认读取 EXPRESSION_TIMEOUT
         """
         self.audio_analyzer = audio_analyzer or AudioAnalyzerAgent(
             api_key=api_key,
             model_name=model_name,
-            use_gemini=use_gemini
-        )
-        self.expression_agent = expression_agent or ExpressionAgentV2(
-            api_key=api_key,
-            model_name=model_name,
-            use_gemini=use_gemini
+            use_gemini=use_gemini,
+            feature_cache=feature_cache,
+            pcm_cache=pcm_cache
         )
+        self.expression_backend = expression_backend or AIConfig.get_expression_backend()
+        if self.expression_backend not in self.EXPRESSION_BACKENDS:
+            raise ValueError(
+                f"不支持的表情生成后端: {self.expression_backend}，可选: {', '.join(self.EXPRESSION_BACKENDS)}"
+            )
+        if expression_timeout is None:
+            expression_timeout = float(os.getenv("EXPRESSION_TIMEOUT", "120"))
+        # <=0 表示不限时
+        self.expression_timeout = expression_timeout if expression_timeout > 0 else None
+        self.rule_engine = RuleExpressionEngine()
+
+        self.expression_agent = expression_agent
+        if self.expression_agent is None and self.expression_backend != "local":
+            try:
+                self.expression_agent = ExpressionAgentV2(
+                    api_key=api_key,
+                    model_name=model_name,
+                    use_gemini=use_gemini,
+                    expression_cache=expression_cache,
+                    expression_index=expression_index
+                )
+            except ValueError as e:
+                if self.expression_backend != "auto":
+                    raise
+                logger.warning(f"表情代理初始化失败，只使用规则引擎: {e}")
+        self.n_clusters = n_clusters if n_clusters is not None else int(os.getenv("EXPRESSION_CLUSTERS", "0"))
 
     def generate_from_audio(
         self,
         audio_path: str,
         time_resolution: float = 0.1,
-        enable_smoothing: bool = True
+        enable_smoothing: bool = True,
+        pitch_method: Optional[str] = None,
+        streaming: bool = False,
+        parallel: bool = False,
+        n_clusters: Optional[int] = None,
+        cluster_blend: bool = False,
+        keyframe_mode: str = "grid",
+        snap_to_beats: bool = False,
+        max_keyframe_spacing: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         从音频文件生成表情动画
@@ -57,6 +132,15 @@ class ExpressionGenerator:
             audio_path: 音频文件路径
             time_resolution: 时间分辨率（秒）
             enable_smoothing: 是否启用平滑处理
+            pitch_method: 音高提取方式 (piptrack / yin)，默认沿用分析器配置
+            streaming: 是否使用分块流式分析（适合长音频）
+            parallel: 是否多进程并行分析（降低长音频延迟）
+            n_clusters: 聚类数，只为每个簇的代表帧生成表情，默认沿用实例配置
+            cluster_blend: 是否按与各代表帧的距离混合参数（否则直接使用所在簇的参数）
+            keyframe_mode: 关键帧放置方式，grid 按 time_resolution 均匀采样，
+                adaptive 只在能量/质心/音高变化处放置（time_resolution 作为最小间隔）
+            snap_to_beats: 自适应模式下是否将关键帧对齐到最近的节拍
+            max_keyframe_spacing: 自适应模式下关键帧的最大间隔（秒）
 
         Returns:
             Dict: 表情动画数据
@@ -64,18 +148,123 @@ class ExpressionGenerator:
         logger.info(f"开始生成表情动画: {audio_path}")
 
         # 1. 分析音频
-        audio_features = self.audio_analyzer.analyze(audio_path)
+        audio_features = self.audio_analyzer.analyze(
+            audio_path, pitch_method=pitch_method, streaming=streaming, parallel=parallel
+        )
 
         # 2. 构建特征时间线
         feature_timeline = self._build_feature_timeline(
-            audio_features, time_resolution
+            audio_features,
+            time_resolution,
+            self._keyframe_times(
+                audio_features, time_resolution, keyframe_mode, snap_to_beats, max_keyframe_spacing
+            )
+        )
+
+        # 3. 生成表情参数（聚类时只为代表帧生成）
+        frames, clusters = self._cluster_timeline(feature_timeline, n_clusters)
+        expressions, backend = self._generate_expressions(frames)
+        if clusters is not None:
+            expressions = self._expand_clusters(feature_timeline, expressions, clusters, cluster_blend)
+
+        return self._build_result(
+            audio_features, expressions, time_resolution, enable_smoothing, pitch_method,
+            keyframe_mode, backend
         )
 
-        # 3. 生成表情参数
-        expressions = self.expression_agent.batch_generate_expressions(
-            feature_timeline
+    async def agenerate_from_audio(
+        self,
+        audio_path: str,
+        time_resolution: float = 0.1,
+        enable_smoothing: bool = True,
+        pitch_method: Optional[str] = None,
+        streaming: bool = False,
+        parallel: bool = False,
+        n_clusters: Optional[int] = None,
+        cluster_blend: bool = False,
+        keyframe_mode: str = "grid",
+        snap_to_beats: bool = False,
+        max_keyframe_spacing: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        progress_callback: Optional[Callable[[str, float], None]] = None,
+        keyframe_callback: Optional[Callable[[int, List[Dict[str, Any]], int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        generate_from_audio 的异步版本：音频分析与时间线、聚类、规则引擎、平滑等CPU计算在线程中执行，
+        表情参数通过并发的LLM请求生成，不阻塞事件循环
+
+        Args:
+            concurrency: 同时进行的LLM请求数上限，默认使用表情代理的配置
+            progress_callback: 阶段进度回调，参数为 (阶段名, 阶段内进度0-1)，
+                阶段依次为 decode / features / emotion / timeline / keyframes / smoothing
+            keyframe_callback: 部分关键帧回调，参数为 (起始帧序号, 关键帧列表, 总帧数)；
+                关键帧按时间顺序从开头连续推送，尚未平滑，最终结果以返回值为准
+            其余参数同 generate_from_audio
+
+        Returns:
+            Dict: 表情动画数据
+        """
+        logger.info(f"开始异步生成表情动画: {audio_path}")
+        report = progress_callback or (lambda stage, progress: None)
+
+        audio_features = await asyncio.to_thread(
+            self.audio_analyzer.analyze,
+            audio_path,
+            pitch_method=pitch_method,
+            streaming=streaming,
+            parallel=parallel,
+            progress_callback=progress_callback
         )
 
+        # 时间线构建、聚类、规则引擎与平滑都是CPU计算，长音频耗时可观，同样放到线程中执行
+        keyframe_times = await asyncio.to_thread(
+            self._keyframe_times,
+            audio_features, time_resolution, keyframe_mode, snap_to_beats, max_keyframe_spacing
+        )
+        feature_timeline = await asyncio.to_thread(
+            self._build_feature_timeline, audio_features, time_resolution, keyframe_times
+        )
+
+        report("timeline", 1.0)
+
+        frames, clusters = await asyncio.to_thread(self._cluster_timeline, feature_timeline, n_clusters)
+        # 聚类时代表帧不按时间排列，展开后再整体推送
+        stream_partial = keyframe_callback is not None and clusters is None
+        report("keyframes", 0.0)
+        with stage_timer("generator", "keyframes"):
+            expressions, backend = await self._agenerate_expressions(
+                frames, concurrency,
+                progress_callback=lambda done, total: report("keyframes", done / total if total else 1.0),
+                keyframe_callback=(
+                    (lambda start, batch: keyframe_callback(start, batch, len(feature_timeline)))
+                    if stream_partial else None
+                )
+            )
+        if clusters is not None:
+            expressions = await asyncio.to_thread(
+                self._expand_clusters, feature_timeline, expressions, clusters, cluster_blend
+            )
+        if keyframe_callback is not None and (not stream_partial or backend == "local"):
+            keyframe_callback(0, expressions, len(expressions))
+
+        report("smoothing", 0.0)
+        return await asyncio.to_thread(
+            self._build_result,
+            audio_features, expressions, time_resolution, enable_smoothing, pitch_method,
+            keyframe_mode, backend
+        )
+
+    def _build_result(
+        self,
+        audio_features: AudioFeatures,
+        expressions: List[Dict[str, Any]],
+        time_resolution: float,
+        enable_smoothing: bool,
+        pitch_method: Optional[str],
+        keyframe_mode: str = "grid",
+        expression_backend: str = "llm"
+    ) -> Dict[str, Any]:
+        """平滑处理并构建输出数据"""
         # 4. 平滑处理
         if enable_smoothing:
             expressions = self._smooth_expressions(expressions)
@@ -85,10 +274,14 @@ class ExpressionGenerator:
             'duration': audio_features.duration,
             'tempo': audio_features.tempo,
             'emotion_scores': audio_features.emotion_scores,
+            'emotion_timeline': audio_features.emotion_timeline,
             'expressions': expressions,
             'metadata': {
                 'time_resolution': time_resolution,
+                'keyframe_mode': keyframe_mode,
+                'expression_backend': expression_backend,
                 'smoothing_enabled': enable_smoothing,
+                'pitch_method': pitch_method or self.audio_analyzer.pitch_method,
                 'total_keyframes': len(expressions)
             }
         }
@@ -96,18 +289,259 @@ class ExpressionGenerator:
         logger.info(f"表情动画生成完成，共 {len(expressions)} 个关键帧")
         return result
 
+    @timed("generator", "keyframes")
+    def _generate_expressions(
+        self,
+        frames: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """按后端生成表情参数，返回 (表情列表, 实际使用的后端)"""
+        if self.expression_agent is None:
+            return self.rule_engine.batch_generate_expressions(frames), "local"
+        if self.expression_backend != "auto":
+            return self.expression_agent.batch_generate_expressions(frames), "llm"
+
+        # 在独立线程中生成以便限时；超时后置位取消标记直接回退，
+        # 生成线程完成当前窗口的请求后停止，不再发起新的LLM请求
+        cancel_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="expression-auto")
+        future = executor.submit(
+            contextvars.copy_context().run, self.expression_agent.batch_generate_expressions, frames,
+            cancel_event=cancel_event
+        )
+        executor.shutdown(wait=False)
+        try:
+            return future.result(timeout=self.expression_timeout), "llm"
+        except FutureTimeoutError:
+            cancel_event.set()
+            logger.warning(f"AI表情生成超时（{self.expression_timeout}秒），回退到规则引擎")
+        except Exception as e:
+            logger.warning(f"AI表情生成失败，回退到规则引擎: {e}")
+        return self.rule_engine.batch_generate_expressions(frames), "local"
+
+    async def _agenerate_expressions(
+        self,
+        frames: List[Dict[str, Any]],
+        concurrency: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        keyframe_callback: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """_generate_expressions 的异步版本，auto 后端超时后回退规则引擎"""
+        if self.expression_agent is None:
+            return await asyncio.to_thread(self.rule_engine.batch_generate_expressions, frames), "local"
+        if self.expression_backend != "auto":
+            return await self.expression_agent.abatch_generate_expressions(
+                frames, concurrency=concurrency,
+                progress_callback=progress_callback, keyframe_callback=keyframe_callback
+            ), "llm"
+
+        try:
+            return await asyncio.wait_for(
+                self.expression_agent.abatch_generate_expressions(
+                    frames, concurrency=concurrency,
+                    progress_callback=progress_callback, keyframe_callback=keyframe_callback
+                ),
+                timeout=self.expression_timeout
+            ), "llm"
+        except asyncio.TimeoutError:
+            logger.warning(f"AI表情生成超时（{self.expression_timeout}秒），回退到规则引擎")
+        except Exception as e:
+            logger.warning(f"AI表情生成失败，回退到规则引擎: {e}")
+        return await asyncio.to_thread(self.rule_engine.batch_generate_expressions, frames), "local"
+
+    @timed("generator", "cluster")
+    def _cluster_timeline(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        n_clusters: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        对特征帧做k-means聚类，每个簇取离质心最近的真实帧作为代表帧
+
+        Args:
+            feature_timeline: 特征时间线
+            n_clusters: 聚类数，默认沿用实例配置，<=0 或不少于帧数时不聚类
+
+        Returns:
+            Tuple: (需要生成表情的帧, 各帧到代表帧的距离矩阵 (n_frames, n_representatives))，
+                不聚类时距离矩阵为None
+        """
+        n_clusters = self.n_clusters if n_clusters is None else n_clusters
+        if n_clusters <= 0 or n_clusters >= len(feature_timeline):
+            return feature_timeline, None
+
+        vectors = np.asarray(
+            [ExpressionIndex.feature_vector(features) for features in feature_timeline],
+            dtype=np.float64
+        )
+        centroids, labels = kmeans2(vectors, n_clusters, minit='++', seed=0)
+        # 丢弃空簇，多个质心选中同一帧时只保留一次
+        centroids = centroids[np.unique(labels)]
+        representatives = np.unique(np.argmin(cdist(vectors, centroids), axis=0))
+
+        distances = cdist(vectors, vectors[representatives])
+        logger.info(f"特征聚类: {len(feature_timeline)} 帧 -> {len(representatives)} 个代表帧")
+        return [feature_timeline[i] for i in representatives], distances
+
+    def _expand_clusters(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        representative_expressions: List[Dict[str, Any]],
+        distances: np.ndarray,
+        blend: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        将代表帧的表情参数分配回所有帧
+
+        Args:
+            feature_timeline: 完整特征时间线
+            representative_expressions: 代表帧的表情（顺序同距离矩阵的列）
+            distances: 各帧到代表帧的距离矩阵 (n_frames, n_representatives)
+            blend: 是否对最近的几个代表帧按距离反比加权混合
+
+        Returns:
+            List[Dict]: 完整时间线的表情参数
+        """
+        param_keys = list(representative_expressions[0]['parameters'])
+        params = np.array([
+            [expression['parameters'][key] for key in param_keys]
+            for expression in representative_expressions
+        ])
+
+        if blend:
+            n_neighbors = min(self.CLUSTER_BLEND_NEIGHBORS, len(params))
+            nearest = np.argsort(distances, axis=1)[:, :n_neighbors]
+            weights = 1.0 / (np.take_along_axis(distances, nearest, axis=1) + 1e-6)
+            weights /= weights.sum(axis=1, keepdims=True)
+            values = np.einsum('nk,nkp->np', weights, params[nearest])
+        else:
+            values = params[np.argmin(distances, axis=1)]
+
+        return [
+            {
+                'timestamp': features.get('timestamp', 0),
+                'parameters': dict(zip(param_keys, row.tolist()))
+            }
+            for features, row in zip(feature_timeline, values)
+        ]
+
+    @timed("generator", "keyframe_placement")
+    def _keyframe_times(
+        self,
+        audio_features: AudioFeatures,
+        time_resolution: float,
+        keyframe_mode: str,
+        snap_to_beats: bool,
+        max_keyframe_spacing: Optional[float]
+    ) -> Optional[List[float]]:
+        """按放置方式确定关键帧时间点，grid 模式返回None（沿用均匀网格）"""
+        if keyframe_mode not in self.KEYFRAME_MODES:
+            raise ValueError(f"不支持的关键帧放置方式: {keyframe_mode}，可选: {', '.join(self.KEYFRAME_MODES)}")
+        if keyframe_mode == "grid":
+            return None
+        return self._select_keyframe_times(
+            audio_features,
+            min_spacing=time_resolution,
+            max_spacing=max_keyframe_spacing or self.KEYFRAME_MAX_SPACING,
+            snap_to_beats=snap_to_beats
+        )
+
+    def _select_keyframe_times(
+        self,
+        audio_features: AudioFeatures,
+        min_spacing: float,
+        max_spacing: float,
+        snap_to_beats: bool = False
+    ) -> List[float]:
+        """
+        自适应关键帧：在能量、频谱质心、音高发生变化的位置放置关键帧
+
+        Args:
+            audio_features: 音频特征
+            min_spacing: 关键帧最小间隔（秒）
+            max_spacing: 关键帧最大间隔（秒），平稳段按此间隔补点
+            snap_to_beats: 是否将关键帧对齐到最近的节拍
+
+        Returns:
+            List[float]: 升序的关键帧时间点（秒）
+        """
+        duration = audio_features.duration
+        frame_times = np.asarray(audio_features.timestamps, dtype=np.float64)
+        if duration <= 0 or len(frame_times) == 0:
+            # 空音频或极短音频没有可检测的变化点，只保留起始关键帧
+            return [0.0]
+        fps = len(frame_times) / duration
+
+        # 归一化特征：能量/质心已在0-1，音高按对数刻度映射（55Hz-3520Hz -> 0-1）
+        pitch = np.asarray(audio_features.pitch, dtype=np.float64)
+        pitch_norm = np.where(
+            pitch > 0, np.clip(np.log2(np.maximum(pitch, 1e-6) / 55.0) / 6.0, 0.0, 1.0), 0.0
+        )
+        X = np.column_stack([
+            np.asarray(audio_features.energy, dtype=np.float64),
+            np.asarray(audio_features.spectral_centroid, dtype=np.float64),
+            pitch_norm
+        ])
+
+        # 新颖度：平滑后特征在 t 前后各半个最小间隔处的差异，峰值即变化点
+        half = max(1, int(round(min_spacing * fps / 2)))
+        smoothed = uniform_filter1d(X, size=2 * half + 1, axis=0, mode='nearest')
+        padded = np.pad(smoothed, ((half, half), (0, 0)), mode='edge')
+        novelty = np.linalg.norm(padded[2 * half:] - padded[:-2 * half], axis=1)
+        peaks, _ = find_peaks(novelty, height=self.KEYFRAME_CHANGE_THRESHOLD, distance=2 * half)
+        times = np.concatenate([[0.0], frame_times[peaks]])
+
+        if snap_to_beats and len(audio_features.beats):
+            # 第一个关键帧固定在0秒，其余对齐到最近的节拍
+            beats = np.asarray(audio_features.beats, dtype=np.float64)
+            nearest = np.abs(times[1:, np.newaxis] - beats[np.newaxis, :]).argmin(axis=1)
+            times[1:] = beats[nearest]
+
+        # 去重并保证最小间隔
+        kept = []
+        for t in np.unique(times[times < duration]):
+            if not kept or t - kept[-1] >= min_spacing:
+                kept.append(float(t))
+
+        # 平稳段按最大间隔均匀补点（包括最后一个关键帧到结尾）
+        result = []
+        for start, end in zip(kept, kept[1:] + [duration]):
+            result.append(start)
+            n_gaps = int(np.ceil((end - start) / max_spacing))
+            if n_gaps > 1:
+                result.extend(np.linspace(start, end, n_gaps + 1)[1:-1].tolist())
+
+        logger.info(
+            f"自适应关键帧: {len(result)} 个 (变化点 {len(peaks)} 个, "
+            f"均匀网格需 {int(duration / min_spacing)} 个)"
+        )
+        return [round(t, 3) for t in result]
+
+    @timed("generator", "timeline")
     def _build_feature_timeline(
         self,
         audio_features: AudioFeatures,
-        time_resolution: float
+        time_resolution: float,
+        timestamps: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
-        """构建特征时间线"""
+        """
+        构建特征时间线
+
+        Args:
+            audio_features: 音频特征
+            time_resolution: 均匀网格的时间分辨率（秒）
+            timestamps: 指定的关键帧时间点，默认按 time_resolution 均匀采样
+        """
         timeline = []
-        num_frames = int(audio_features.duration / time_resolution)
+        if timestamps is None:
+            num_frames = int(audio_features.duration / time_resolution)
+            timestamps = [i * time_resolution for i in range(num_frames)]
+
+        # 每帧使用所在分段的情感，没有分段时间线时使用整体情感
+        segments = audio_features.emotion_timeline
+        segment_ends = [segment['end'] for segment in segments]
 
-        for i in range(num_frames):
-            timestamp = i * time_resolution
-            frame_index = int(timestamp / (len(audio_features.energy) / audio_features.duration))
+        for timestamp in timestamps:
+            frame_index = int(timestamp * len(audio_features.energy) / audio_features.duration)
             frame_index = min(frame_index, len(audio_features.energy) - 1)
 
             features = {
@@ -116,13 +550,17 @@ class ExpressionGenerator:
                 'energy': float(audio_features.energy[frame_index]),
                 'spectral_centroid': float(audio_features.spectral_centroid[frame_index]),
                 'pitch': float(audio_features.pitch[frame_index]) if frame_index < len(audio_features.pitch) else 0,
-                'emotion_scores': audio_features.emotion_scores
+                'emotion_scores': (
+                    segments[min(bisect_right(segment_ends, timestamp), len(segments) - 1)]['emotion_scores']
+                    if segments else audio_features.emotion_scores
+                )
             }
 
             timeline.append(features)
 
         return timeline
 
+    @timed("generator", "smoothing")
     def _smooth_expressions(
         self,
         expressions: List[Dict[str, Any]],
@@ -155,6 +593,7 @@ class ExpressionGenerator:
 
         return smoothed
 
+    @timed("generator", "export")
     def export_to_file(
         self,
         expression_data: Dict[str, Any],
@@ -0,0 +1,229 @@
+"""
+表情近邻复用模块
+对历史生成的关键帧建立归一化特征向量的KD树索引，新帧足够接近时直接复用（或插值）已有表情参数；
+新加入的关键帧先放在未索引的尾部（查询时暴力比较），积累到一定数量后再批量重建KD树；
+从持久化缓存加载与重建KD树都在锁外进行，完成后再替换，期间查询继续使用旧索引
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+from .expression_cache import ExpressionCache
+
+logger = logging.getLogger(__name__)
+
+
+class ExpressionIndex:
+    """表情参数近邻索引（按版本键隔离，可从持久化缓存加载其他worker生成的条目）"""
+
+    # 特征向量各维度：能量、频谱质心、音高（对数刻度）、节拍、五种情感分数，均归一化到约0-1
+    VECTOR_KEYS = [
+        'energy', 'spectral_centroid', 'pitch', 'tempo',
+        'happy', 'sad', 'energetic', 'calm', 'angry'
+    ]
+    # 未索引尾部超过该数量时重建KD树
+    REBUILD_TAIL = 512
+
+    def __init__(
+        self,
+        radius: float = 0.08,
+        k: int = 4,
+        expression_cache: Optional[ExpressionCache] = None,
+        refresh_seconds: float = 60.0
+    ):
+        """
+        初始化近邻索引
+
+        Args:
+            radius: 复用距离阈值（归一化特征空间的欧氏距离），<=0 表示关闭近邻复用
+            k: 参与插值的最大近邻数
+            expression_cache: 持久化缓存，用于加载其他请求/worker生成的条目
+            refresh_seconds: 从持久化缓存重新加载的间隔（秒）
+        """
+        self.radius = radius
+        self.k = k
+        self.expression_cache = expression_cache
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # 版本键 -> {'vectors', 'params', 'tree', 'indexed', 'loaded_at', 'reloading', 'rebuilding'}
+        # tree 只覆盖前 indexed 个向量，之后的为未索引尾部
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def feature_vector(cls, features: Dict[str, Any]) -> List[float]:
+        """
+        将特征帧转换为归一化特征向量
+
+        Args:
+            features: 特征帧（energy / spectral_centroid 已归一化到0-1，pitch单位Hz，tempo单位BPM）
+
+        Returns:
+            List[float]: 特征向量，维度顺序同 VECTOR_KEYS
+        """
+        pitch = float(features.get('pitch', 0) or 0)
+        # 55Hz(A1) 到 3520Hz(A7) 映射到 0-1，无音高时为0
+        pitch_norm = float(np.clip(np.log2(pitch / 55.0) / 6.0, 0.0, 1.0)) if pitch > 0 else 0.0
+        emotion_scores = features.get('emotion_scores', {})
+        return [
+            float(features.get('energy', 0.5)),
+            float(features.get('spectral_centroid', 0.5)),
+            pitch_norm,
+            float(features.get('tempo', 100)) / 200.0,
+            *(float(emotion_scores.get(key, 0.0)) for key in cls.VECTOR_KEYS[4:])
+        ]
+
+    def query(self, version: str, vectors: List[List[float]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        查找每个特征向量在阈值内的近邻，按距离反比加权插值表情参数
+
+        Args:
+            version: 版本键
+            vectors: 特征向量列表
+
+        Returns:
+            List[Optional[Dict]]: 与输入对齐的表情参数，没有足够接近的近邻时为None
+        """
+        if self.radius <= 0 or not vectors:
+            return [None] * len(vectors)
+
+        entry = self._entry(version)
+        with self._lock:
+            tree, params, indexed = entry['tree'], entry['params'], entry['indexed']
+            tail = np.asarray(entry['vectors'][indexed:], dtype=np.float64).reshape(-1, len(self.VECTOR_KEYS))
+        if tree is None and not len(tail):
+            return [None] * len(vectors)
+
+        queries = np.asarray(vectors, dtype=np.float64)
+        candidates_distances = []
+        candidates_indices = []
+        if tree is not None:
+            k = min(self.k, tree.n)
+            distances, indices = tree.query(queries, k=k, distance_upper_bound=self.radius)
+            candidates_distances.append(np.asarray(distances).reshape(len(vectors), k))
+            candidates_indices.append(np.asarray(indices).reshape(len(vectors), k))
+        if len(tail):
+            candidates_distances.append(cdist(queries, tail))
+            candidates_indices.append(np.broadcast_to(indexed + np.arange(len(tail)), (len(vectors), len(tail))))
+
+        # 合并KD树与尾部的候选，取阈值内最近的 k 个
+        distances = np.concatenate(candidates_distances, axis=1)
+        indices = np.concatenate(candidates_indices, axis=1)
+        distances[distances > self.radius] = np.inf
+        k = min(self.k, distances.shape[1])
+        order = np.argsort(distances, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for row_distances, row_indices in zip(distances, indices):
+            found = np.isfinite(row_distances)
+            if not found.any():
+                results.append(None)
+                continue
+            weights = 1.0 / (row_distances[found] + 1e-6)
+            neighbours = [params[i] for i in row_indices[found]]
+            results.append({
+                key: float(np.dot(weights, [p[key] for p in neighbours]) / weights.sum())
+                for key in neighbours[0]
+            })
+
+        reused = sum(1 for r in results if r is not None)
+        logger.info(f"近邻复用: {reused}/{len(vectors)} 帧")
+        return results
+
+    def add(self, version: str, vectors: List[List[float]], params: List[Dict[str, Any]]):
+        """
+        加入新生成的关键帧
+
+        Args:
+            version: 版本键
+            vectors: 特征向量列表
+            params: 与 vectors 对齐的表情参数
+        """
+        if self.radius <= 0 or not vectors:
+            return
+        entry = self._entry(version)
+        with self._lock:
+            entry['vectors'].extend(vectors)
+            entry['params'].extend(params)
+            if entry['rebuilding'] or len(entry['vectors']) - entry['indexed'] <= self.REBUILD_TAIL:
+                return
+            entry['rebuilding'] = True
+            snapshot = list(entry['vectors'])
+
+        # 向量只追加不修改，锁外对快照建树，完成后覆盖快照范围内的向量
+        try:
+            tree = self._build_tree(snapshot)
+        finally:
+            with self._lock:
+                entry['rebuilding'] = False
+        with self._lock:
+            if len(snapshot) > entry['indexed']:
+                entry['tree'], entry['indexed'] = tree, len(snapshot)
+
+    def _entry(self, version: str) -> Dict[str, Any]:
+        """
+        获取版本条目；首次访问或超过刷新间隔时从持久化缓存重新加载，
+        加载与建树在锁外进行，完成后替换条目（刷新期间其他调用方继续使用旧条目）
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(version)
+            if entry is not None and (
+                self.expression_cache is None or entry['reloading']
+                or now - entry['loaded_at'] < self.refresh_seconds
+            ):
+                return entry
+            if entry is not None:
+                entry['reloading'] = True
+
+        try:
+            rows = self.expression_cache.load_vectors(version) if self.expression_cache is not None else []
+            vectors = [vector for vector, _ in rows]
+            fresh = {
+                'vectors': vectors,
+                'params': [params for _, params in rows],
+                'tree': self._build_tree(vectors) if vectors else None,
+                'indexed': len(vectors),
+                'loaded_at': now,
+                'reloading': False,
+                'rebuilding': False
+            }
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry['reloading'] = False
+        if rows:
+            logger.info(f"近邻索引已加载: {len(rows)} 个关键帧 (版本 {version})")
+
+        with self._lock:
+            self._entries[version] = fresh
+        return fresh
+
+    @staticmethod
+    def _build_tree(vectors: List[List[float]]) -> cKDTree:
+        """用给定向量建KD树（不持有锁）"""
+        return cKDTree(np.asarray(vectors, dtype=np.float64))
+
+
+_default_index: Optional[ExpressionIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_expression_index(expression_cache: Optional[ExpressionCache] = None) -> ExpressionIndex:
+    """获取进程内共享的近邻索引（阈值与近邻数可通过环境变量配置）"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = ExpressionIndex(
+                radius=float(os.getenv("EXPRESSION_REUSE_RADIUS", "0.08")),
+                k=int(os.getenv("EXPRESSION_REUSE_NEIGHBORS", "4")),
+                expression_cache=expression_cache
+            )
+        return _default_index
@@ -0,0 +1,161 @@
+"""
+音频特征缓存模块
+按音频内容哈希 + 分析参数持久化 AudioFeatures，/analyze 与 /generate 共享同一份分析结果
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from .audio_analyzer import AudioFeatures
+from backend.utils.file_utils import compute_file_hash, evict_lru_files
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureCache:
+    """基于内容寻址的音频特征缓存（.npz 二进制存储，按LRU/总大小淘汰）"""
+
+    # 序列化格式或特征计算方式变化时递增，旧缓存自动失效
+    CACHE_VERSION = 3
+
+    def __init__(
+        self,
+        cache_dir: str = "data/cache/features",
+        max_bytes: int = 512 * 1024 * 1024
+    ):
+        """
+        初始化特征缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节），超出后按最近最少使用淘汰
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def make_key(self, audio_path: str, **params: Any) -> str:
+        """
+        生成缓存键
+
+        Args:
+            audio_path: 音频文件路径
+            **params: 影响分析结果的参数（sample_rate、hop_length等）
+
+        Returns:
+            str: 缓存键
+        """
+        content_hash = compute_file_hash(audio_path)
+        param_str = json.dumps(
+            {**params, "version": self.CACHE_VERSION}, sort_keys=True
+        )
+        param_hash = hashlib.sha256(param_str.encode("utf-8")).hexdigest()[:16]
+        return f"{content_hash}_{param_hash}"
+
+    def get(self, key: str) -> Optional[AudioFeatures]:
+        """
+        读取缓存的音频特征
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            AudioFeatures: 命中时返回特征，否则返回None
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                features = AudioFeatures(
+                    duration=meta["duration"],
+                    tempo=meta["tempo"],
+                    beats=data["beats"].tolist(),
+                    pitch=data["pitch"].tolist(),
+                    energy=data["energy"].tolist(),
+                    spectral_centroid=data["spectral_centroid"].tolist(),
+                    mfcc=data["mfcc"],
+                    emotion_scores=meta["emotion_scores"],
+                    timestamps=data["timestamps"].tolist(),
+                    emotion_timeline=meta.get("emotion_timeline", [])
+                )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"特征缓存读取失败，忽略该条目: {path}, 错误: {e}")
+            return None
+
+        # 更新访问时间，供LRU淘汰使用
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        logger.info(f"特征缓存命中: {key}")
+        return features
+
+    def put(self, key: str, features: AudioFeatures):
+        """
+        写入音频特征
+
+        Args:
+            key: 缓存键
+            features: 音频特征
+        """
+        path = self._path(key)
+        meta = {
+            "duration": features.duration,
+            "tempo": features.tempo,
+            "emotion_scores": features.emotion_scores,
+            "emotion_timeline": features.emotion_timeline,
+        }
+        # 先写临时文件再原子替换，避免多进程读到半写入的文件
+        tmp_path = path.with_name(f".{key}.{uuid.uuid4().hex}.tmp.npz")
+        try:
+            np.savez(
+                tmp_path,
+                meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                beats=np.asarray(features.beats, dtype=np.float64),
+                timestamps=np.asarray(features.timestamps, dtype=np.float64),
+                pitch=np.asarray(features.pitch, dtype=np.float32),
+                energy=np.asarray(features.energy, dtype=np.float32),
+                spectral_centroid=np.asarray(features.spectral_centroid, dtype=np.float32),
+                mfcc=np.asarray(features.mfcc, dtype=np.float32)
+            )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"特征缓存写入失败: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        logger.info(f"特征已缓存: {key}")
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小不超过上限"""
+        evict_lru_files(self.cache_dir, "*.npz", self.max_bytes)
+
+
+_default_cache: Optional[FeatureCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_feature_cache() -> FeatureCache:
+    """获取进程内共享的特征缓存（目录与大小上限可通过环境变量配置）"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FeatureCache(
+                cache_dir=os.getenv("FEATURE_CACHE_DIR", "data/cache/features"),
+                max_bytes=int(os.getenv("FEATURE_CACHE_MAX_MB", "512")) * 1024 * 1024
+            )
+        return _default_cache
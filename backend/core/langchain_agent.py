@@ -2,10 +2,13 @@
 LangChain表情生成代理模块
 基于AI (Google Gemini / OpenAI) 生成Live2D表情参数
 """
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import asyncio
+import hashlib
 import json
 import logging
 import os
+import threading
 from dotenv import load_dotenv
 
 from langchain_core.prompts import (
@@ -15,13 +18,20 @@ from langchain_core.prompts import (
 )
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+
+from backend.utils.metrics import record_cache, timed
+from .llm_registry import get_chat_model
+from .expression_cache import ExpressionCache
+from .expression_index import ExpressionIndex
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+class GenerationCancelledError(Exception):
+    """调用方已放弃等待，停止生成剩余窗口"""
+
+
 class Live2DExpression(BaseModel):
     """Live2D表情参数模型"""
     eye_open: float = Field(
@@ -79,6 +89,12 @@ class Live2DExpression(BaseModel):
 class ExpressionAgentV2:
     """基于LangChain的表情生成代理"""
 
+    # 批量生成：每个关键帧的输出token估算（10个参数的JSON对象）与每次请求的固定开销
+    KEYFRAME_OUTPUT_TOKENS = 120
+    BATCH_OUTPUT_OVERHEAD_TOKENS = 100
+    # 单次批量请求的输出token上限（Gemini 1.5 / GPT-4o mini 均不低于8192）
+    DEFAULT_BATCH_MAX_TOKENS = 8192
+
     def __init__(
         self,
         api_key: Optional[str] = None,
@@ -87,7 +103,12 @@ class ExpressionAgentV2:
         temperature: float = 0.7,
         max_tokens: int = 1000,
         use_copilot: bool = False,
-        use_gemini: bool = True
+        use_gemini: bool = True,
+        batch_size: Optional[int] = None,
+        batch_max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        expression_cache: Optional[ExpressionCache] = None,
+        expression_index: Optional[ExpressionIndex] = None
     ):
         """
         初始化表情代理
@@ -100,6 +121,12 @@ class ExpressionAgentV2:
             max_tokens: 最大输出token数
             use_copilot: 是否使用 GitHub Copilot API (已废弃)
             use_gemini: 是否使用 Google Gemini API (默认: True)
+            batch_size: 每次请求生成的关键帧数，默认读取 EXPRESSION_BATCH_SIZE，
+                未配置时按 batch_max_tokens 推算；1 表示逐帧调用
+            batch_max_tokens: 单次批量请求的输出token上限，默认读取 EXPRESSION_BATCH_MAX_TOKENS
+            concurrency: 异步生成时同时进行的请求数上限，默认读取 EXPRESSION_CONCURRENCY
+            expression_cache: 跨请求的表情参数缓存，按量化特征键复用历史生成结果
+            expression_index: 近邻索引，量化键未命中但特征足够接近时复用/插值历史结果
         """
         # 获取 API 配置
         self.use_gemini = use_gemini
@@ -119,6 +146,21 @@ class ExpressionAgentV2:
         self.max_tokens = max_tokens
         self.use_copilot = use_copilot  
 
+        # 批量生成窗口：受模型输出token上限约束
+        self.batch_max_tokens = batch_max_tokens or int(
+            os.getenv("EXPRESSION_BATCH_MAX_TOKENS", str(self.DEFAULT_BATCH_MAX_TOKENS))
+        )
+        max_window = max(
+            1, (self.batch_max_tokens - self.BATCH_OUTPUT_OVERHEAD_TOKENS) // self.KEYFRAME_OUTPUT_TOKENS
+        )
+        self.batch_size = min(
+            batch_size or int(os.getenv("EXPRESSION_BATCH_SIZE", "0")) or max_window,
+            max_window
+        )
+        self.concurrency = concurrency or int(os.getenv("EXPRESSION_CONCURRENCY", "4"))
+        self.expression_cache = expression_cache
+        self.expression_index = expression_index
+
         # 验证API密钥
         if not self.api_key:
             error_msg = (
@@ -160,31 +202,15 @@ class ExpressionAgentV2:
         self._setup_chain()
 
     def _initialize_llm(self):
-        """初始化LLM实例"""
-        if self.use_gemini:
-            # 使用 Google Gemini
-            llm_kwargs = {
-                "model": self.model_name,
-                "temperature": self.temperature,
-                "max_output_tokens": self.max_tokens,
-                "google_api_key": self.api_key,
-            }
-            self.llm = ChatGoogleGenerativeAI(**llm_kwargs)
-            logger.info(f"Google Gemini LLM 初始化成功: {self.model_name}")
-        else:
-            # 使用 OpenAI 兼容 API
-            llm_kwargs = {
-                "model": self.model_name,
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
-                "api_key": self.api_key,
-            }
-            
-            if self.api_base:
-                llm_kwargs["base_url"] = self.api_base
-            
-            self.llm = ChatOpenAI(**llm_kwargs)
-            logger.info(f"OpenAI LLM 初始化成功: {self.model_name}, base_url: {self.api_base}")
+        """初始化LLM实例（相同配置的代理共享同一个模型实例与HTTP连接池）"""
+        self.llm = get_chat_model(
+            use_gemini=self.use_gemini,
+            model_name=self.model_name,
+            temperature=self.temperature,
+            api_key=self.api_key,
+            max_tokens=self.max_tokens,
+            base_url=None if self.use_gemini else self.api_base
+        )
 
     def _setup_chain(self):
         """设置 LangChain 链"""
@@ -238,6 +264,36 @@ Live2D参数说明：
         # 输出解析器
         self.parser = JsonOutputParser(pydantic_object=Live2DExpression)
 
+        # 批量生成：一次请求为一个窗口内的多个关键帧生成参数
+        batch_template = """基于以下 {frame_count} 个时间点的音乐特征，为每个时间点分别生成Live2D表情参数。
+相邻时间点的表情应自然过渡。
+
+音乐特征（JSON数组，i 为帧序号，timestamp 为秒）：
+{frames}
+
+请返回JSON，expressions 数组必须包含全部 {frame_count} 个时间点，每个元素带回对应的 i：
+{{"expressions": [{{"i": 0, "eye_open": 0.0, "eye_open_r": 0.0, "eyebrow_height": 0.0, "eyebrow_height_r": 0.0, "mouth_open": 0.0, "mouth_form": 0.0, "cheek": 0.0, "body_angle_x": 0.0, "body_angle_y": 0.0, "breath": 0.0}}, ...]}}"""
+
+        self.batch_prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(system_template),
+            HumanMessagePromptTemplate.from_template(batch_template)
+        ])
+        self.batch_parser = JsonOutputParser()
+
+        # 链只编译一次；批量链按输出token上限缓存
+        self.chain = self.prompt | self.llm | self.parser
+        self._batch_chains: Dict[int, Any] = {}
+
+        # 缓存版本键：提示词、模型或温度变化后旧的缓存结果自动失效
+        self.cache_version = hashlib.sha256(json.dumps([
+            system_template,
+            human_template,
+            batch_template,
+            'gemini' if self.use_gemini else 'openai',
+            self.model_name,
+            self.temperature
+        ], ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
     def generate_expression(
         self,
         timestamp: float,
@@ -264,24 +320,14 @@ Live2D参数说明：
         logger.info(f"生成表情参数: 时间点={timestamp}s, BPM={tempo}, 能量={energy:.2f}")
 
         try:
-            # 准备输入
-            input_data = {
-                "timestamp": timestamp,
-                "tempo": tempo,
-                "energy": energy,
-                "spectral_centroid": spectral_centroid,
-                "pitch": pitch,
-                "emotion_scores": json.dumps(emotion_scores, ensure_ascii=False)
-            }
-
+            input_data = self._expression_input(
+                timestamp, tempo, energy, spectral_centroid, pitch, emotion_scores
+            )
             logger.debug(f"调用 LLM - 输入数据: {input_data}")
 
-            # 构建链
-            chain = self.prompt | self.llm | self.parser
-
             # 执行生成
             try:
-                result = chain.invoke(input_data)
+                result = self.chain.invoke(input_data)
                 logger.debug(f"LLM 返回结果: {result}")
             except Exception as llm_error:
                 logger.error(f"LLM API 调用失败: {str(llm_error)}", exc_info=True)
@@ -299,6 +345,202 @@ Live2D参数说明：
             logger.error(f"AI生成失败: {str(e)}", exc_info=True)
             raise RuntimeError(f"表情生成失败: {str(e)}")
 
+    async def agenerate_expression(
+        self,
+        timestamp: float,
+        tempo: float,
+        energy: float,
+        spectral_centroid: float,
+        pitch: float,
+        emotion_scores: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """generate_expression 的异步版本（参数与返回值相同）"""
+        logger.info(f"异步生成表情参数: 时间点={timestamp}s, BPM={tempo}, 能量={energy:.2f}")
+
+        input_data = self._expression_input(
+            timestamp, tempo, energy, spectral_centroid, pitch, emotion_scores
+        )
+        try:
+            result = await self.chain.ainvoke(input_data)
+        except Exception as llm_error:
+            logger.error(f"LLM API 调用失败: {str(llm_error)}", exc_info=True)
+            raise RuntimeError(f"AI API 调用失败: {str(llm_error)}")
+
+        return self._validate_params(result)
+
+    def _expression_input(
+        self,
+        timestamp: float,
+        tempo: float,
+        energy: float,
+        spectral_centroid: float,
+        pitch: float,
+        emotion_scores: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """单帧生成的提示词输入"""
+        return {
+            "timestamp": timestamp,
+            "tempo": tempo,
+            "energy": energy,
+            "spectral_centroid": spectral_centroid,
+            "pitch": pitch,
+            "emotion_scores": json.dumps(emotion_scores, ensure_ascii=False)
+        }
+
+    def generate_expressions_batch(
+        self,
+        frames: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        一次请求为多个关键帧生成表情参数
+
+        Args:
+            frames: 特征帧列表（字段同 generate_expression 的参数）
+
+        Returns:
+            List[Optional[Dict]]: 与 frames 按序对齐的表情参数，模型遗漏的帧为None
+        """
+        logger.info(f"批量生成表情参数: {len(frames)} 帧, 起始时间点={frames[0].get('timestamp', 0)}s")
+        chain, input_data = self._batch_request(frames)
+        try:
+            result = chain.invoke(input_data)
+        except Exception as llm_error:
+            raise RuntimeError(f"AI API 调用失败: {str(llm_error)}")
+        return self._align_batch(result, len(frames))
+
+    async def agenerate_expressions_batch(
+        self,
+        frames: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """generate_expressions_batch 的异步版本"""
+        logger.info(f"异步批量生成表情参数: {len(frames)} 帧, 起始时间点={frames[0].get('timestamp', 0)}s")
+        chain, input_data = self._batch_request(frames)
+        try:
+            result = await chain.ainvoke(input_data)
+        except Exception as llm_error:
+            raise RuntimeError(f"AI API 调用失败: {str(llm_error)}")
+        return self._align_batch(result, len(frames))
+
+    def _batch_request(self, frames: List[Dict[str, Any]]) -> Tuple[Any, Dict[str, Any]]:
+        """构建批量生成的链与输入"""
+        input_frames = [
+            {
+                "i": i,
+                "timestamp": round(float(features.get('timestamp', 0)), 3),
+                "tempo": round(float(features.get('tempo', 100)), 2),
+                "energy": round(float(features.get('energy', 0.5)), 4),
+                "spectral_centroid": round(float(features.get('spectral_centroid', 0.5)), 4),
+                "pitch": round(float(features.get('pitch', 0)), 2),
+                "emotion_scores": {
+                    k: round(float(v), 3) for k, v in features.get('emotion_scores', {}).items()
+                }
+            }
+            for i, features in enumerate(frames)
+        ]
+        input_data = {
+            "frames": json.dumps(input_frames, ensure_ascii=False),
+            "frame_count": len(frames)
+        }
+
+        # 输出长度随窗口大小增长，按帧数放宽token上限
+        max_tokens = max(
+            self.max_tokens,
+            self.KEYFRAME_OUTPUT_TOKENS * len(frames) + self.BATCH_OUTPUT_OVERHEAD_TOKENS
+        )
+        chain = self._batch_chains.get(max_tokens)
+        if chain is None:
+            token_kwarg = "max_output_tokens" if self.use_gemini else "max_tokens"
+            chain = self.batch_prompt | self.llm.bind(**{token_kwarg: max_tokens}) | self.batch_parser
+            self._batch_chains[max_tokens] = chain
+        return chain, input_data
+
+    def _align_batch(self, result: Any, n_frames: int) -> List[Optional[Dict[str, Any]]]:
+        """校验批量结果并按 i 对齐回原始帧，缺少 i 时按返回顺序对齐；参数无效的帧留空"""
+        items = result.get('expressions') if isinstance(result, dict) else result
+        if not isinstance(items, list):
+            raise RuntimeError(f"批量表情结果格式错误: {type(result).__name__}")
+
+        aligned: List[Optional[Dict[str, Any]]] = [None] * n_frames
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.get('i', position)
+            if isinstance(index, (int, float)) and 0 <= index < n_frames and aligned[int(index)] is None:
+                try:
+                    aligned[int(index)] = self._validate_params(item)
+                except (TypeError, ValueError) as e:
+                    # 单个元素的参数值非法（null、非数字字符串），留空由逐帧生成补齐
+                    logger.warning(f"批量结果第 {int(index)} 帧参数无效: {e}")
+
+        missing = sum(1 for params in aligned if params is None)
+        if missing:
+            logger.warning(f"批量生成缺少 {missing}/{n_frames} 帧")
+        return aligned
+
+    def _generate_window(
+        self,
+        frames: List[Dict[str, Any]],
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[Dict[str, Any]]:
+        """生成一个窗口的表情参数：整体失败时二分重试，遗漏的帧逐帧补齐；每次请求前检查取消标记"""
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelledError("表情生成已取消")
+        if len(frames) == 1:
+            return [self._generate_single(frames[0])]
+
+        try:
+            results = self.generate_expressions_batch(frames)
+        except RuntimeError as e:
+            logger.warning(f"批量生成失败，拆分窗口重试 ({len(frames)} 帧): {e}")
+            middle = len(frames) // 2
+            return (
+                self._generate_window(frames[:middle], cancel_event)
+                + self._generate_window(frames[middle:], cancel_event)
+            )
+
+        return [
+            params if params is not None else self._generate_window([features], cancel_event)[0]
+            for features, params in zip(frames, results)
+        ]
+
+    async def _agenerate_window(self, frames: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """_generate_window 的异步版本"""
+        if len(frames) == 1:
+            return [await self._agenerate_single(frames[0])]
+
+        try:
+            results = await self.agenerate_expressions_batch(frames)
+        except RuntimeError as e:
+            logger.warning(f"批量生成失败，拆分窗口重试 ({len(frames)} 帧): {e}")
+            middle = len(frames) // 2
+            # 两半依次重试：窗口只占用一个并发名额，并发拆分会在服务商故障时放大请求数
+            first = await self._agenerate_window(frames[:middle])
+            return first + await self._agenerate_window(frames[middle:])
+
+        return [
+            params if params is not None else await self._agenerate_single(features)
+            for features, params in zip(frames, results)
+        ]
+
+    def _generate_single(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """逐帧生成表情参数"""
+        return self.generate_expression(**self._single_kwargs(features))
+
+    async def _agenerate_single(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """逐帧异步生成表情参数"""
+        return await self.agenerate_expression(**self._single_kwargs(features))
+
+    @staticmethod
+    def _single_kwargs(features: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'timestamp': features.get('timestamp', 0),
+            'tempo': features.get('tempo', 100),
+            'energy': features.get('energy', 0.5),
+            'spectral_centroid': features.get('spectral_centroid', 0.5),
+            'pitch': features.get('pitch', 0),
+            'emotion_scores': features.get('emotion_scores', {})
+        }
+
     def _validate_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """验证并修正参数范围"""
         validated = {}
@@ -327,7 +569,9 @@ Live2D参数说明：
     def batch_generate_expressions(
         self,
         feature_timeline: List[Dict[str, Any]],
-        use_cache: bool = True
+        use_cache: bool = True,
+        batch_size: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None
     ) -> List[Dict[str, Any]]:
         """
         批量生成表情参数
@@ -335,47 +579,189 @@ Live2D参数说明：
         Args:
             feature_timeline: 特征时间线列表
             use_cache: 是否使用缓存（相似特征复用结果）
+            batch_size: 每次请求生成的关键帧数，默认使用实例配置
+            cancel_event: 取消标记，置位后不再发起新的请求
 
         Returns:
             List[Dict]: 表情参数列表
+
+        Raises:
+            GenerationCancelledError: 生成过程中 cancel_event 被置位
         """
-        expressions = []
-        cache = {} if use_cache else None
+        batch_size = max(1, batch_size or self.batch_size)
+        frame_keys, pending = self._dedupe_frames(feature_timeline, use_cache)
+        generated = self._lookup_reusable(pending) if use_cache else {}
 
-        for i, features in enumerate(feature_timeline):
-            # 生成缓存键
+        keys = [key for key in pending if key not in generated]
+        new_expressions: Dict[Any, Dict[str, Any]] = {}
+        try:
+            for start in range(0, len(keys), batch_size):
+                window_keys = keys[start:start + batch_size]
+                window = self._generate_window([pending[key] for key in window_keys], cancel_event)
+                new_expressions.update(zip(window_keys, window))
+        finally:
+            # 取消或失败时也缓存已完成的窗口，这些请求已经产生了费用
             if use_cache:
-                cache_key = self._generate_cache_key(features)
-                if cache_key in cache:
-                    logger.debug(f"使用缓存结果: 帧 {i}")
-                    expressions.append({
-                        'timestamp': features.get('timestamp', 0),
-                        'parameters': cache[cache_key].copy()
-                    })
-                    continue
-
-            # 生成表情
-            expression = self.generate_expression(
-                timestamp=features.get('timestamp', 0),
-                tempo=features.get('tempo', 100),
-                energy=features.get('energy', 0.5),
-                spectral_centroid=features.get('spectral_centroid', 0.5),
-                pitch=features.get('pitch', 0),
-                emotion_scores=features.get('emotion_scores', {})
+                self._store_cache(new_expressions, pending)
+        generated.update(new_expressions)
+
+        logger.info(
+            f"批量生成: {len(feature_timeline)} 帧, 去重后 {len(keys)} 帧, "
+            f"窗口大小 {batch_size}, 共 {(len(keys) + batch_size - 1) // batch_size} 个窗口"
+        )
+        return self._assemble_expressions(feature_timeline, frame_keys, generated)
+
+    async def abatch_generate_expressions(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        use_cache: bool = True,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        keyframe_callback: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        异步批量生成表情参数：各窗口并发请求（受并发上限与服务商限速约束），
+        结果按时间线顺序组装，输出格式与 batch_generate_expressions 相同
+
+        Args:
+            feature_timeline: 特征时间线列表
+            use_cache: 是否使用缓存（相似特征复用结果）
+            batch_size: 每次请求生成的关键帧数，默认使用实例配置
+            concurrency: 同时进行的请求数上限，默认使用实例配置
+            progress_callback: 每个窗口完成后调用，参数为 (已完成帧数, 需生成的帧数)
+            keyframe_callback: 时间线开头连续可用的关键帧增加时调用，参数为 (起始帧序号, 新增关键帧)，
+                用于边生成边播放
+
+        Returns:
+            List[Dict]: 表情参数列表
+        """
+        batch_size = max(1, batch_size or self.batch_size)
+        concurrency = max(1, concurrency or self.concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        frame_keys, pending = self._dedupe_frames(feature_timeline, use_cache)
+        # 缓存读写是同步SQLite（查询同时写命中计数，繁忙时最多等待10秒），放到线程中执行，不阻塞事件循环
+        generated = await asyncio.to_thread(self._lookup_reusable, pending) if use_cache else {}
+
+        keys = [key for key in pending if key not in generated]
+        windows = [keys[start:start + batch_size] for start in range(0, len(keys), batch_size)]
+
+        done = 0
+        emitted = 0
+
+        def emit_ready():
+            """推送时间线开头已全部生成的连续关键帧"""
+            nonlocal emitted
+            ready = emitted
+            while ready < len(frame_keys) and frame_keys[ready] in generated:
+                ready += 1
+            if ready > emitted:
+                keyframe_callback(emitted, self._assemble_expressions(
+                    feature_timeline[emitted:ready], frame_keys[emitted:ready], generated
+                ))
+                emitted = ready
+
+        if keyframe_callback is not None:
+            emit_ready()
+
+        async def run_window(window_keys: List[Any]) -> List[Dict[str, Any]]:
+            nonlocal done
+            async with semaphore:
+                window = await self._agenerate_window([pending[key] for key in window_keys])
+            done += len(window_keys)
+            if progress_callback is not None:
+                progress_callback(done, len(keys))
+            if keyframe_callback is not None:
+                generated.update(zip(window_keys, window))
+                emit_ready()
+            return window
+
+        results = await asyncio.gather(*(run_window(window_keys) for window_keys in windows))
+
+        new_expressions: Dict[Any, Dict[str, Any]] = {}
+        for window_keys, window in zip(windows, results):
+            new_expressions.update(zip(window_keys, window))
+
+        if use_cache:
+            await asyncio.to_thread(self._store_cache, new_expressions, pending)
+        generated.update(new_expressions)
+
+        logger.info(
+            f"异步批量生成: {len(feature_timeline)} 帧, 去重后 {len(keys)} 帧, "
+            f"窗口大小 {batch_size}, 共 {len(windows)} 个窗口, 并发 {concurrency}"
+        )
+        return self._assemble_expressions(feature_timeline, frame_keys, generated)
+
+    def _dedupe_frames(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        use_cache: bool
+    ) -> Tuple[List[Any], Dict[Any, Dict[str, Any]]]:
+        """按缓存键去重，只为每组相似特征的首帧请求LLM"""
+        frame_keys = []
+        pending: Dict[Any, Dict[str, Any]] = {}
+        for i, features in enumerate(feature_timeline):
+            key = self._generate_cache_key(features) if use_cache else i
+            frame_keys.append(key)
+            if key not in pending:
+                pending[key] = features
+        return frame_keys, pending
+
+    @timed("agent", "cache_lookup")
+    def _lookup_reusable(self, pending: Dict[Any, Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+        """复用历史结果：先按量化特征键精确命中，再对剩余帧做近邻查找"""
+        reused: Dict[Any, Dict[str, Any]] = {}
+        if self.expression_cache is not None and pending:
+            reused.update(self.expression_cache.get_many(self.cache_version, pending.keys()))
+            record_cache("expression", len(reused), len(pending) - len(reused))
+
+        remaining = [key for key in pending if key not in reused]
+        if self.expression_index is not None and remaining:
+            neighbours = self.expression_index.query(
+                self.cache_version,
+                [ExpressionIndex.feature_vector(pending[key]) for key in remaining]
+            )
+            before = len(reused)
+            reused.update(
+                (key, self._validate_params(params))
+                for key, params in zip(remaining, neighbours) if params is not None
+            )
+            record_cache("expression_index", len(reused) - before, len(remaining) - (len(reused) - before))
+        return reused
+
+    @timed("agent", "cache_store")
+    def _store_cache(
+        self,
+        expressions: Dict[Any, Dict[str, Any]],
+        pending: Dict[Any, Dict[str, Any]]
+    ):
+        """写入本次新生成的表情参数及其特征向量"""
+        if not expressions:
+            return
+        vectors = {key: ExpressionIndex.feature_vector(pending[key]) for key in expressions}
+        if self.expression_cache is not None:
+            self.expression_cache.put_many(self.cache_version, expressions, vectors)
+        if self.expression_index is not None:
+            self.expression_index.add(
+                self.cache_version,
+                list(vectors.values()),
+                list(expressions.values())
             )
 
-            result = {
+    def _assemble_expressions(
+        self,
+        feature_timeline: List[Dict[str, Any]],
+        frame_keys: List[Any],
+        generated: Dict[Any, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """按时间线顺序组装关键帧"""
+        return [
+            {
                 'timestamp': features.get('timestamp', 0),
-                'parameters': expression
+                'parameters': generated[key].copy()
             }
-            expressions.append(result)
-
-            # 存入缓存
-            if use_cache:
-                cache[cache_key] = expression.copy()
-
-        logger.info(f"批量生成完成: {len(expressions)} 个关键帧")
-        return expressions
+            for features, key in zip(feature_timeline, frame_keys)
+        ]
 
     def _generate_cache_key(self, features: Dict[str, Any]) -> str:
         """生成缓存键（量化特征）"""
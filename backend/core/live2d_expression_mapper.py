@@ -6,10 +6,11 @@ import json
 import logging
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from openai import OpenAI
-from langchain_openai import ChatOpenAI
 from backend.core.ai_config import AIConfig
+from backend.core.llm_registry import get_chat_model
+from backend.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
@@ -28,27 +29,15 @@ class Live2DExpressionMapper:
         config = AIConfig.get_expression_config()
         self.use_gemini = config['use_gemini']
         
-        if not self.use_gemini:
-            # 使用OpenAI
-            llm_kwargs = {
-                "model": config['model_name'],
-                "temperature": config['temperature'],
-                "max_tokens": config['max_tokens'],
-            }
-            if config.get('api_base'):
-                llm_kwargs['base_url'] = config['api_base']
-            if config.get('api_key'):
-                llm_kwargs['api_key'] = config['api_key']
-            
-            self.client = ChatOpenAI(**llm_kwargs)
-        else:
-            # 使用Gemini需要不同的初始化
-            from langchain_google_genai import ChatGoogleGenerativeAI
-            self.client = ChatGoogleGenerativeAI(
-                model=config['model_name'],
-                temperature=config['temperature'],
-                google_api_key=config['api_key']
-            )
+        # 与其他代理共享模型实例与HTTP连接池
+        self.client = get_chat_model(
+            use_gemini=self.use_gemini,
+            model_name=config['model_name'],
+            temperature=config['temperature'],
+            api_key=config.get('api_key'),
+            max_tokens=None if self.use_gemini else config['max_tokens'],
+            base_url=None if self.use_gemini else config.get('api_base')
+        )
         
         self.expressions_config = self._load_expressions_config()
         
@@ -85,10 +74,12 @@ class Live2DExpressionMapper:
             logger.error(f"加载表情配置失败: {e}")
             raise
     
+    @timed("mapper", "mapping")
     def map_emotions_to_expressions(
         self, 
         emotion_scores: Dict[str, float],
-        duration: float
+        duration: float,
+        emotion_timeline: Optional[List[Dict[str, Any]]] = None
     ) -> List[str]:
         """
         使用AI将情感分数映射到Live2D表情序列
@@ -96,6 +87,8 @@ class Live2DExpressionMapper:
         Args:
             emotion_scores: 情感分数字典
             duration: 音频总时长
+            emotion_timeline: 分段情感时间线 [{'start', 'end', 'emotion_scores'}]，
+                提供时每个分段对应一个表情
             
         Returns:
             表情索引数组，例如 ["0", "1", "1", "2"]
@@ -110,6 +103,24 @@ class Live2DExpressionMapper:
                     'description': self._get_emotion_description(expr['name'])
                 })
             
+            # 分段情感时间线：每段直接对应一个表情，不再要求模型自行切分
+            timeline_section = ""
+            if emotion_timeline:
+                segments_info = [
+                    {
+                        'start': round(segment['start'], 2),
+                        'end': round(segment['end'], 2),
+                        'emotion_scores': {k: round(v, 3) for k, v in segment['emotion_scores'].items()}
+                    }
+                    for segment in emotion_timeline
+                ]
+                timeline_section = f"""
+分段情感时间线（共{len(segments_info)}段，按时间顺序）：
+{json.dumps(segments_info, ensure_ascii=False)}
+
+若提供了分段情感时间线，请为每个分段选择一个表情，列表应有 {len(segments_info)} 个元素，第i个表情对应第i个分段的情感
+"""
+
             # 构建prompt
             system_prompt = "你是一个专业的动画表情设计师，擅长根据情感选择合适的表情动画。你必须只返回JSON格式的数据，不要包含任何其他文字。"
             
@@ -122,7 +133,7 @@ class Live2DExpressionMapper:
 {json.dumps(emotion_scores, ensure_ascii=False, indent=2)}
 
 音频总时长：{duration}秒
-
+{timeline_section}
 要求：
 1. 根据情感分析结果选择最匹配的表情序列
 2. 表情切换要自然流畅
@@ -0,0 +1,183 @@
+"""
+Live2D表情序列存储模块
+按表情ID持久化生成的Live2D表情序列，并为全局与每个会话维护"最新序列"指针（SQLite WAL），
+多个uvicorn worker进程共享同一份数据，任意worker都能返回最近一次生成的序列
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 全局"最新序列"指针使用的作用域名
+GLOBAL_SCOPE = ""
+
+
+class Live2DSequenceStore:
+    """Live2D表情序列存储（按创建时间淘汰到条目上限以内）"""
+
+    def __init__(
+        self,
+        db_path: str = "data/cache/live2d_sequences.sqlite3",
+        max_entries: int = 10000
+    ):
+        """
+        初始化序列存储
+
+        Args:
+            db_path: SQLite数据库路径
+            max_entries: 最大序列数，超出后删除最早生成的序列
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS sequences (
+                    expression_id TEXT PRIMARY KEY,
+                    session_id TEXT,
+                    file_id TEXT,
+                    sequence TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sequences_created ON sequences (created_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS latest (scope TEXT PRIMARY KEY, expression_id TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接；WAL模式允许多进程并发读、串行写"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(
+        self,
+        expression_id: str,
+        sequence: List[str],
+        session_id: Optional[str] = None,
+        file_id: Optional[str] = None
+    ):
+        """
+        保存序列，并更新全局与所属会话的最新序列指针
+
+        Args:
+            expression_id: 表情ID
+            sequence: Live2D表情序列
+            session_id: 会话ID
+            file_id: 音频文件ID
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sequences "
+                "(expression_id, session_id, file_id, sequence, created_at) VALUES (?, ?, ?, ?, ?)",
+                (expression_id, session_id, file_id, json.dumps(sequence), now)
+            )
+            scopes = [GLOBAL_SCOPE] + ([session_id] if session_id else [])
+            conn.executemany(
+                "INSERT OR REPLACE INTO latest (scope, expression_id) VALUES (?, ?)",
+                [(scope, expression_id) for scope in scopes]
+            )
+            self._evict(conn)
+
+    def attach(self, expression_id: str, session_id: str):
+        """
+        将已保存的序列设为会话的最新序列（合并到其他会话发起的相同生成任务时使用）
+
+        Args:
+            expression_id: 表情ID
+            session_id: 会话ID
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO latest (scope, expression_id) "
+                "SELECT ?, expression_id FROM sequences WHERE expression_id = ?",
+                (session_id, expression_id)
+            )
+
+    def get(self, expression_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按表情ID读取序列
+
+        Args:
+            expression_id: 表情ID
+
+        Returns:
+            Optional[Dict]: expression_id / session_id / file_id / live2d_sequence / created_at
+        """
+        row = self._connect().execute(
+            "SELECT expression_id, session_id, file_id, sequence, created_at "
+            "FROM sequences WHERE expression_id = ?",
+            (expression_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "expression_id": row[0],
+            "session_id": row[1],
+            "file_id": row[2],
+            "live2d_sequence": json.loads(row[3]),
+            "created_at": row[4],
+        }
+
+    def latest(self, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取最新序列
+
+        Args:
+            session_id: 会话ID，为空时返回所有会话中最近生成的序列
+
+        Returns:
+            Optional[Dict]: 同 get，没有序列时返回None
+        """
+        row = self._connect().execute(
+            "SELECT expression_id FROM latest WHERE scope = ?",
+            (session_id or GLOBAL_SCOPE,)
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def _evict(self, conn: sqlite3.Connection):
+        """按创建时间淘汰到条目上限以内，并清理指向已删除序列的指针"""
+        (count,) = conn.execute("SELECT COUNT(*) FROM sequences").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM sequences WHERE rowid IN "
+                "(SELECT rowid FROM sequences ORDER BY created_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            conn.execute(
+                "DELETE FROM latest WHERE expression_id NOT IN (SELECT expression_id FROM sequences)"
+            )
+
+
+_default_store: Optional[Live2DSequenceStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_sequence_store() -> Live2DSequenceStore:
+    """获取进程内共享的Live2D序列存储（路径与条目上限可通过环境变量配置）"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = Live2DSequenceStore(
+                db_path=os.getenv("LIVE2D_SEQUENCE_STORE_PATH", "data/cache/live2d_sequences.sqlite3"),
+                max_entries=int(os.getenv("LIVE2D_SEQUENCE_MAX_ENTRIES", "10000"))
+            )
+        return _default_store
@@ -0,0 +1,171 @@
+"""
+LLM客户端注册表
+进程内按 服务商/模型/温度/输出上限 复用已配置的聊天模型，OpenAI兼容客户端共享同一个HTTP连接池
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_openai import ChatOpenAI
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from .ai_config import get_rate_limiter
+from backend.utils.metrics import record_llm_call
+
+logger = logging.getLogger(__name__)
+
+_models: Dict[Tuple[Any, ...], BaseChatModel] = {}
+_models_lock = threading.Lock()
+
+_http_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+_http_clients_lock = threading.Lock()
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """记录每次LLM调用的耗时、token用量与失败次数（挂载在共享模型上，覆盖所有调用方）"""
+
+    # 在调用方的线程/任务中同步执行，保证能读到当前请求的耗时明细
+    run_inline = True
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        started = self._started.pop(run_id, None)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        record_llm_call(self.model_name, elapsed, _token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        started = self._started.pop(run_id, None)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        record_llm_call(self.model_name, elapsed, {}, error=True)
+
+
+def _token_usage(response: LLMResult) -> Dict[str, int]:
+    """从调用结果中读取token用量（优先消息的 usage_metadata，其次服务商返回的 token_usage）"""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not input_tokens and not output_tokens:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return {"input": input_tokens, "output": output_tokens} if input_tokens or output_tokens else {}
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    获取进程内共享的HTTP客户端（连接池、keep-alive与TLS会话在所有请求间复用）
+
+    连接池大小通过 LLM_HTTP_MAX_CONNECTIONS / LLM_HTTP_MAX_KEEPALIVE 配置，
+    请求超时通过 LLM_HTTP_TIMEOUT（秒）配置
+
+    Returns:
+        Tuple[httpx.Client, httpx.AsyncClient]: (同步客户端, 异步客户端)
+    """
+    global _http_clients
+    with _http_clients_lock:
+        if _http_clients is None:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64")),
+                max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "16"))
+            )
+            timeout = httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "120")), connect=10.0)
+            _http_clients = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout)
+            )
+        return _http_clients
+
+
+def get_chat_model(
+    use_gemini: bool,
+    model_name: str,
+    temperature: float,
+    api_key: Optional[str],
+    max_tokens: Optional[int] = None,
+    base_url: Optional[str] = None
+) -> BaseChatModel:
+    """
+    获取（必要时创建）共享的聊天模型实例
+
+    相同配置的调用方拿到同一个实例；所有实例都挂载按服务商共享的限速器与调用指标回调
+
+    Args:
+        use_gemini: 是否使用Gemini
+        model_name: 模型名称
+        temperature: 温度参数
+        api_key: API密钥，为空时由客户端库从环境变量读取
+        max_tokens: 最大输出token数，None表示使用服务商默认值
+        base_url: API基础URL（仅OpenAI兼容API）
+
+    Returns:
+        BaseChatModel: 聊天模型
+    """
+    # 密钥只以哈希形式参与键计算，避免明文常驻在键里
+    key = (
+        "gemini" if use_gemini else "openai",
+        model_name,
+        temperature,
+        max_tokens,
+        base_url,
+        hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    )
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        if use_gemini:
+            llm_kwargs = {
+                "model": model_name,
+                "temperature": temperature,
+                "rate_limiter": get_rate_limiter(True),
+                "callbacks": [LLMMetricsCallback(model_name)],
+            }
+            if api_key:
+                llm_kwargs["google_api_key"] = api_key
+            if max_tokens is not None:
+                llm_kwargs["max_output_tokens"] = max_tokens
+            model = ChatGoogleGenerativeAI(**llm_kwargs)
+            logger.info(f"Google Gemini LLM 初始化成功: {model_name}")
+        else:
+            http_client, http_async_client = get_http_clients()
+            llm_kwargs = {
+                "model": model_name,
+                "temperature": temperature,
+                "rate_limiter": get_rate_limiter(False),
+                "callbacks": [LLMMetricsCallback(model_name)],
+                "http_client": http_client,
+                "http_async_client": http_async_client,
+            }
+            if api_key:
+                llm_kwargs["api_key"] = api_key
+            if max_tokens is not None:
+                llm_kwargs["max_tokens"] = max_tokens
+            if base_url:
+                llm_kwargs["base_url"] = base_url
+            model = ChatOpenAI(**llm_kwargs)
+            logger.info(f"OpenAI LLM 初始化成功: {model_name}, base_url: {base_url}")
+
+        _models[key] = model
+        return model
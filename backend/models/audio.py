@@ -2,7 +2,7 @@
 音频相关数据模型
 """
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Any, Optional
 
 class AudioUploadRequest(BaseModel):
     """音频上传请求"""
@@ -21,6 +21,9 @@ class AudioAnalysisRequest(BaseModel):
     file_id: str = Field(..., description="文件ID")
     sample_rate: int = Field(default=44100, description="采样率")
     hop_length: int = Field(default=512, description="跳跃长度")
+    pitch_method: str = Field(default="piptrack", description="音高提取方式 (piptrack / yin)")
+    streaming: bool = Field(default=False, description="是否使用分块流式分析")
+    parallel: bool = Field(default=False, description="是否多进程并行分析")
 
 class AudioFeatures(BaseModel):
     """音频特征"""
@@ -30,6 +33,7 @@ class AudioFeatures(BaseModel):
     energy_mean: float = Field(..., description="平均能量")
     spectral_centroid_mean: float = Field(..., description="平均频谱质心")
     emotion_scores: Dict[str, float] = Field(..., description="情感分数")
+    emotion_timeline: List[Dict[str, Any]] = Field(default_factory=list, description="分段情感时间线")
 
 class AudioAnalysisResponse(BaseModel):
     """音频分析响应"""
@@ -2,7 +2,7 @@
 表情相关数据模型
 """
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
 
 class ExpressionParameters(BaseModel):
     """Live2D表情参数"""
@@ -28,6 +28,15 @@ class GenerateExpressionRequest(BaseModel):
     model_name: str = Field(default="default", description="Live2D模型名称")
     time_resolution: float = Field(default=0.1, ge=0.01, le=1.0, description="时间分辨率")
     enable_smoothing: bool = Field(default=True, description="是否启用平滑")
+    pitch_method: str = Field(default="piptrack", description="音高提取方式 (piptrack / yin)")
+    streaming: bool = Field(default=False, description="是否使用分块流式分析")
+    parallel: bool = Field(default=False, description="是否多进程并行分析")
+    n_clusters: Optional[int] = Field(default=None, ge=0, description="特征聚类数，只为代表帧调用LLM（0表示不聚类）")
+    cluster_blend: bool = Field(default=False, description="是否按距离混合相邻簇的表情参数")
+    keyframe_mode: Literal["grid", "adaptive"] = Field(default="grid", description="关键帧放置方式")
+    snap_to_beats: bool = Field(default=False, description="自适应关键帧是否对齐节拍")
+    max_keyframe_spacing: Optional[float] = Field(default=None, gt=0, description="自适应关键帧最大间隔（秒）")
+    expression_backend: Optional[Literal["llm", "local", "auto"]] = Field(default=None, description="表情生成后端")
 
 class GenerateExpressionResponse(BaseModel):
     """生成表情响应"""
@@ -8,8 +8,26 @@ from pathlib import Path
 from typing import Tuple, Optional
 import logging
 
+from .pcm_cache import get_pcm_cache
+
 logger = logging.getLogger(__name__)
 
+def load_audio(audio_path: str, sr: int = 22050, use_cache: bool = True) -> Tuple[np.ndarray, int]:
+    """
+    加载单声道音频，默认经由PCM缓存（同一文件同一采样率只解码一次）
+
+    Args:
+        audio_path: 音频文件路径
+        sr: 目标采样率
+        use_cache: 是否使用PCM缓存，缓存命中时返回只读内存映射数组
+
+    Returns:
+        Tuple[np.ndarray, int]: (音频信号, 采样率)
+    """
+    if use_cache:
+        return get_pcm_cache().load(audio_path, sr)
+    return librosa.load(audio_path, sr=sr)
+
 def convert_to_wav(input_path: str, output_path: str, sample_rate: int = 44100) -> str:
     """
     转换音频文件为WAV格式
@@ -24,7 +42,7 @@ def convert_to_wav(input_path: str, output_path: str, sample_rate: int = 44100)
     """
     try:
         # 加载音频
-        y, sr = librosa.load(input_path, sr=sample_rate)
+        y, sr = load_audio(input_path, sr=sample_rate)
         
         # 保存为WAV
         sf.write(output_path, y, sr)
@@ -47,7 +65,9 @@ def get_audio_duration(audio_path: str) -> float:
         float: 时长（秒）
     """
     try:
-        duration = librosa.get_duration(path=audio_path)
+        duration = get_pcm_cache().cached_duration(audio_path)
+        if duration is None:
+            duration = librosa.get_duration(path=audio_path)
         return duration
     except Exception as e:
         logger.error(f"获取音频时长失败: {str(e)}")
@@ -68,7 +88,7 @@ def trim_audio(audio_path: str, output_path: str, start_time: float = 0,
         str: 输出文件路径
     """
     try:
-        y, sr = librosa.load(audio_path)
+        y, sr = load_audio(audio_path)
         
         start_sample = int(start_time * sr)
         end_sample = int(end_time * sr) if end_time else len(y)
@@ -115,8 +135,8 @@ def mix_audio(audio1_path: str, audio2_path: str, output_path: str,
     """
     try:
         # 加载音频
-        y1, sr1 = librosa.load(audio1_path)
-        y2, sr2 = librosa.load(audio2_path, sr=sr1)  # 统一采样率
+        y1, sr1 = load_audio(audio1_path)
+        y2, sr2 = load_audio(audio2_path, sr=sr1)  # 统一采样率
         
         # 对齐长度
         min_len = min(len(y1), len(y2))
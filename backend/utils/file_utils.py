@@ -3,6 +3,8 @@
 """
 import os
 import shutil
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List
 import mimetypes
@@ -22,6 +24,30 @@ def get_file_size(file_path: str) -> int:
     """
     return Path(file_path).stat().st_size
 
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的SHA-256哈希
+
+    同一进程内按 (路径, 大小, 修改时间) 记忆结果，文件未变化时不会重复读取。
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 分块读取大小（字节）
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    stat = Path(file_path).stat()
+    return _hash_file(str(file_path), stat.st_size, stat.st_mtime_ns, chunk_size)
+
+@lru_cache(maxsize=4096)
+def _hash_file(file_path: str, size: int, mtime_ns: int, chunk_size: int) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
 def format_file_size(size_bytes: int) -> str:
     """
     格式化文件大小
@@ -118,6 +144,39 @@ def clean_temp_files(temp_dir: str, age_hours: int = 24):
                 safe_delete_file(str(file_path))
                 logger.info(f"清理临时文件: {file_path}")
 
+def evict_lru_files(directory: str, pattern: str, max_bytes: int):
+    """
+    按最近访问时间（mtime）淘汰文件，直到目录下匹配文件总大小不超过上限
+
+    以 "." 开头的文件视为写入中的临时文件，不参与统计。
+
+    Args:
+        directory: 目录路径
+        pattern: 文件模式
+        max_bytes: 总大小上限（字节）
+    """
+    entries = []
+    total = 0
+    for file_path in Path(directory).glob(pattern):
+        if file_path.name.startswith('.'):
+            continue
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file_path))
+        total += stat.st_size
+
+    if total <= max_bytes:
+        return
+
+    for _, size, file_path in sorted(entries, key=lambda e: e[0]):
+        file_path.unlink(missing_ok=True)
+        total -= size
+        logger.info(f"淘汰缓存文件: {file_path.name}")
+        if total <= max_bytes:
+            break
+
 def list_files(directory: str, pattern: str = "*") -> List[str]:
     """
     列出目录下的文件
@@ -0,0 +1,266 @@
+"""
+性能指标模块
+进程内累计各流水线阶段耗时、LLM调用次数与token用量、缓存命中情况，以Prometheus文本格式导出；
+同时按请求收集耗时明细（contextvars，跟随 asyncio.to_thread / 线程池调用传递），附在响应元数据中
+"""
+import contextvars
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# 耗时直方图的桶上界（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 指标名 -> (类型, 说明)
+METRICS = {
+    "geyan_stage_duration_seconds": ("histogram", "流水线各阶段耗时"),
+    "geyan_llm_calls_total": ("counter", "LLM调用次数"),
+    "geyan_llm_latency_seconds": ("histogram", "单次LLM调用耗时"),
+    "geyan_llm_tokens_total": ("counter", "LLM token用量"),
+    "geyan_cache_requests_total": ("counter", "缓存查询次数"),
+    "geyan_jobs": ("gauge", "各状态的后台任务数"),
+    "geyan_job_queue_length": ("gauge", "排队中的后台任务数"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表（计数器、直方图、仪表）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        # (指标名, 标签) -> [各桶计数..., 总和, 次数]
+        self._histograms: Dict[Tuple[str, LabelKey], List[float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: str):
+        """计数器累加"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str):
+        """设置仪表值"""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels: str):
+        """直方图记录一次观测值"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0.0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self) -> str:
+        """
+        导出Prometheus文本格式（0.0.4）
+
+        Returns:
+            str: 指标文本
+        """
+        with self._lock:
+            samples: Dict[str, List[str]] = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                lines = samples.setdefault(name, [])
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count:g}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram[-1]:g}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-2]:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram[-1]:g}")
+
+        output = []
+        for name, lines in samples.items():
+            metric_type, help_text = METRICS.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+def _format_labels(labels: LabelKey) -> str:
+    """格式化标签，按Prometheus规则转义"""
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class RequestMetrics:
+    """单个请求的耗时明细（阶段耗时累加，可在多个线程中同时记录）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.llm_tokens: Dict[str, int] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_llm_call(self, seconds: float, tokens: Dict[str, int]):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+            for token_type, count in tokens.items():
+                self.llm_tokens[token_type] = self.llm_tokens.get(token_type, 0) + count
+
+    def add_cache(self, cache: str, hits: int, misses: int):
+        with self._lock:
+            counts = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+            counts["hits"] += hits
+            counts["misses"] += misses
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为响应元数据
+
+        Returns:
+            Dict: total_seconds / stages（秒）/ llm（调用次数、累计耗时、token）/ cache（命中与未命中）
+        """
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self._started, 4),
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "llm": {
+                    "calls": self.llm_calls,
+                    "seconds": round(self.llm_seconds, 4),
+                    "tokens": dict(self.llm_tokens),
+                },
+                "cache": {name: dict(counts) for name, counts in self.cache.items()},
+            }
+
+
+_request_metrics: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "request_metrics", default=None
+)
+
+
+def start_request_metrics() -> RequestMetrics:
+    """
+    为当前上下文（请求或后台任务）开始收集耗时明细
+
+    Returns:
+        RequestMetrics: 本次请求的耗时明细
+    """
+    request_metrics = RequestMetrics()
+    _request_metrics.set(request_metrics)
+    return request_metrics
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    """当前上下文的耗时明细，没有开始收集时返回None"""
+    return _request_metrics.get()
+
+
+@contextmanager
+def stage_timer(component: str, stage: str) -> Iterator[None]:
+    """
+    记录代码块耗时到阶段直方图与当前请求的耗时明细（异常时同样记录）
+
+    Args:
+        component: 组件名 (analyzer / agent / generator / mapper / api)
+        stage: 阶段名
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        get_metrics().observe("geyan_stage_duration_seconds", elapsed, component=component, stage=stage)
+        request_metrics = _request_metrics.get()
+        if request_metrics is not None:
+            request_metrics.add_stage(f"{component}.{stage}", elapsed)
+
+
+def timed(component: str, stage: str) -> Callable[[F], F]:
+    """
+    装饰器：以 stage_timer 记录函数每次调用的耗时
+
+    Args:
+        component: 组件名
+        stage: 阶段名
+    """
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage_timer(component, stage):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def record_cache(cache: str, hits: int, misses: int):
+    """
+    记录缓存命中情况
+
+    Args:
+        cache: 缓存名 (feature / expression / expression_index)
+        hits: 命中数
+        misses: 未命中数
+    """
+    metrics = get_metrics()
+    if hits:
+        metrics.inc("geyan_cache_requests_total", hits, cache=cache, result="hit")
+    if misses:
+        metrics.inc("geyan_cache_requests_total", misses, cache=cache, result="miss")
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.add_cache(cache, hits, misses)
+
+
+def record_llm_call(model: str, seconds: float, tokens: Dict[str, int], error: bool = False):
+    """
+    记录一次LLM调用
+
+    Args:
+        model: 模型名称
+        seconds: 调用耗时（秒）
+        tokens: token用量 {input / output: 数量}
+        error: 调用是否失败
+    """
+    metrics = get_metrics()
+    metrics.inc("geyan_llm_calls_total", model=model, status="error" if error else "ok")
+    metrics.observe("geyan_llm_latency_seconds", seconds, model=model)
+    for token_type, count in tokens.items():
+        metrics.inc("geyan_llm_tokens_total", count, model=model, type=token_type)
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.add_llm_call(seconds, tokens)
+
+
+_default_metrics: Optional[MetricsRegistry] = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """获取进程内共享的指标注册表"""
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = MetricsRegistry()
+        return _default_metrics
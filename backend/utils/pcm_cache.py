@@ -0,0 +1,132 @@
+"""
+解码后PCM缓存
+每个音频按目标采样率只解码一次，存为float32 .npy，之后通过内存映射读取
+"""
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+import logging
+
+import librosa
+import numpy as np
+
+from .file_utils import compute_file_hash, evict_lru_files
+
+logger = logging.getLogger(__name__)
+
+
+class PCMCache:
+    """解码PCM缓存（单声道float32，np.load(mmap_mode='r') 复用，多进程共享页缓存）"""
+
+    def __init__(
+        self,
+        cache_dir: str = "data/cache/pcm",
+        max_bytes: int = 4 * 1024 * 1024 * 1024
+    ):
+        """
+        初始化PCM缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节），超出后按最近最少使用淘汰
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def lookup(self, audio_path: str, sr: int) -> Optional[np.ndarray]:
+        """
+        查找已解码的PCM，不触发解码
+
+        Args:
+            audio_path: 音频文件路径
+            sr: 采样率
+
+        Returns:
+            np.ndarray: 只读内存映射数组，未缓存时返回None
+        """
+        path = self._path(compute_file_hash(audio_path), sr)
+        try:
+            y = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return y
+
+    def load(self, audio_path: str, sr: int) -> Tuple[np.ndarray, int]:
+        """
+        读取音频PCM，未缓存时解码一次并写入缓存
+
+        Args:
+            audio_path: 音频文件路径
+            sr: 目标采样率
+
+        Returns:
+            Tuple[np.ndarray, int]: (只读内存映射数组, 采样率)
+        """
+        y = self.lookup(audio_path, sr)
+        if y is not None:
+            logger.debug(f"PCM缓存命中: {audio_path} @ {sr}Hz")
+            return y, sr
+
+        decoded, _ = librosa.load(audio_path, sr=sr)
+        path = self._path(compute_file_hash(audio_path), sr)
+
+        # 先写临时文件再原子替换，并发写入同一文件时以最后一个为准
+        tmp_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.tmp.npy")
+        try:
+            np.save(tmp_path, decoded.astype(np.float32, copy=False))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"PCM缓存写入失败: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return decoded, sr
+
+        logger.info(f"PCM已缓存: {path.name}")
+        evict_lru_files(self.cache_dir, "*.npy", self.max_bytes)
+        return np.load(path, mmap_mode='r'), sr
+
+    def cached_duration(self, audio_path: str) -> Optional[float]:
+        """
+        从任意采样率的缓存条目读取时长（只读.npy头部）
+
+        Args:
+            audio_path: 音频文件路径
+
+        Returns:
+            float: 时长（秒），没有缓存条目时返回None
+        """
+        content_hash = compute_file_hash(audio_path)
+        for path in self.cache_dir.glob(f"{content_hash}_*.npy"):
+            try:
+                sr = int(path.stem.rsplit('_', 1)[1])
+                y = np.load(path, mmap_mode='r')
+            except (ValueError, OSError):
+                continue
+            return len(y) / sr
+        return None
+
+    def _path(self, content_hash: str, sr: int) -> Path:
+        return self.cache_dir / f"{content_hash}_{sr}.npy"
+
+
+_default_cache: Optional[PCMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_pcm_cache() -> PCMCache:
+    """获取进程内共享的PCM缓存（目录与大小上限可通过环境变量配置）"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PCMCache(
+                cache_dir=os.getenv("PCM_CACHE_DIR", "data/cache/pcm"),
+                max_bytes=int(os.getenv("PCM_CACHE_MAX_MB", "4096")) * 1024 * 1024
+            )
+        return _default_cache
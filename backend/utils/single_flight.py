@@ -0,0 +1,81 @@
+"""
+并发调用合并
+相同键的并发调用只执行一次，其余调用者等待并共享结果（或异常）；
+领头调用者自身取消时（CallCancelledError），等待者不共享该异常，而是重新发起调用
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CallCancelledError(Exception):
+    """调用者自身取消了调用（只属于该调用者，等待者会重新发起调用而不是收到此异常）"""
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """线程级的调用合并（键相同的调用在执行期间只会运行一次）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """
+        执行调用；已有相同键的调用在进行时，等待其完成并返回同一结果
+
+        Args:
+            key: 合并键
+            func: 被调用的函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否复用了其他调用者的结果)
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                break
+
+            logger.info(f"合并进行中的相同调用: {key}")
+            call.done.wait()
+            if isinstance(call.error, CallCancelledError):
+                logger.info(f"被合并的调用已被其调用者取消，重新发起: {key}")
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """进行中的调用数"""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,270 @@
+"""
+上传文件目录
+持久化 file_id -> 路径/大小/内容哈希/时长/采样率/创建时间 的映射（SQLite WAL），
+路由按主键查找上传文件，不再扫描上传目录；目录损坏或丢失时可从磁盘重建：
+
+    python -m backend.utils.upload_catalog rebuild
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import soundfile as sf
+
+from .file_utils import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+# 上传目录中视为音频的扩展名（与上传路由允许的格式一致）
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.ogg'}
+
+_COLUMNS = ("file_id", "filename", "path", "size", "content_hash", "duration", "sample_rate", "created_at")
+
+
+class UploadCatalog:
+    """上传文件目录（跨请求、跨uvicorn worker共享）"""
+
+    def __init__(self, db_path: str = "data/cache/uploads.sqlite3"):
+        """
+        初始化上传文件目录
+
+        Args:
+            db_path: SQLite数据库路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS uploads (
+                    file_id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    duration REAL,
+                    sample_rate INTEGER,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_uploads_hash ON uploads (content_hash)"
+            )
+            # 删除上传时按路径统计共享同一内容存储的引用数
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_uploads_path ON uploads (path)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接；WAL模式允许多进程并发读、串行写"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(
+        self,
+        file_id: str,
+        path: str,
+        filename: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        created_at: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        登记上传文件（读取文件头获取时长与采样率，不解码音频）
+
+        Args:
+            file_id: 文件ID
+            path: 文件路径
+            filename: 原始文件名
+            content_hash: 内容哈希，为空时计算
+            created_at: 创建时间，为空时取当前时间
+
+        Returns:
+            Dict: 登记的记录
+        """
+        duration, sample_rate = probe_audio(path)
+        record = {
+            "file_id": file_id,
+            "filename": filename,
+            "path": str(path),
+            "size": Path(path).stat().st_size,
+            "content_hash": content_hash or compute_file_hash(str(path)),
+            "duration": duration,
+            "sample_rate": sample_rate,
+            "created_at": created_at if created_at is not None else time.time(),
+        }
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO uploads ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [record[column] for column in _COLUMNS]
+            )
+        return record
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按文件ID查询记录
+
+        Args:
+            file_id: 文件ID
+
+        Returns:
+            Optional[Dict]: 记录，不存在时返回None
+        """
+        row = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM uploads WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def resolve(self, file_id: str) -> Optional[Path]:
+        """
+        按文件ID获取音频路径（记录存在但文件已被删除时视为不存在）
+
+        Args:
+            file_id: 文件ID
+
+        Returns:
+            Optional[Path]: 文件路径
+        """
+        record = self.get(file_id)
+        if record is None:
+            return None
+        path = Path(record["path"])
+        return path if path.exists() else None
+
+    def remove(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        删除记录
+
+        Args:
+            file_id: 文件ID
+
+        Returns:
+            Optional[Dict]: 被删除的记录，不存在时返回None
+        """
+        record = self.get(file_id)
+        if record is not None:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM uploads WHERE file_id = ?", (file_id,))
+        return record
+
+    def references(self, path: str) -> int:
+        """
+        引用某个存储文件的记录数（内容去重后多个文件ID共享同一文件）
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            int: 记录数
+        """
+        (count,) = self._connect().execute(
+            "SELECT COUNT(*) FROM uploads WHERE path = ?", (str(path),)
+        ).fetchone()
+        return count
+
+    def count(self) -> int:
+        """记录数"""
+        (count,) = self._connect().execute("SELECT COUNT(*) FROM uploads").fetchone()
+        return count
+
+    def rebuild(self, upload_dir: str = "data/uploads") -> Dict[str, int]:
+        """
+        从上传目录重建目录：登记未收录或大小已变化的文件，删除文件已不存在的记录
+
+        上传目录下的文件以文件名为文件ID；blobs 子目录中按内容存放的文件若没有任何记录引用，
+        以内容哈希作为文件ID登记（原文件ID无法从磁盘恢复）
+
+        Args:
+            upload_dir: 上传目录
+
+        Returns:
+            Dict[str, int]: added / kept / removed 计数
+        """
+        conn = self._connect()
+        known = {
+            file_id: (path, size)
+            for file_id, path, size in conn.execute("SELECT file_id, path, size FROM uploads")
+        }
+        referenced = {path for path, _ in known.values()}
+        blob_dir = Path(upload_dir) / "blobs"
+        candidates = list(Path(upload_dir).iterdir())
+        if blob_dir.is_dir():
+            candidates += [path for path in blob_dir.iterdir() if str(path) not in referenced]
+        added = kept = 0
+        seen = set()
+        for path in candidates:
+            if not path.is_file() or path.suffix.lower() not in AUDIO_EXTENSIONS:
+                continue
+            file_id = path.stem
+            seen.add(file_id)
+            stat = path.stat()
+            if known.get(file_id) == (str(path), stat.st_size):
+                kept += 1
+                continue
+            try:
+                self.add(file_id, str(path), filename=path.name, created_at=stat.st_mtime)
+                added += 1
+            except OSError as e:
+                logger.warning(f"上传文件登记失败: {path}: {e}")
+
+        stale = [file_id for file_id in known if file_id not in seen and not Path(known[file_id][0]).exists()]
+        with conn:
+            conn.executemany("DELETE FROM uploads WHERE file_id = ?", [(file_id,) for file_id in stale])
+
+        logger.info(f"上传文件目录重建完成: 新增 {added}, 保留 {kept}, 删除 {len(stale)}")
+        return {"added": added, "kept": kept, "removed": len(stale)}
+
+
+def probe_audio(path: str) -> Tuple[Optional[float], Optional[int]]:
+    """
+    只读文件头获取时长与采样率
+
+    Args:
+        path: 音频文件路径
+
+    Returns:
+        Tuple[Optional[float], Optional[int]]: (时长秒, 采样率)，格式不支持时为 (None, None)
+    """
+    try:
+        info = sf.info(str(path))
+        return info.frames / info.samplerate, info.samplerate
+    except RuntimeError:
+        return None, None
+
+
+_default_catalog: Optional[UploadCatalog] = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_upload_catalog() -> UploadCatalog:
+    """获取进程内共享的上传文件目录（路径可通过环境变量 UPLOAD_CATALOG_PATH 配置）"""
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = UploadCatalog(
+                db_path=os.getenv("UPLOAD_CATALOG_PATH", "data/cache/uploads.sqlite3")
+            )
+        return _default_catalog
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="上传文件目录维护")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: 从上传目录重建目录")
+    parser.add_argument("--upload-dir", default="data/uploads", help="上传目录")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    print(get_upload_catalog().rebuild(args.upload_dir))
@@ -2,6 +2,7 @@
 音频上传页面 - 整合版本
 """
 import streamlit as st
+import pandas as pd
 import sys
 from pathlib import Path
 import time
@@ -10,6 +11,9 @@ import traceback
 # 添加项目路径
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+# 生成过程中实时预览的表情参数
+PREVIEW_PARAMETERS = ["eye_open", "mouth_open", "eyebrow_height", "mouth_form"]
+
 def render():
     """渲染上传页面"""
     
@@ -161,11 +165,40 @@ def _process_file_with_real_api(uploaded_file, model_choice, time_resolution, en
             "默认模型": "default"
         }
         
+        keyframe_placeholder = st.empty()
+        generation_start = time.time()
+        streamed = {"count": 0, "first_frame": None}
+        # 已到达的部分关键帧（按帧序号），生成过程中逐步绘制预览
+        keyframes = []
+        st.session_state['partial_keyframes'] = keyframes
+        
+        def show_generation_progress(stage, progress):
+            with progress_placeholder.container():
+                st.progress(0.7 + 0.3 * progress, text=f"🎭 生成表情动画... ({stage} {progress:.0%})")
+                st.write("🎭 步骤3: 正在生成表情参数...")
+        
+        def show_partial_keyframes(start, expressions, total):
+            # 关键帧按时间顺序从开头连续到达，已到达的部分即可开始预览；重复推送同一区间时以后到的为准
+            if streamed["first_frame"] is None:
+                streamed["first_frame"] = time.time() - generation_start
+            del keyframes[start:]
+            keyframes.extend(expressions)
+            streamed["count"] = len(keyframes)
+            with keyframe_placeholder.container():
+                st.caption(
+                    f"⚡ 已就绪 {streamed['count']}/{total} 个关键帧"
+                    f"（首帧用时 {streamed['first_frame']:.1f}秒，"
+                    f"可预览至 {keyframes[-1]['timestamp']:.1f}秒）"
+                )
+                st.line_chart(_keyframe_preview(keyframes))
+        
         expression_result = api_client.generate_expression(
             file_id=file_id,
             model_name=model_mapping.get(model_choice, "default"),
             time_resolution=time_resolution,
-            enable_smoothing=enable_smoothing
+            enable_smoothing=enable_smoothing,
+            on_progress=show_generation_progress,
+            on_keyframes=show_partial_keyframes
         )
         
         if not expression_result.get('success'):
@@ -249,6 +282,16 @@ def _process_file_with_real_api(uploaded_file, model_choice, time_resolution, en
         st.error(f"❌ 处理失败: {str(e)}")
         
 
+def _keyframe_preview(keyframes):
+    """部分关键帧的预览数据：以时间戳为索引的常用表情参数曲线"""
+    return pd.DataFrame(
+        [
+            {name: frame['parameters'].get(name) for name in PREVIEW_PARAMETERS}
+            for frame in keyframes
+        ],
+        index=pd.Index([frame['timestamp'] for frame in keyframes], name="时间（秒）")
+    )
+
 def _show_usage_tips():
     """显示使用提示"""
     st.info("💡 请选择一个音频文件开始分析")
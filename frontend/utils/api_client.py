@@ -3,8 +3,10 @@ API客户端工具
 与后端API通信
 """
 import requests
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -36,10 +38,10 @@ class APIClient:
             logger.error(f"文件上传失败: {str(e)}")
             raise
     
-    def analyze_audio(self, file_id: str) -> Dict[str, Any]:
+    def analyze_audio(self, file_id: str, pitch_method: str = "piptrack") -> Dict[str, Any]:
         """分析音频"""
         try:
-            data = {"file_id": file_id}
+            data = {"file_id": file_id, "pitch_method": pitch_method}
             response = self.session.post(f"{self.base_url}/analyze", json=data)
             response.raise_for_status()
             return response.json()
@@ -52,22 +54,121 @@ class APIClient:
         file_id: str,
         model_name: str = "default",
         time_resolution: float = 0.1,
-        enable_smoothing: bool = True
+        enable_smoothing: bool = True,
+        pitch_method: str = "piptrack",
+        on_progress: Optional[Callable[[str, float], None]] = None,
+        on_keyframes: Optional[Callable[[int, List[Dict[str, Any]], int], None]] = None,
+        poll_interval: float = 1.0,
+        timeout: float = 1800
     ) -> Dict[str, Any]:
-        """生成表情"""
+        """
+        生成表情：提交后台任务并订阅事件流直到完成
+
+        on_progress 接收 (阶段, 整体进度)；on_keyframes 接收 (起始帧序号, 部分关键帧, 总帧数)，
+        可在生成结束前开始播放。事件流不可用时退回轮询。
+        timeout 为总等待时间（含队列已满时的重试），超时抛出 TimeoutError
+        """
         try:
             data = {
                 "file_id": file_id,
                 "model_name": model_name,
                 "time_resolution": time_resolution,
-                "enable_smoothing": enable_smoothing
+                "enable_smoothing": enable_smoothing,
+                "pitch_method": pitch_method
             }
-            response = self.session.post(f"{self.base_url}/generate", json=data)
+            deadline = time.monotonic() + timeout
+            while True:
+                response = self.session.post(f"{self.base_url}/generate", json=data)
+                if response.status_code != 429:
+                    break
+                # 队列已满，按服务端建议的间隔重试，直到超出总等待时间
+                retry_after = float(response.headers.get("Retry-After", poll_interval))
+                if time.monotonic() + retry_after > deadline:
+                    raise TimeoutError(f"任务队列持续已满，{timeout:g} 秒内未能提交生成任务")
+                time.sleep(retry_after)
             response.raise_for_status()
-            return response.json()
+            job_id = response.json()['data']['job_id']
+            remaining = max(1.0, deadline - time.monotonic())
+            try:
+                return self.follow_job(job_id, on_progress, on_keyframes, remaining)
+            except requests.RequestException as e:
+                logger.warning(f"事件流中断，改为轮询任务状态: {str(e)}")
+                return self.wait_for_job(
+                    job_id, on_progress, poll_interval, max(1.0, deadline - time.monotonic())
+                )
         except Exception as e:
             logger.error(f"表情生成失败: {str(e)}")
             raise
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """查询后台任务状态"""
+        response = self.session.get(f"{self.base_url}/jobs/{job_id}")
+        response.raise_for_status()
+        return response.json()
+
+    def stream_job_events(
+        self,
+        job_id: str,
+        after: int = 0,
+        timeout: float = 1800
+    ) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        """订阅任务事件流（Server-Sent Events），逐个产出 (事件ID, 事件类型, 数据)"""
+        with self.session.get(
+            f"{self.base_url}/jobs/{job_id}/events",
+            params={"after": after},
+            stream=True,
+            timeout=(10, timeout)
+        ) as response:
+            response.raise_for_status()
+            event_id, event = after, "message"
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("id: "):
+                    event_id = int(line[4:])
+                elif line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    yield event_id, event, json.loads(line[6:])
+
+    def follow_job(
+        self,
+        job_id: str,
+        on_progress: Optional[Callable[[str, float], None]] = None,
+        on_keyframes: Optional[Callable[[int, List[Dict[str, Any]], int], None]] = None,
+        timeout: float = 1800
+    ) -> Dict[str, Any]:
+        """通过事件流跟踪任务直到结束，返回与同步接口相同格式的结果"""
+        for _, event, data in self.stream_job_events(job_id, timeout=timeout):
+            if event == "stage" and on_progress is not None:
+                on_progress(data['stage'], data['progress'])
+            elif event == "keyframes" and on_keyframes is not None:
+                on_keyframes(data['start'], data['expressions'], data['total'])
+            elif event == "done":
+                return {"success": True, "message": "表情生成完成", "data": data}
+            elif event == "error":
+                return {"success": False, "message": data['error'] or "表情生成失败", "data": data}
+        # 连接在任务结束前关闭
+        raise requests.ConnectionError(f"任务事件流意外结束: {job_id}")
+
+    def wait_for_job(
+        self,
+        job_id: str,
+        on_progress: Optional[Callable[[str, float], None]] = None,
+        poll_interval: float = 1.0,
+        timeout: float = 1800
+    ) -> Dict[str, Any]:
+        """轮询后台任务直到结束，返回与同步接口相同格式的结果"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)['data']
+            if on_progress is not None:
+                on_progress(job['stage'], job['progress'])
+            if job['status'] == 'succeeded':
+                return {"success": True, "message": "表情生成完成", "data": job['result']}
+            if job['status'] == 'failed':
+                return {"success": False, "message": job['error'] or "表情生成失败", "data": job}
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待任务超时: {job_id}")
+            time.sleep(poll_interval)
     
     def get_expression(self, expression_id: str) -> Dict[str, Any]:
         """获取表情数据"""
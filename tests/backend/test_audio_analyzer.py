@@ -0,0 +1,89 @@
+"""
+音频分析器测试：向量化音高提取与逐帧循环一致，流式分块、并行分块与整段分析的帧级特征一致
+"""
+import librosa
+import numpy as np
+import pytest
+
+from backend.core.audio_analyzer import AudioAnalyzerAgent
+from tests.benchmark.synthetic_audio import write_track
+
+SAMPLE_RATE = 22050
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    agent = AudioAnalyzerAgent(sample_rate=SAMPLE_RATE, emotion_backend="local")
+    agent.feature_cache = None
+    agent.pcm_cache = None
+    return agent
+
+
+@pytest.fixture(scope="module")
+def track(tmp_path_factory):
+    # 噪声脉冲之间是完全静音，最容易暴露按块计算的dB下限
+    return str(write_track(tmp_path_factory.mktemp("audio") / "mixed.wav", "mixed", 40.0, SAMPLE_RATE, seed=3))
+
+
+def per_frame_pitch(pitches, magnitudes):
+    """向量化之前的逐帧实现，作为对照"""
+    pitch_values = []
+    for t in range(pitches.shape[1]):
+        index = magnitudes[:, t].argmax()
+        pitch = pitches[index, t] if magnitudes[index, t] > 0 else 0
+        pitch_values.append(pitch)
+    return np.array(pitch_values)
+
+
+def test_vectorized_pitch_matches_per_frame_loop(analyzer):
+    # 固定信号：滑音 + 完全静音 + 噪声，覆盖有音高、无能量与无明显音高的帧
+    t = np.arange(SAMPLE_RATE * 2) / SAMPLE_RATE
+    sweep = 0.5 * np.sin(2 * np.pi * (220 * t + 110 * t ** 2))
+    noise = np.random.default_rng(0).normal(0, 0.1, SAMPLE_RATE)
+    y = np.concatenate([sweep, np.zeros(SAMPLE_RATE), noise]).astype(np.float32)
+    frontend = analyzer._compute_frontend(y, SAMPLE_RATE)
+
+    pitch = analyzer._extract_pitch(frontend, "piptrack")
+    pitches, magnitudes = librosa.piptrack(S=frontend.magnitude, sr=SAMPLE_RATE, hop_length=analyzer.hop_length)
+    expected = per_frame_pitch(pitches, magnitudes)
+
+    assert pitch.shape == (frontend.n_frames,)
+    assert np.any(expected > 0) and np.any(expected == 0)
+    np.testing.assert_array_equal(pitch, expected)
+
+
+def test_streaming_mfcc_matches_in_memory(analyzer, track):
+    y, sr = analyzer._load_audio(track)
+    frontend = analyzer._compute_frontend(y, sr)
+    expected = analyzer._extract_mfcc(frontend)
+
+    blocks = list(analyzer.stream_frames(track, block_frames=256))
+    assert len(blocks) > 1
+    mfcc = np.hstack([block["mfcc"] for block in blocks])
+    energy = np.concatenate([block["energy"] for block in blocks])
+
+    assert mfcc.shape == expected.shape
+    np.testing.assert_allclose(mfcc, expected, atol=1e-3)
+    np.testing.assert_allclose(energy, frontend.rms, atol=1e-6)
+
+
+def test_streaming_analysis_matches_in_memory(analyzer, track):
+    in_memory = analyzer._analyze_in_memory(track, "piptrack")
+    streaming = analyzer._analyze_streaming(track, "piptrack")
+
+    np.testing.assert_allclose(streaming.mfcc, in_memory.mfcc, atol=1e-3)
+    for emotion, score in in_memory.emotion_scores.items():
+        assert streaming.emotion_scores[emotion] == pytest.approx(score, abs=1e-3)
+
+
+def test_parallel_chunks_match_in_memory(track):
+    agent = AudioAnalyzerAgent(sample_rate=SAMPLE_RATE, emotion_backend="local", max_workers=2)
+    agent.feature_cache = None
+    agent.pcm_cache = None
+    agent.PARALLEL_MIN_CHUNK_SECONDS = 10.0
+
+    in_memory = agent._analyze_in_memory(track, "piptrack")
+    parallel = agent._analyze_parallel(track, "piptrack")
+
+    np.testing.assert_allclose(parallel.mfcc, in_memory.mfcc, atol=1e-3)
+    np.testing.assert_allclose(parallel.energy, in_memory.energy, atol=1e-6)
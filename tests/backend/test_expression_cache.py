@@ -0,0 +1,77 @@
+"""
+表情参数缓存测试：TTL过期、LRU淘汰与条目计数
+"""
+from unittest import mock
+
+import pytest
+
+from backend.core import expression_cache as expression_cache_module
+from backend.core.expression_cache import ExpressionCache
+
+
+class Clock:
+    """可手动推进的 time.time()"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with mock.patch.object(expression_cache_module.time, "time", clock):
+        yield clock
+
+
+def params(value):
+    return {"eye_open": value}
+
+
+def test_get_many_skips_expired_entries(tmp_path, clock):
+    cache = ExpressionCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    cache.put_many("v1", {"a": params(0.1)})
+    clock.now += 30
+    cache.put_many("v1", {"b": params(0.2)})
+
+    clock.now += 40
+    assert cache.get_many("v1", ["a", "b"]) == {"b": params(0.2)}
+    assert cache.get_many("v2", ["b"]) == {}
+
+
+def test_put_many_deletes_expired_entries(tmp_path, clock):
+    cache = ExpressionCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    cache.put_many("v1", {"a": params(0.1), "b": params(0.2)})
+    clock.now += 61
+    cache.put_many("v1", {"c": params(0.3)})
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_eviction_keeps_recently_read_entries(tmp_path, clock):
+    cache = ExpressionCache(str(tmp_path / "cache.sqlite3"), max_entries=3, ttl_seconds=0)
+    for key in ("a", "b", "c"):
+        cache.put_many("v1", {key: params(0.5)})
+        clock.now += 1
+    # 读取 a 刷新其访问时间，b 成为最久未使用的条目
+    assert cache.get_many("v1", ["a"]) == {"a": params(0.5)}
+    clock.now += 1
+    cache.put_many("v1", {"d": params(0.5)})
+
+    assert set(cache.get_many("v1", ["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert cache.stats()["entries"] == 3
+
+
+def test_entry_count_follows_overwrites_and_clear(tmp_path, clock):
+    cache = ExpressionCache(str(tmp_path / "cache.sqlite3"), max_entries=100)
+    cache.put_many("v1", {"a": params(0.1), "b": params(0.2)})
+    cache.put_many("v1", {"a": params(0.3)})
+    assert cache.get_many("v1", ["a"]) == {"a": params(0.3)}
+    assert cache.stats()["entries"] == 2
+
+    # 另一个实例（模拟其他worker）打开同一个数据库时沿用已有计数
+    assert ExpressionCache(str(tmp_path / "cache.sqlite3")).stats()["entries"] == 2
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "hit_rate": 0.0, "entries": 0}
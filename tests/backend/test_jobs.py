@@ -0,0 +1,179 @@
+"""
+后台任务测试：队列已满返回429、幂等键复用与冲突、失败任务重试、跨worker共享任务状态
+"""
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+from backend.api.job_store import JobStore
+from backend.api.jobs import IdempotencyConflictError, JobManager, QueueFullError
+from backend.api.routes import expression as expression_routes
+
+
+async def wait_finished(job, timeout=5.0):
+    cursor = 0
+    async with asyncio.timeout(timeout):
+        while not job.finished:
+            events = await job.wait_events(cursor, 0.5)
+            if events:
+                cursor = events[-1][0]
+
+
+@pytest_asyncio.fixture
+async def manager():
+    manager = JobManager(workers=1, queue_depth=1)
+    await manager.start()
+    yield manager
+    await manager.stop()
+
+
+@pytest.fixture
+def release():
+    return asyncio.Event()
+
+
+def blocking(release):
+    async def run(job):
+        await release.wait()
+        return {"ok": True}
+    return run
+
+
+async def fill_queue(manager, release):
+    """一个任务执行中、一个任务排队，队列已满"""
+    running, _ = manager.submit("generate", blocking(release), dedupe_key="running")
+    await asyncio.sleep(0)
+    queued, _ = manager.submit("generate", blocking(release), dedupe_key="queued")
+    return running, queued
+
+
+@pytest.mark.asyncio
+async def test_queue_full_raises_with_retry_after(manager, release):
+    await fill_queue(manager, release)
+    with pytest.raises(QueueFullError) as exc_info:
+        manager.submit("generate", blocking(release), dedupe_key="third")
+    assert exc_info.value.retry_after >= 1
+    release.set()
+
+
+@pytest.mark.asyncio
+async def test_generate_route_returns_429_with_retry_after(manager, release, tmp_path, monkeypatch):
+    audio_path = tmp_path / "track.wav"
+    audio_path.write_bytes(b"RIFF")
+    record = {"path": str(audio_path), "content_hash": "abc"}
+
+    class Catalog:
+        def get(self, file_id):
+            return record
+
+    monkeypatch.setattr(expression_routes, "get_upload_catalog", lambda: Catalog())
+    monkeypatch.setattr(expression_routes, "get_job_manager", lambda: manager)
+    await fill_queue(manager, release)
+
+    response = await expression_routes.generate_expression(expression_routes.GenerateRequest(file_id="f"))
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert json.loads(response.body)["retry_after"] == int(response.headers["Retry-After"])
+    release.set()
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_reuses_job_and_rejects_other_params(manager, release):
+    job, reused = manager.submit("generate", blocking(release), dedupe_key="a", idempotency_key="k")
+    assert not reused
+    release.set()
+    await wait_finished(job)
+
+    # 已成功的任务在保留期内同样复用
+    again, reused = manager.submit("generate", blocking(release), dedupe_key="a", idempotency_key="k")
+    assert reused and again is job and again.result == {"ok": True}
+
+    with pytest.raises(IdempotencyConflictError):
+        manager.submit("generate", blocking(release), dedupe_key="b", idempotency_key="k")
+
+
+@pytest.mark.asyncio
+async def test_same_dedupe_key_joins_active_job(manager, release):
+    job, _ = manager.submit("generate", blocking(release), dedupe_key="a")
+    joined, reused = manager.submit("generate", blocking(release), dedupe_key="a")
+    assert reused and joined is job
+    release.set()
+    await wait_finished(job)
+    assert job.status == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_with_same_idempotency_key(manager):
+    async def fail(job):
+        raise RuntimeError("boom")
+
+    async def succeed(job):
+        return {"ok": True}
+
+    failed, _ = manager.submit("generate", fail, dedupe_key="a", idempotency_key="k")
+    await wait_finished(failed)
+    assert failed.status == "failed" and failed.error == "boom"
+
+    retried, reused = manager.submit("generate", succeed, dedupe_key="a", idempotency_key="k")
+    assert not reused and retried.job_id != failed.job_id
+    await wait_finished(retried)
+    assert retried.status == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_job_state_is_shared_through_store(tmp_path, release):
+    owner = JobManager(store=JobStore(str(tmp_path / "jobs.sqlite3")))
+    other = JobManager(store=JobStore(str(tmp_path / "jobs.sqlite3")))
+    await owner.start()
+    await other.start()
+    try:
+        async def run(job):
+            job.update("keyframes", 0.5)
+            await release.wait()
+            return {"ok": True}
+
+        job, _ = owner.submit("generate", run, dedupe_key="a", idempotency_key="k")
+        await asyncio.sleep(0.05)
+        remote = other.get(job.job_id)
+        assert remote is not None and remote.status == "running"
+
+        release.set()
+        await wait_finished(remote)
+        assert remote.status == "succeeded" and remote.result == {"ok": True}
+        assert [event for event, _ in remote.events] == ["stage", "stage", "done"]
+
+        shared, reused = other.submit("generate", run, dedupe_key="a", idempotency_key="k")
+        assert reused and shared.job_id == job.job_id
+        with pytest.raises(IdempotencyConflictError):
+            other.submit("generate", run, dedupe_key="b", idempotency_key="k")
+    finally:
+        await owner.stop()
+        await other.stop()
+
+
+@pytest.mark.asyncio
+async def test_route_maps_idempotency_conflict_to_409(manager, release, tmp_path, monkeypatch):
+    audio_path = tmp_path / "track.wav"
+    audio_path.write_bytes(b"RIFF")
+
+    class Catalog:
+        def get(self, file_id):
+            return {"path": str(audio_path), "content_hash": file_id}
+
+    monkeypatch.setattr(expression_routes, "get_upload_catalog", lambda: Catalog())
+    monkeypatch.setattr(expression_routes, "get_job_manager", lambda: manager)
+    monkeypatch.setattr(expression_routes, "_run_generation", lambda request, path, job: blocking(release)(job))
+
+    first = await expression_routes.generate_expression(
+        expression_routes.GenerateRequest(file_id="a", idempotency_key="k")
+    )
+    assert first.status_code == 202
+    with pytest.raises(HTTPException) as exc_info:
+        await expression_routes.generate_expression(
+            expression_routes.GenerateRequest(file_id="b", idempotency_key="k")
+        )
+    assert exc_info.value.status_code == 409
+    release.set()
@@ -0,0 +1,66 @@
+"""
+表情代理测试：批量结果按 i 对齐回原始帧，缺失与无效的帧逐帧补齐
+"""
+import pytest
+
+from backend.core.langchain_agent import ExpressionAgentV2
+
+
+@pytest.fixture
+def agent():
+    # 只测试结果对齐，不初始化LLM
+    return ExpressionAgentV2.__new__(ExpressionAgentV2)
+
+
+def expression(value):
+    return {"eye_open": value, "mouth_open": value}
+
+
+def test_align_short_response_leaves_missing_frames_empty(agent):
+    aligned = agent._align_batch({"expressions": [{"i": 0, **expression(0.1)}, {"i": 1, **expression(0.2)}]}, 4)
+    assert [a and a["eye_open"] for a in aligned] == [0.1, 0.2, None, None]
+
+
+def test_align_long_response_ignores_extra_items(agent):
+    items = [{"i": i, **expression(i / 10)} for i in range(5)] + [expression(0.9)]
+    aligned = agent._align_batch({"expressions": items}, 3)
+    assert [a["eye_open"] for a in aligned] == [0.0, 0.1, 0.2]
+
+
+def test_align_misordered_response_by_index(agent):
+    items = [{"i": 2, **expression(0.3)}, {"i": 0, **expression(0.1)}, {"i": 1, **expression(0.2)}]
+    aligned = agent._align_batch({"expressions": items}, 3)
+    assert [a["eye_open"] for a in aligned] == [0.1, 0.2, 0.3]
+
+
+def test_align_without_index_uses_position_and_keeps_first_duplicate(agent):
+    items = [expression(0.1), {"i": 0, **expression(0.5)}, expression(0.3)]
+    aligned = agent._align_batch(items, 3)
+    assert [a and a["eye_open"] for a in aligned] == [0.1, None, 0.3]
+
+
+def test_align_invalid_values_and_format(agent):
+    items = [{"i": 0, "eye_open": "abc"}, {"i": 1, "eye_open": None}, {"i": 2, **expression(2.0)}, "x"]
+    aligned = agent._align_batch({"expressions": items}, 3)
+    assert aligned[:2] == [None, None]
+    assert aligned[2]["eye_open"] == 1.0
+
+    with pytest.raises(RuntimeError):
+        agent._align_batch({"expressions": "oops"}, 3)
+
+
+def test_generate_window_fills_gaps_per_frame(agent):
+    frames = [{"timestamp": t} for t in (0.0, 0.1, 0.2)]
+    agent.generate_expressions_batch = lambda batch: agent._align_batch(
+        {"expressions": [{"i": 2, **expression(0.3)}, {"i": 0, **expression(0.1)}]}, len(batch)
+    )
+    single_calls = []
+
+    def generate_single(features):
+        single_calls.append(features["timestamp"])
+        return expression(0.5)
+
+    agent._generate_single = generate_single
+    window = agent._generate_window(frames)
+    assert [params["eye_open"] for params in window] == [0.1, 0.5, 0.3]
+    assert single_calls == [0.1]
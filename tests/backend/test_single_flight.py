@@ -0,0 +1,90 @@
+"""
+调用合并测试：并发调用者共享同一结果与异常，领头调用者取消时等待者重新发起调用
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.utils.single_flight import CallCancelledError, SingleFlight
+
+CALLERS = 4
+
+
+def run_concurrently(flight, func, callers=CALLERS):
+    """领头调用者进入 func 后再启动其余调用者，保证它们合并到同一次调用"""
+    entered = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def leader_func():
+        calls.append(threading.get_ident())
+        entered.set()
+        release.wait(5)
+        return func(len(calls))
+
+    def call():
+        try:
+            return flight.do("key", leader_func)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(call)]
+        assert entered.wait(5)
+        futures += [pool.submit(call) for _ in range(callers - 1)]
+        # 等所有等待者挂到进行中的调用上再放行
+        while flight._calls["key"].waiters < callers - 1:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result(5) for future in futures]
+    return results, calls
+
+
+def test_concurrent_callers_share_one_result():
+    flight = SingleFlight()
+    results, calls = run_concurrently(flight, lambda count: {"calls": count})
+
+    assert len(calls) == 1
+    assert results[0] == ({"calls": 1}, False)
+    for result, shared in results[1:]:
+        assert shared and result is results[0][0]
+    assert flight.in_flight() == 0
+
+
+def test_exception_propagates_to_all_callers():
+    flight = SingleFlight()
+    error = ValueError("boom")
+
+    def fail(count):
+        raise error
+
+    results, calls = run_concurrently(flight, fail)
+    assert len(calls) == 1
+    assert all(result is error for result in results)
+    assert flight.in_flight() == 0
+
+    # 失败的调用不会被缓存，之后的调用重新执行
+    assert flight.do("key", lambda: 1) == (1, False)
+
+
+def test_waiters_retry_when_leader_is_cancelled():
+    flight = SingleFlight()
+
+    def cancel_first(count):
+        if count == 1:
+            raise CallCancelledError()
+        return count
+
+    results, calls = run_concurrently(flight, cancel_first, callers=2)
+    assert isinstance(results[0], CallCancelledError)
+    assert results[1] == (2, False)
+    assert len(calls) == 2
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    with pytest.raises(KeyError):
+        flight.do("c", lambda: {}["missing"])
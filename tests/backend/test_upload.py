@@ -0,0 +1,74 @@
+"""
+上传测试：相同内容共享存储，删除时按引用计数保留文件直到最后一个引用被删除
+"""
+import io
+
+import pytest
+
+from backend.api.routes import upload
+from backend.utils.upload_catalog import UploadCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    catalog = UploadCatalog(str(tmp_path / "uploads.sqlite3"))
+    monkeypatch.setattr(upload, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(upload, "BLOB_DIR", tmp_path / "uploads" / "blobs")
+    monkeypatch.setattr(upload, "get_upload_catalog", lambda: catalog)
+    upload.BLOB_DIR.mkdir(parents=True)
+    return catalog
+
+
+def store(content, file_id):
+    return upload._store_upload(io.BytesIO(content), ".wav", file_id, f"{file_id}.wav")
+
+
+def blobs():
+    return sorted(path.name for path in upload.BLOB_DIR.iterdir())
+
+
+def test_same_content_shares_one_blob(catalog):
+    first, first_deduplicated = store(b"same audio", "a")
+    second, second_deduplicated = store(b"same audio", "b")
+    other, other_deduplicated = store(b"other audio", "c")
+
+    assert (first_deduplicated, second_deduplicated, other_deduplicated) == (False, True, False)
+    assert first["path"] == second["path"] != other["path"]
+    assert first["content_hash"] == second["content_hash"]
+    # 临时文件不会留在 blobs 目录
+    assert len(blobs()) == 2
+    assert catalog.references(first["path"]) == 2
+
+
+def test_delete_keeps_blob_until_last_reference(catalog):
+    record, _ = store(b"same audio", "a")
+    store(b"same audio", "b")
+    blob = record["path"]
+
+    assert upload._delete_upload("a")["file_id"] == "a"
+    assert catalog.get("a") is None
+    assert catalog.references(blob) == 1
+    assert upload.Path(blob).exists()
+
+    assert upload._delete_upload("b") is not None
+    assert catalog.references(blob) == 0
+    assert not upload.Path(blob).exists()
+    assert upload._delete_upload("b") is None
+
+
+def test_reupload_after_delete_stores_content_again(catalog):
+    record, _ = store(b"same audio", "a")
+    upload._delete_upload("a")
+
+    again, deduplicated = store(b"same audio", "b")
+    assert not deduplicated
+    assert again["path"] == record["path"]
+    assert upload.Path(again["path"]).read_bytes() == b"same audio"
+
+
+def test_too_large_upload_leaves_no_files(catalog, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_MAX_BYTES", 4)
+    with pytest.raises(upload.UploadTooLargeError):
+        store(b"too large", "a")
+    assert blobs() == []
+    assert catalog.get("a") is None
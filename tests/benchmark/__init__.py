@@ -0,0 +1,5 @@
+"""
+流水线基准测试：合成音频 + 本地模拟LLM，报告各阶段延迟、吞吐量与峰值内存并与基线比较
+
+    python -m tests.benchmark --help
+"""
@@ -0,0 +1,220 @@
+"""
+本地模拟LLM服务
+在后台线程中提供 OpenAI 兼容的 /v1/chat/completions 接口，按提示词识别调用方
+（整体情感、分段情感时间线、单帧/批量表情参数、Live2D表情序列）返回格式正确的确定性JSON，
+可配置每次调用的延迟与抖动，并返回 usage token 数，基准测试不消耗真实API额度
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMOTIONS = ("happy", "sad", "energetic", "calm", "angry")
+EXPRESSION_PARAMS = (
+    "eye_open", "eye_open_r", "eyebrow_height", "eyebrow_height_r", "mouth_open",
+    "mouth_form", "cheek", "body_angle_x", "body_angle_y", "breath",
+)
+
+
+class MockLLMServer:
+    """OpenAI兼容的模拟LLM服务（可作为上下文管理器使用）"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0
+    ):
+        """
+        初始化模拟服务
+
+        Args:
+            latency: 每次调用的基础延迟（秒）
+            jitter: 延迟抖动上限（秒），每次调用在 [0, jitter] 内均匀取值
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            seed: 抖动的随机种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.host = host
+        self.port = port
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        # 调用方类型 -> 调用次数
+        self.calls: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI兼容的API基础URL（设置为 OPENAI_API_BASE）"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """在后台线程中启动服务"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"不支持的路径: {self.path}"}})
+                    return
+                try:
+                    payload = server.complete(json.loads(body))
+                except Exception as e:
+                    logger.error(f"模拟LLM响应失败: {e}", exc_info=True)
+                    self._send(500, {"error": {"message": str(e)}})
+                    return
+                self._send(200, payload)
+
+            def _send(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        logger.info(f"模拟LLM服务已启动: {self.base_url}")
+        return self
+
+    def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any):
+        self.stop()
+
+    def complete(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        生成一次 chat.completion 响应（含模拟延迟）
+
+        Args:
+            request: OpenAI chat completions 请求体
+
+        Returns:
+            Dict: chat.completion 响应体
+        """
+        messages = request.get("messages", [])
+        prompt = _message_text([m for m in messages if m.get("role") == "user"][-1:] or messages)
+        kind, content = respond(prompt)
+
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            delay = self.latency + (self._random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        # 粗略按4字符1个token估算用量
+        prompt_tokens = max(1, len(_message_text(messages)) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": f"chatcmpl-mock-{zlib.crc32(prompt.encode('utf-8')):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def respond(prompt: str) -> Tuple[str, str]:
+    """
+    按提示词识别调用方并生成响应内容
+
+    Args:
+        prompt: 最后一条用户消息
+
+    Returns:
+        Tuple[str, str]: (调用方类型, JSON字符串)
+    """
+    rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+
+    match = re.search(r"以下 (\d+) 个时间点", prompt)
+    if match:
+        expressions = [{"i": i, **_expression(rng)} for i in range(int(match.group(1)))]
+        return "expression_batch", json.dumps({"expressions": expressions})
+
+    if "生成Live2D表情参数" in prompt:
+        return "expression", json.dumps(_expression(rng))
+
+    if "表情索引数组" in prompt:
+        segments = re.search(r"共(\d+)段", prompt)
+        if segments:
+            count = int(segments.group(1))
+        else:
+            duration = re.search(r"音频总时长：([\d.]+)秒", prompt)
+            count = max(1, round(float(duration.group(1)) / 6)) if duration else 1
+        indices = sorted({int(i) for i in re.findall(r'"index": (\d+)', prompt)}) or [0]
+        return "live2d_mapping", json.dumps({"expressions": [str(rng.choice(indices)) for _ in range(count)]})
+
+    match = re.search(r"以下 (\d+) 个音频分段", prompt)
+    if match:
+        segments = [_emotion_scores(rng) for _ in range(int(match.group(1)))]
+        return "emotion_timeline", json.dumps({"segments": segments})
+
+    return "emotion", json.dumps(_emotion_scores(rng))
+
+
+def _emotion_scores(rng: random.Random) -> Dict[str, float]:
+    """五类情感分数，和为1"""
+    raw = [rng.uniform(0.05, 1.0) for _ in EMOTIONS]
+    total = sum(raw)
+    return {emotion: round(value / total, 3) for emotion, value in zip(EMOTIONS, raw)}
+
+
+def _expression(rng: random.Random) -> Dict[str, float]:
+    """取值在各参数合法范围内的表情参数"""
+    params = {name: round(rng.uniform(0.2, 0.9), 3) for name in EXPRESSION_PARAMS}
+    params["body_angle_x"] = round(rng.uniform(-0.3, 0.3), 3)
+    params["body_angle_y"] = round(rng.uniform(-0.3, 0.3), 3)
+    return params
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    """拼接消息文本（兼容字符串与分段列表两种 content）"""
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
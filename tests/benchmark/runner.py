@@ -0,0 +1,492 @@
+"""
+流水线基准测试
+用合成曲目与本地模拟LLM运行三个阶段，报告每个阶段（及其内部子阶段）的
+p50/p99延迟、吞吐量与峰值内存，并与保存的基线比较以发现性能回退：
+
+- analyze: AudioAnalyzerAgent.analyze（无特征缓存，每次都完整分析）
+- generate: ExpressionGenerator.generate_from_audio（无缓存，llm 后端）
+- routes: 通过 TestClient 依次调用 上传 -> /analyze -> /generate（轮询任务至完成） -> 删除
+
+每种曲目先执行一次预热（同时用 tracemalloc 记录峰值内存，不计入延迟），
+再执行 repeat 次计时运行；每次运行使用不同种子生成的曲目，路由阶段的内容缓存不会互相命中
+
+用法（在仓库根目录执行）：
+
+    python -m tests.benchmark                       # 运行并与 baseline.json 比较
+    python -m tests.benchmark --update-baseline     # 运行并写入新的基线
+    python -m tests.benchmark --stages analyze --duration 60 --llm-latency 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from tests.benchmark.mock_llm import MockLLMServer
+from tests.benchmark.synthetic_audio import DEFAULT_SAMPLE_RATE, TRACK_KINDS, write_track
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("analyze", "generate", "routes")
+DEFAULT_BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# 与基线比较时必须一致的配置项
+COMPARABLE_CONFIG = ("kinds", "duration", "repeat", "stages", "llm_latency", "llm_jitter", "sample_rate")
+# 低于该绝对差值的变化视为噪声，不判定为回退
+MIN_LATENCY_DELTA_SECONDS = 0.02
+MIN_MEMORY_DELTA_MB = 5.0
+# 任务轮询间隔与超时（秒）
+JOB_POLL_INTERVAL = 0.02
+JOB_TIMEOUT = 300.0
+
+Sample = Tuple[float, Dict[str, float]]
+
+
+def configure_environment(workdir: Path, llm_base_url: str):
+    """
+    将LLM指向模拟服务，缓存与存储放到临时目录；必须在导入后端模块之前调用
+    （共享组件首次创建时读取环境变量）
+
+    Args:
+        workdir: 临时工作目录
+        llm_base_url: 模拟服务的API基础URL
+    """
+    os.environ.update({
+        "AI_USE_GEMINI": "false",
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_API_BASE": llm_base_url,
+        "EMOTION_BACKEND": "llm",
+        "EXPRESSION_BACKEND": "llm",
+        "UPLOAD_PREFETCH_ANALYSIS": "false",
+        "FEATURE_CACHE_DIR": str(workdir / "cache" / "features"),
+        "PCM_CACHE_DIR": str(workdir / "cache" / "pcm"),
+        "EXPRESSION_CACHE_PATH": str(workdir / "cache" / "expressions.sqlite3"),
+        "UPLOAD_CATALOG_PATH": str(workdir / "cache" / "uploads.sqlite3"),
+        "LIVE2D_SEQUENCE_STORE_PATH": str(workdir / "cache" / "live2d_sequences.sqlite3"),
+        "JOB_STORE_PATH": str(workdir / "cache" / "jobs.sqlite3"),
+    })
+    for name in ("GOOGLE_RATE_LIMIT_RPS", "OPENAI_RATE_LIMIT_RPS", "EMOTION_MODEL_PATH"):
+        os.environ.pop(name, None)
+
+
+@contextmanager
+def _measure(samples: List[Sample], peaks: List[float], trace_memory: bool) -> Iterator[Dict[str, float]]:
+    """
+    记录一次运行：预热运行只记录峰值内存，计时运行记录总耗时与子阶段耗时
+
+    Args:
+        samples: 计时结果列表 (总耗时, 子阶段耗时)
+        peaks: 峰值内存列表（MB）
+        trace_memory: 是否为预热运行（启用 tracemalloc）
+
+    Yields:
+        Dict[str, float]: 子阶段耗时，由调用方填充
+    """
+    from backend.utils.metrics import start_request_metrics
+
+    request_metrics = start_request_metrics()
+    stages: Dict[str, float] = {}
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield stages
+    finally:
+        elapsed = time.perf_counter() - started
+        if trace_memory:
+            peaks.append(tracemalloc.get_traced_memory()[1] / (1024 * 1024))
+            tracemalloc.stop()
+    if not trace_memory:
+        for name, seconds in request_metrics.stages.items():
+            stages.setdefault(name, seconds)
+        samples.append((elapsed, stages))
+
+
+def _run_stage(
+    tracks: Dict[str, List[Path]],
+    run: Callable[[Path, Dict[str, float]], None]
+) -> Tuple[List[Sample], List[float]]:
+    """
+    对每种曲目执行一次预热与 repeat 次计时运行
+
+    Args:
+        tracks: 曲目类型 -> 曲目路径（第一个用于预热）
+        run: 单次运行，参数为 (曲目路径, 子阶段耗时字典)
+
+    Returns:
+        Tuple[List[Sample], List[float]]: (计时结果, 各预热运行的峰值内存MB)
+    """
+    samples: List[Sample] = []
+    peaks: List[float] = []
+    for kind, paths in tracks.items():
+        for i, path in enumerate(paths):
+            with _measure(samples, peaks, trace_memory=i == 0) as stages:
+                run(path, stages)
+        logger.info(f"曲目类型完成: {kind}")
+    return samples, peaks
+
+
+def bench_analyze(tracks: Dict[str, List[Path]]) -> Tuple[List[Sample], List[float]]:
+    """直接调用 AudioAnalyzerAgent.analyze（不使用特征缓存）"""
+    from backend.core.ai_config import AIConfig
+    from backend.core.audio_analyzer import AudioAnalyzerAgent
+
+    analyzer = AudioAnalyzerAgent(**AIConfig.get_analyzer_config())
+    return _run_stage(tracks, lambda path, stages: analyzer.analyze(str(path)))
+
+
+def bench_generate(tracks: Dict[str, List[Path]]) -> Tuple[List[Sample], List[float]]:
+    """直接调用 ExpressionGenerator.generate_from_audio（不使用特征与表情缓存）"""
+    from backend.core.ai_config import AIConfig
+    from backend.core.audio_analyzer import AudioAnalyzerAgent
+    from backend.core.expression_generator import ExpressionGenerator
+    from backend.core.langchain_agent import ExpressionAgentV2
+
+    generator = ExpressionGenerator(
+        audio_analyzer=AudioAnalyzerAgent(**AIConfig.get_analyzer_config()),
+        expression_agent=ExpressionAgentV2(**AIConfig.get_expression_config()),
+        expression_backend="llm"
+    )
+    return _run_stage(tracks, lambda path, stages: generator.generate_from_audio(str(path)))
+
+
+def bench_routes(tracks: Dict[str, List[Path]], workdir: Path) -> Tuple[List[Sample], List[float]]:
+    """
+    通过 TestClient 调用 上传 -> 分析 -> 生成 -> 删除，服务端各阶段耗时取自响应中的 timings
+
+    Args:
+        tracks: 曲目类型 -> 曲目路径
+        workdir: 临时工作目录（上传与表情文件写到这里，不污染 data/）
+    """
+    from fastapi.testclient import TestClient
+
+    from backend.api.main import app
+    from backend.api.routes import expression as expression_routes
+    from backend.api.routes import upload as upload_routes
+
+    upload_routes.UPLOAD_DIR = workdir / "uploads"
+    upload_routes.BLOB_DIR = upload_routes.UPLOAD_DIR / "blobs"
+    upload_routes.BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    expression_routes.EXPRESSION_DIR = workdir / "expressions"
+    expression_routes.EXPRESSION_DIR.mkdir(parents=True, exist_ok=True)
+
+    def timed(stages: Dict[str, float], name: str, call: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        response = call()
+        stages[name] = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} 失败: HTTP {response.status_code}: {response.text}")
+        return response.json()["data"]
+
+    def poll(job_id: str) -> Any:
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while time.monotonic() < deadline:
+            response = client.get(f"/api/v1/jobs/{job_id}")
+            job = response.json()["data"]
+            if job["status"] in ("succeeded", "failed"):
+                if job["status"] == "failed":
+                    raise RuntimeError(f"生成任务失败: {job['error_type']}: {job['error']}")
+                return response
+            time.sleep(JOB_POLL_INTERVAL)
+        raise RuntimeError(f"生成任务超时: {job_id}")
+
+    def run(path: Path, stages: Dict[str, float]):
+        with path.open("rb") as f:
+            uploaded = timed(stages, "api.upload", lambda: client.post(
+                "/api/v1/upload",
+                params={"prefetch": "false"},
+                files={"file": (path.name, f, "audio/wav")}
+            ))
+        file_id = uploaded["file_id"]
+        try:
+            analysis = timed(stages, "api.analyze", lambda: client.post(
+                "/api/v1/analyze", json={"file_id": file_id}
+            ))
+            job = timed(stages, "api.generate", lambda: poll(client.post(
+                "/api/v1/generate", json={"file_id": file_id}
+            ).json()["data"]["job_id"]))
+            for timings in (analysis.get("timings"), (job["result"] or {}).get("timings")):
+                for name, seconds in (timings or {}).get("stages", {}).items():
+                    stages[name] = stages.get(name, 0.0) + seconds
+        finally:
+            client.delete(f"/api/v1/upload/{file_id}")
+
+    with TestClient(app) as client:
+        return _run_stage(tracks, run)
+
+
+def summarize(
+    samples: List[Sample],
+    peaks: List[float],
+    audio_seconds: float
+) -> Dict[str, Dict[str, Any]]:
+    """
+    汇总一个阶段的计时结果
+
+    Args:
+        samples: 计时结果 (总耗时, 子阶段耗时)
+        peaks: 预热运行的峰值内存（MB）
+        audio_seconds: 每次运行处理的音频时长（秒）
+
+    Returns:
+        Dict: "" -> 阶段整体指标，子阶段名 -> 子阶段延迟指标
+    """
+    totals = [elapsed for elapsed, _ in samples]
+    overall = _latency(totals)
+    overall.update({
+        "throughput_runs_per_second": round(len(totals) / sum(totals), 4) if sum(totals) else None,
+        "realtime_factor": round(audio_seconds / overall["mean"], 2) if overall["mean"] else None,
+        "peak_memory_mb": round(max(peaks), 2) if peaks else None,
+    })
+    summary = {"": overall}
+    names = sorted({name for _, stages in samples for name in stages})
+    for name in names:
+        summary[name] = _latency([stages[name] for _, stages in samples if name in stages])
+    return summary
+
+
+def _latency(values: List[float]) -> Dict[str, Any]:
+    """延迟分位数（秒）"""
+    array = np.asarray(values, dtype=float)
+    return {
+        "runs": len(values),
+        "p50": round(float(np.percentile(array, 50)), 4),
+        "p99": round(float(np.percentile(array, 99)), 4),
+        "mean": round(float(array.mean()), 4),
+    }
+
+
+def run_benchmark(
+    kinds: List[str],
+    duration: float,
+    repeat: int,
+    stages: List[str],
+    llm_latency: float = 0.0,
+    llm_jitter: float = 0.0,
+    sample_rate: int = DEFAULT_SAMPLE_RATE
+) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        kinds: 曲目类型列表
+        duration: 每个曲目的时长（秒）
+        repeat: 每种曲目的计时运行次数
+        stages: 要运行的阶段 (analyze / generate / routes)
+        llm_latency: 模拟LLM每次调用的延迟（秒）
+        llm_jitter: 模拟LLM延迟抖动上限（秒）
+        sample_rate: 合成曲目的采样率
+
+    Returns:
+        Dict: 报告 config / environment / stages / llm_calls；
+            stages 的键为阶段名或 "阶段名/子阶段名"
+    """
+    config = {
+        "kinds": list(kinds),
+        "duration": duration,
+        "repeat": repeat,
+        "stages": list(stages),
+        "llm_latency": llm_latency,
+        "llm_jitter": llm_jitter,
+        "sample_rate": sample_rate,
+    }
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="geyan-bench-") as tmp, \
+            MockLLMServer(latency=llm_latency, jitter=llm_jitter) as llm:
+        workdir = Path(tmp)
+        configure_environment(workdir, llm.base_url)
+        tracks = {
+            kind: [
+                write_track(workdir / "tracks" / f"{kind}-{seed}.wav", kind, duration, sample_rate, seed)
+                for seed in range(repeat + 1)
+            ]
+            for kind in kinds
+        }
+        runners = {
+            "analyze": lambda: bench_analyze(tracks),
+            "generate": lambda: bench_generate(tracks),
+            "routes": lambda: bench_routes(tracks, workdir),
+        }
+        for stage in stages:
+            logger.info(f"开始基准阶段: {stage}")
+            samples, peaks = runners[stage]()
+            for name, metrics in summarize(samples, peaks, duration).items():
+                results[f"{stage}/{name}" if name else stage] = metrics
+        llm_calls = dict(sorted(llm.calls.items()))
+
+    return {
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": results,
+        "llm_calls": llm_calls,
+    }
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.25
+) -> List[Dict[str, Any]]:
+    """
+    与基线比较 p50 延迟与峰值内存（p99 受少量运行的噪声影响较大，只报告不比较）
+
+    Args:
+        report: 本次报告
+        baseline: 基线报告
+        tolerance: 允许的相对增长（0.25 表示超过基线25%判定为回退）
+
+    Returns:
+        List[Dict]: 每个比较项 stage / metric / baseline / current / change / status
+            (ok / regression / improved)
+
+    Raises:
+        ValueError: 基线与本次运行的配置不一致
+    """
+    mismatched = [
+        key for key in COMPARABLE_CONFIG
+        if report["config"].get(key) != baseline.get("config", {}).get(key)
+    ]
+    if mismatched:
+        raise ValueError(f"基线配置不一致，无法比较: {', '.join(mismatched)}")
+
+    rows = []
+    for stage, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        for metric, min_delta in (("p50", MIN_LATENCY_DELTA_SECONDS), ("peak_memory_mb", MIN_MEMORY_DELTA_MB)):
+            if current.get(metric) is None or not previous.get(metric):
+                continue
+            delta = current[metric] - previous[metric]
+            change = delta / previous[metric]
+            if change > tolerance and delta > min_delta:
+                status = "regression"
+            elif change < -tolerance and -delta > min_delta:
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "baseline": previous[metric],
+                "current": current[metric],
+                "change": round(change, 4),
+                "status": status,
+            })
+    return rows
+
+
+def format_report(report: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    格式化为文本表格
+
+    Args:
+        report: 报告
+        comparison: 与基线的比较结果
+
+    Returns:
+        str: 文本
+    """
+    lines = [
+        f"{'stage':<44}{'runs':>6}{'p50(s)':>10}{'p99(s)':>10}{'runs/s':>10}{'x实时':>9}{'峰值MB':>10}",
+    ]
+    for stage, metrics in report["stages"].items():
+        def cell(key: str, width: int) -> str:
+            value = metrics.get(key)
+            return f"{'-' if value is None else value:>{width}}"
+        indent = "  " if "/" in stage else ""
+        lines.append(
+            f"{indent + stage:<44}{metrics['runs']:>6}{cell('p50', 10)}{cell('p99', 10)}"
+            f"{cell('throughput_runs_per_second', 10)}{cell('realtime_factor', 9)}{cell('peak_memory_mb', 10)}"
+        )
+    lines.append(f"模拟LLM调用: {json.dumps(report['llm_calls'], ensure_ascii=False)}")
+
+    if comparison is not None:
+        changed = [row for row in comparison if row["status"] != "ok"]
+        lines.append("")
+        lines.append(f"与基线比较: {len(comparison)} 项, 回退 "
+                     f"{sum(row['status'] == 'regression' for row in comparison)} 项")
+        for row in changed:
+            lines.append(
+                f"  [{row['status']}] {row['stage']} {row['metric']}: "
+                f"{row['baseline']} -> {row['current']} ({row['change']:+.1%})"
+            )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口
+
+    Returns:
+        int: 退出码（0 正常，1 存在回退，2 基线无法比较）
+    """
+    parser = argparse.ArgumentParser(description="歌颜随动流水线基准测试（合成音频 + 模拟LLM）")
+    parser.add_argument("--kinds", default=",".join(TRACK_KINDS), help="曲目类型，逗号分隔")
+    parser.add_argument("--duration", type=float, default=15.0, help="每个曲目的时长（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="每种曲目的计时运行次数")
+    parser.add_argument("--stages", default=",".join(STAGES), help="运行的阶段，逗号分隔")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="模拟LLM每次调用的延迟（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="模拟LLM延迟抖动上限（秒）")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE, help="合成曲目的采样率")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE_PATH), help="基线文件")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果写入基线文件")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="判定回退的相对增长阈值")
+    parser.add_argument("--output", help="将报告另存为JSON")
+    parser.add_argument("--verbose", action="store_true", help="输出流水线日志")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    kinds = [kind for kind in args.kinds.split(",") if kind]
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = [kind for kind in kinds if kind not in TRACK_KINDS] + [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"未知的曲目类型或阶段: {', '.join(unknown)}")
+
+    report = run_benchmark(
+        kinds, args.duration, args.repeat, stages,
+        llm_latency=args.llm_latency, llm_jitter=args.llm_jitter, sample_rate=args.sample_rate
+    )
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(format_report(report))
+        print(f"\n基线已更新: {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(format_report(report))
+        print(f"\n基线不存在: {baseline_path}，使用 --update-baseline 创建")
+        return 0
+
+    try:
+        comparison = compare(report, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    except ValueError as e:
+        print(format_report(report))
+        print(f"\n{e}")
+        return 2
+    print(format_report(report, comparison))
+    return 1 if any(row["status"] == "regression" for row in comparison) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
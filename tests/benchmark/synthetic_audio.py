@@ -0,0 +1,184 @@
+"""
+合成测试音频
+按指定时长与类型生成可复现的测试曲目（相同参数与种子生成相同的采样），
+用于基准测试，不依赖仓库外的音频素材：
+
+- click: 固定BPM的节拍点击音轨（节拍检测的理想输入）
+- sweep: 对数正弦扫频（音高与频谱质心持续变化）
+- noise: 间歇噪声脉冲（能量剧烈起伏、无明确音高）
+- mixed: 和弦 + 节拍 + 噪声 + 扫频的混合素材（最接近真实音乐的负载）
+"""
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import soundfile as sf
+
+DEFAULT_SAMPLE_RATE = 44100
+
+
+def click_track(
+    duration: float,
+    sample_rate: int,
+    rng: np.random.Generator,
+    bpm: Optional[float] = None
+) -> np.ndarray:
+    """
+    节拍点击音轨：每拍一个短促的衰减正弦，小节首拍加重
+
+    Args:
+        duration: 时长（秒）
+        sample_rate: 采样率
+        rng: 随机数生成器
+        bpm: 每分钟拍数，为空时在 90-150 之间随机选取
+
+    Returns:
+        np.ndarray: 单声道采样
+    """
+    n = int(duration * sample_rate)
+    signal = np.zeros(n, dtype=np.float32)
+    click_length = int(0.03 * sample_rate)
+    t = np.arange(click_length) / sample_rate
+    click = np.sin(2 * np.pi * 1000.0 * t) * np.exp(-t * 150.0)
+    interval = 60.0 / (bpm or rng.uniform(90.0, 150.0))
+    for beat, start in enumerate(np.arange(0.0, duration, interval)):
+        begin = int(start * sample_rate)
+        end = min(begin + click_length, n)
+        gain = 0.9 if beat % 4 == 0 else 0.5
+        signal[begin:end] += gain * click[:end - begin]
+    return signal
+
+
+def sine_sweep(
+    duration: float,
+    sample_rate: int,
+    rng: np.random.Generator,
+    f_start: Optional[float] = None,
+    f_end: Optional[float] = None
+) -> np.ndarray:
+    """
+    对数正弦扫频
+
+    Args:
+        duration: 时长（秒）
+        sample_rate: 采样率
+        rng: 随机数生成器
+        f_start: 起始频率（Hz），为空时在 60-120 之间随机选取
+        f_end: 终止频率（Hz），为空时在 3000-5000 之间随机选取
+
+    Returns:
+        np.ndarray: 单声道采样
+    """
+    f_start = f_start or rng.uniform(60.0, 120.0)
+    f_end = f_end or rng.uniform(3000.0, 5000.0)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    ratio = np.log(f_end / f_start)
+    phase = 2 * np.pi * f_start * duration / ratio * (np.exp(t / duration * ratio) - 1.0)
+    return (0.6 * np.sin(phase)).astype(np.float32)
+
+
+def noise_bursts(duration: float, sample_rate: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    间歇噪声脉冲：随机长度与间隔的白噪声片段
+
+    Args:
+        duration: 时长（秒）
+        sample_rate: 采样率
+        rng: 随机数生成器
+
+    Returns:
+        np.ndarray: 单声道采样
+    """
+    n = int(duration * sample_rate)
+    signal = np.zeros(n, dtype=np.float32)
+    position = 0.0
+    while position < duration:
+        length = rng.uniform(0.05, 0.5)
+        begin = int(position * sample_rate)
+        end = min(int((position + length) * sample_rate), n)
+        signal[begin:end] = rng.uniform(0.2, 0.8) * rng.standard_normal(end - begin)
+        position += length + rng.uniform(0.1, 0.6)
+    return np.clip(signal, -1.0, 1.0)
+
+
+def mixed(duration: float, sample_rate: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    混合素材：每两秒换一个三和弦，叠加节拍、较弱的噪声脉冲与扫频
+
+    Args:
+        duration: 时长（秒）
+        sample_rate: 采样率
+        rng: 随机数生成器
+
+    Returns:
+        np.ndarray: 单声道采样
+    """
+    n = int(duration * sample_rate)
+    t = np.arange(n) / sample_rate
+    chords = np.zeros(n, dtype=np.float64)
+    roots = 220.0 * 2 ** (rng.integers(0, 12, size=int(np.ceil(duration / 2.0)) + 1) / 12.0)
+    chord_index = (t // 2.0).astype(int)
+    for interval in (1.0, 2 ** (4 / 12), 2 ** (7 / 12)):
+        chords = chords + np.sin(2 * np.pi * roots[chord_index] * interval * t)
+    signal = (
+        0.15 * chords
+        + 0.8 * click_track(duration, sample_rate, rng)
+        + 0.3 * noise_bursts(duration, sample_rate, rng)
+        + 0.2 * sine_sweep(duration, sample_rate, rng)
+    )
+    return np.clip(signal, -1.0, 1.0).astype(np.float32)
+
+
+TRACK_KINDS: Dict[str, Callable[..., np.ndarray]] = {
+    "click": click_track,
+    "sweep": sine_sweep,
+    "noise": noise_bursts,
+    "mixed": mixed,
+}
+
+
+def generate_track(kind: str, duration: float, sample_rate: int = DEFAULT_SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """
+    生成合成曲目
+
+    Args:
+        kind: 曲目类型 (click / sweep / noise / mixed)
+        duration: 时长（秒）
+        sample_rate: 采样率
+        seed: 随机种子
+
+    Returns:
+        np.ndarray: 单声道 float32 采样
+
+    Raises:
+        ValueError: 不支持的曲目类型
+    """
+    if kind not in TRACK_KINDS:
+        raise ValueError(f"不支持的曲目类型: {kind}，可选: {', '.join(TRACK_KINDS)}")
+    return TRACK_KINDS[kind](duration, sample_rate, np.random.default_rng(seed))
+
+
+def write_track(
+    path: str,
+    kind: str,
+    duration: float,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    seed: int = 0
+) -> Path:
+    """
+    生成合成曲目并写入16位WAV文件
+
+    Args:
+        path: 输出路径
+        kind: 曲目类型
+        duration: 时长（秒）
+        sample_rate: 采样率
+        seed: 随机种子
+
+    Returns:
+        Path: 输出路径
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(path), generate_track(kind, duration, sample_rate, seed), sample_rate, subtype="PCM_16")
+    return path
@@ -0,0 +1,72 @@
+"""
+基准测试套件自身的测试；完整的流水线基准较慢，设置 RUN_BENCHMARKS=1 时才运行
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from tests.benchmark.mock_llm import MockLLMServer, respond
+from tests.benchmark.runner import DEFAULT_BASELINE_PATH, compare, run_benchmark
+from tests.benchmark.synthetic_audio import TRACK_KINDS, generate_track
+
+
+@pytest.mark.parametrize("kind", list(TRACK_KINDS))
+def test_tracks_are_reproducible(kind):
+    track = generate_track(kind, duration=2.0, sample_rate=8000, seed=1)
+    assert track.shape == (16000,)
+    assert track.dtype == np.float32
+    assert np.abs(track).max() <= 1.0
+    np.testing.assert_array_equal(track, generate_track(kind, duration=2.0, sample_rate=8000, seed=1))
+    assert not np.array_equal(track, generate_track(kind, duration=2.0, sample_rate=8000, seed=2))
+
+
+def test_mock_llm_answers_each_prompt():
+    kind, content = respond("请分别分析以下 3 个音频分段的情感分布。")
+    assert kind == "emotion_timeline"
+    assert len(json.loads(content)["segments"]) == 3
+
+    kind, content = respond("基于以下 4 个时间点的音乐特征，为每个时间点分别生成Live2D表情参数。")
+    assert kind == "expression_batch"
+    assert [e["i"] for e in json.loads(content)["expressions"]] == [0, 1, 2, 3]
+
+    kind, content = respond('可用表情列表：[{"index": 2}, {"index": 5}]\n音频总时长：30.0秒\n返回表情索引数组')
+    assert kind == "live2d_mapping"
+    expressions = json.loads(content)["expressions"]
+    assert len(expressions) == 5 and set(expressions) <= {"2", "5"}
+
+    kind, content = respond("请分析以下音频特征的情感分布：")
+    assert kind == "emotion"
+    assert sum(json.loads(content).values()) == pytest.approx(1.0, abs=0.01)
+
+
+def test_mock_llm_server_reports_usage():
+    with MockLLMServer(latency=0.0) as server:
+        response = server.complete({"model": "m", "messages": [{"role": "user", "content": "请分析以下音频特征的情感分布："}]})
+    assert response["choices"][0]["message"]["content"]
+    assert response["usage"]["total_tokens"] > 0
+    assert server.calls == {"emotion": 1}
+
+
+def test_compare_flags_regressions():
+    config = {"kinds": ["click"], "duration": 5.0}
+    baseline = {"config": config, "stages": {"analyze": {"p50": 1.0, "peak_memory_mb": 100.0}}}
+    report = {"config": config, "stages": {"analyze": {"p50": 1.5, "peak_memory_mb": 102.0}}}
+    statuses = {row["metric"]: row["status"] for row in compare(report, baseline, tolerance=0.25)}
+    assert statuses == {"p50": "regression", "peak_memory_mb": "ok"}
+
+    with pytest.raises(ValueError):
+        compare(report, {**baseline, "config": {**config, "duration": 10.0}})
+
+
+@pytest.mark.skipif(os.getenv("RUN_BENCHMARKS") != "1", reason="设置 RUN_BENCHMARKS=1 运行完整基准")
+def test_pipeline_against_baseline():
+    baseline = json.loads(DEFAULT_BASELINE_PATH.read_text(encoding="utf-8"))
+    config = baseline["config"]
+    report = run_benchmark(
+        config["kinds"], config["duration"], config["repeat"], config["stages"],
+        llm_latency=config["llm_latency"], llm_jitter=config["llm_jitter"], sample_rate=config["sample_rate"]
+    )
+    regressions = [row for row in compare(report, baseline) if row["status"] == "regression"]
+    assert not regressions, regressions